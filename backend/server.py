@@ -1,18 +1,34 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict, deque
 import uuid
-from datetime import datetime, timedelta, timezone
+import time
+import asyncio
+import base64
+import csv
+import gzip
+import hashlib
+import html
+import io
+import json
+import re
+from datetime import date, datetime, timedelta, timezone
 from passlib.context import CryptContext
 import jwt
-from pymongo import IndexModel
+from pymongo import IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -178,6 +194,10 @@ class ReportTemplate(BaseModel):
     name: str
     description: str
     fields: List[ReportField] = []
+    dynamic_field_ids: List[str] = []  # Dynamic fields resolved into ``fields`` when read
+    dynamic_field_names: Dict[str, str] = {}  # Data key per dynamic field, fixed when it is added
+    dynamic_field_overrides: Dict[str, dict] = {}  # Per-template "required" and "order" per dynamic field
+    version: int = 1  # Incremented on every change; see report_template_versions
     active: bool = True
     created_by: str  # Admin user ID
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -203,6 +223,8 @@ class ReportSubmission(BaseModel):
     data: dict  # Dynamic field data
     status: str = "draft"  # draft, submitted, reviewed, approved
     submitted_at: Optional[datetime] = None
+    template_version: Optional[int] = None  # Template version the data was filled against
+    revision: int = 0  # Incremented on every data save
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -228,6 +250,8 @@ class ReportSubmissionResponse(BaseModel):
     data: dict
     status: str
     submitted_at: Optional[datetime] = None
+    template_version: Optional[int] = None
+    revision: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -281,6 +305,1186 @@ async def get_admin_user(current_user: User = Depends(get_current_user)):
         )
     return current_user
 
+# In-process caching utilities
+class LRUCache:
+    """Small in-process LRU cache with optional per-entry expiry"""
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[Optional[float], Any]]" = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+_MISSING = object()
+
+# Generation counters for report submission data. Cached aggregates embed the
+# generation in their key, so bumping a counter invalidates every dependent entry.
+_submission_generations: Dict[tuple, int] = {}
+
+def submission_generation(template_id: str, report_period: Optional[str] = None) -> tuple:
+    scope = (template_id, report_period) if report_period else (template_id,)
+    return (_submission_generations.get(("*",), 0), _submission_generations.get(scope, 0))
+
+def invalidate_submission_caches(template_id: Optional[str] = None, report_period: Optional[str] = None):
+    """Mark cached aggregates stale after report submissions change"""
+    if template_id is None:
+        scopes = [("*",)]
+    else:
+        scopes = [(template_id,)]
+        if report_period:
+            scopes.append((template_id, report_period))
+    for scope in scopes:
+        _submission_generations[scope] = _submission_generations.get(scope, 0) + 1
+
+# Active report templates served from memory. The cache holds every active
+# template together with pre-serialized JSON, so template reads and saves never
+# query Mongo in steady state. Template writes mark it stale; TEMPLATE_CACHE_SECONDS
+# bounds staleness for writes made by other server processes.
+TEMPLATE_CACHE_SECONDS = float(os.environ.get("TEMPLATE_CACHE_SECONDS", "60"))
+
+# Templates reference dynamic fields by id. The resolver expands those references
+# into report fields from cached field definitions, and a reverse index from field
+# id to template ids lets a field edit invalidate just the templates that use it.
+def dynamic_field_name(field: dict) -> str:
+    return field["label"].lower().replace(" ", "_")
+
+DYNAMIC_FIELD_OVERRIDES = ("required", "order")
+
+def report_field_from_dynamic(field: dict, name: str, order: int, overrides: Optional[dict] = None) -> dict:
+    overrides = overrides or {}
+    return {
+        "id": field["id"],
+        "name": name,
+        "label": field["label"],
+        "field_type": field["field_type"],
+        "required": overrides.get("required", False),
+        "options": field.get("choices"),
+        "placeholder": field.get("placeholder"),
+        "validation": field.get("validation"),
+        "order": overrides.get("order", order)
+    }
+
+class DynamicFieldResolver:
+    def __init__(self, ttl: float):
+        self._fields = LRUCache(maxsize=10000, ttl=ttl)  # field id -> definition, None when missing
+        self._resolved = LRUCache(maxsize=2048, ttl=ttl)  # template id -> (updated_at, stamp, fields)
+        self._dependents: Dict[str, set] = {}
+        self._stamp = 0
+
+    async def prefetch(self, field_ids):
+        missing = [field_id for field_id in dict.fromkeys(field_ids) if field_id not in self._fields]
+        if not missing:
+            return
+        found = await db.dynamic_fields.find({"id": {"$in": missing}}, {"_id": 0}).to_list(None)
+        by_id = {field["id"]: field for field in found}
+        for field_id in missing:
+            self._fields.set(field_id, by_id.get(field_id))
+
+    async def resolve(self, template: dict) -> dict:
+        """The template with its referenced, non-deleted dynamic fields appended to ``fields``.
+        
+        ``fields_stamp`` changes whenever the resolved fields may have, so it can key caches.
+        """
+        field_ids = template.get("dynamic_field_ids") or []
+        if not field_ids:
+            return template
+        
+        cached = self._resolved.get(template["id"])
+        if cached is None or cached[0] != template.get("updated_at"):
+            await self.prefetch(field_ids)
+            fields = list(template.get("fields", []))
+            names = {field["name"] for field in fields}
+            stored_names = template.get("dynamic_field_names") or {}
+            overrides = template.get("dynamic_field_overrides") or {}
+            order = max((field.get("order", 0) for field in fields), default=0)
+            for field_id in field_ids:
+                field = self._fields.get(field_id)
+                if field is None or field.get("deleted"):
+                    continue
+                name = stored_names.get(field_id) or dynamic_field_name(field)
+                if name in names:
+                    continue
+                order += 1
+                names.add(name)
+                fields.append(report_field_from_dynamic(field, name, order, overrides.get(field_id)))
+            self._stamp += 1
+            cached = (template.get("updated_at"), self._stamp, fields)
+            self._resolved.set(template["id"], cached)
+            for field_id in field_ids:
+                self._dependents.setdefault(field_id, set()).add(template["id"])
+        return {**template, "fields": cached[2], "fields_stamp": cached[1]}
+
+    def invalidate_field(self, field_id: str) -> set:
+        """Forget a field definition and return the ids of templates that resolved it"""
+        self._fields.pop(field_id)
+        template_ids = self._dependents.pop(field_id, set())
+        for template_id in template_ids:
+            self._resolved.pop(template_id)
+        return template_ids
+
+dynamic_field_resolver = DynamicFieldResolver(TEMPLATE_CACHE_SECONDS)
+
+async def resolve_templates(templates: List[dict]) -> List[dict]:
+    await dynamic_field_resolver.prefetch(
+        field_id for template in templates for field_id in template.get("dynamic_field_ids") or []
+    )
+    return [await dynamic_field_resolver.resolve(template) for template in templates]
+
+class TemplateCache:
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self.version = 0
+        self._templates: Dict[str, dict] = {}
+        self._stored: Dict[str, dict] = {}
+        self._template_json: Dict[str, bytes] = {}
+        self._list_json = b"[]"
+        self._list_etag = ""
+        self._loaded_at: Optional[float] = None
+        self._stale = True
+        self._dirty: set = set()  # Template ids to reload on the next read
+
+    async def _ensure_fresh(self):
+        if not self._stale and time.monotonic() - self._loaded_at > self.max_age:
+            self._stale = True
+        while self._stale or self._dirty:
+            if self._stale:
+                await single_flight.do(("template_cache", self.version), self._reload)
+            else:
+                await single_flight.do(("template_cache_entries", self.version), self._reload_dirty)
+
+    async def _reload(self):
+        version = self.version
+        stored = await db.report_templates.find({"active": True}, {"_id": 0}).to_list(None)
+        templates = await resolve_templates(stored)
+        serialized = {template["id"]: ReportTemplate(**template).json().encode() for template in templates}
+        if version != self.version:
+            # A template write landed while loading; leave the cache stale for the next reader
+            return
+        self._stored = {template["id"]: template for template in stored}
+        self._templates = {template["id"]: template for template in templates}
+        self._template_json = serialized
+        self._rebuild_list()
+        self._loaded_at = time.monotonic()
+        self._stale = False
+        self._dirty.clear()
+
+    async def _reload_dirty(self):
+        version = self.version
+        template_ids = set(self._dirty)
+        stored = await db.report_templates.find({"id": {"$in": list(template_ids)}, "active": True}, {"_id": 0}).to_list(None)
+        templates = await resolve_templates(stored)
+        if version != self.version:
+            return
+        # Updated entries keep their place in the list; deactivated or deleted ones drop out
+        for template_id in template_ids - {template["id"] for template in stored}:
+            self._stored.pop(template_id, None)
+            self._templates.pop(template_id, None)
+            self._template_json.pop(template_id, None)
+        for stored_template, template in zip(stored, templates):
+            self._stored[template["id"]] = stored_template
+            self._templates[template["id"]] = template
+            self._template_json[template["id"]] = ReportTemplate(**template).json().encode()
+        self._rebuild_list()
+        self._dirty -= template_ids
+
+    def _rebuild_list(self):
+        self._list_json = b"[" + b",".join(self._template_json.values()) + b"]"
+        self._list_etag = f'"{hashlib.sha1(self._list_json).hexdigest()}"'
+
+    async def refresh_resolved(self, stored_templates: List[dict]):
+        """Re-resolve and re-serialize only the given templates after a dynamic field changed"""
+        affected = [template for template in stored_templates if template["id"] in self._stored]
+        if self._stale or not affected:
+            return
+        for stored in affected:
+            template = await dynamic_field_resolver.resolve(stored)
+            self._stored[stored["id"]] = stored
+            self._templates[stored["id"]] = template
+            self._template_json[stored["id"]] = ReportTemplate(**template).json().encode()
+        self._rebuild_list()
+
+    def invalidate(self, template_id: Optional[str] = None):
+        """Reload one template on the next read, or the whole active set without an id"""
+        self.version += 1
+        if template_id is None:
+            self._stale = True
+        else:
+            self._dirty.add(template_id)
+
+    async def get(self, template_id: str) -> Optional[dict]:
+        await self._ensure_fresh()
+        return self._templates.get(template_id)
+
+    async def get_json(self, template_id: str) -> Optional[bytes]:
+        await self._ensure_fresh()
+        return self._template_json.get(template_id)
+
+    async def list_json(self) -> Tuple[bytes, str]:
+        await self._ensure_fresh()
+        return self._list_json, self._list_etag
+
+template_cache = TemplateCache(TEMPLATE_CACHE_SECONDS)
+
+async def get_active_template(template_id: str) -> Optional[dict]:
+    return await template_cache.get(template_id)
+
+def invalidate_template_cache(template_id: Optional[str] = None):
+    template_cache.invalidate(template_id)
+
+# Immutable template versions. Every template write stores the resolved schema as a
+# new version document, and submissions record the version they were filled against,
+# so a (template id, version) pair always means the same fields.
+class ReportTemplateVersion(BaseModel):
+    template_id: str
+    version: int
+    name: str
+    description: str
+    fields: List[ReportField] = []
+    created_by: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+# Versions never change, so neither cache needs invalidation
+_template_version_json = LRUCache(maxsize=4096)
+
+async def snapshot_template_version(template: dict, created_by: str):
+    """Store the resolved schema of a template's current version"""
+    resolved = await dynamic_field_resolver.resolve(template)
+    version = ReportTemplateVersion(
+        template_id=template["id"],
+        version=template.get("version", 1),
+        name=template["name"],
+        description=template["description"],
+        fields=resolved.get("fields", []),
+        created_by=created_by
+    )
+    try:
+        await db.report_template_versions.insert_one(version.dict())
+    except DuplicateKeyError:
+        # Another process recorded this version first
+        pass
+
+async def get_template_version_json(template_id: str, version: int) -> Optional[bytes]:
+    key = (template_id, version)
+    content = _template_version_json.get(key)
+    if content is None:
+        stored = await db.report_template_versions.find_one({"template_id": template_id, "version": version}, {"_id": 0})
+        if stored is None:
+            return None
+        content = ReportTemplateVersion(**stored).json().encode()
+        _template_version_json.set(key, content)
+    return content
+
+async def backfill_template_versions():
+    """Give templates created before versioning a version 1 and pin their submissions to it"""
+    unversioned = await db.report_templates.find({"version": {"$exists": False}}, {"_id": 0}).to_list(None)
+    for template in unversioned:
+        await db.report_templates.update_one(
+            {"id": template["id"], "version": {"$exists": False}}, {"$set": {"version": 1}}
+        )
+        await snapshot_template_version({**template, "version": 1}, template.get("created_by", "system"))
+    if unversioned:
+        await db.report_submissions.update_many(
+            {"template_id": {"$in": [template["id"] for template in unversioned]}, "template_version": {"$exists": False}},
+            {"$set": {"template_version": 1}}
+        )
+        logger.info(f"Backfilled version 1 for {len(unversioned)} report templates")
+
+# Compiled per-template validation of submission data
+def _is_empty(value) -> bool:
+    return value is None or value == "" or value == []
+
+def _as_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _as_date(value):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+def _is_length(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+def find_invalid_rules(field: dict) -> Dict[str, str]:
+    """Validation rules on a field definition that cannot be applied, by rule name"""
+    field_type = field.get("field_type", "text")
+    rules = field.get("validation") or {}
+    if not isinstance(rules, dict):
+        return {"validation": "must be an object"}
+    invalid = {}
+    if field_type in ("number", "multiselect"):
+        for key in ("min", "max"):
+            if rules.get(key) is not None and _as_number(rules[key]) is None:
+                invalid[key] = "must be a number"
+    elif field_type == "date":
+        for key in ("min", "max"):
+            if rules.get(key) and _as_date(rules[key]) is None:
+                invalid[key] = "must be a date (YYYY-MM-DD)"
+    if field_type in ("text", "textarea"):
+        for key in ("min_length", "max_length"):
+            if rules.get(key) is not None and not _is_length(rules[key]):
+                invalid[key] = "must be a non-negative integer"
+        if rules.get("pattern"):
+            try:
+                re.compile(rules["pattern"])
+            except (re.error, TypeError) as exc:
+                invalid["pattern"] = f"is not a valid regular expression ({exc})"
+    return invalid
+
+def ensure_valid_rules(fields: List[dict]) -> None:
+    """Reject field definitions whose validation rules cannot be applied"""
+    problems = [
+        f"{field.get('name') or field.get('label')}: {key} {message}"
+        for field in fields
+        for key, message in find_invalid_rules(field).items()
+    ]
+    if problems:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid validation rules: {'; '.join(problems)}"
+        )
+
+def compile_field_checks(field: dict) -> List:
+    """Turn one field definition into a list of value -> error-message checks.
+    
+    Malformed rules stored before they were checked on save are skipped, so one bad
+    rule never fails every submission of its template.
+    """
+    field_type = field.get("field_type", "text")
+    rules = field.get("validation") or {}
+    invalid = find_invalid_rules(field)
+    if invalid:
+        logger.warning(f"Skipping invalid validation rules on field {field.get('name')!r}: {invalid}")
+        rules = {key: value for key, value in rules.items() if key not in invalid} if isinstance(rules, dict) else {}
+    options = field.get("options") or field.get("choices")
+    checks = []
+    
+    if field_type == "number":
+        minimum, maximum = _as_number(rules.get("min")), _as_number(rules.get("max"))
+        def check_number(value):
+            number = _as_number(value)
+            if number is None:
+                return "must be a number"
+            if minimum is not None and number < minimum:
+                return f"must be at least {rules['min']}"
+            if maximum is not None and number > maximum:
+                return f"must be at most {rules['max']}"
+        checks.append(check_number)
+    elif field_type == "date":
+        earliest, latest = _as_date(rules["min"]) if rules.get("min") else None, _as_date(rules["max"]) if rules.get("max") else None
+        def check_date(value):
+            parsed = _as_date(value)
+            if parsed is None:
+                return "must be a date (YYYY-MM-DD)"
+            if earliest and parsed < earliest:
+                return f"must be on or after {rules['min']}"
+            if latest and parsed > latest:
+                return f"must be on or before {rules['max']}"
+        checks.append(check_date)
+    elif field_type == "dropdown" and options:
+        allowed = frozenset(options)
+        checks.append(lambda value: None if value in allowed else "is not one of the available options")
+    elif field_type == "multiselect":
+        allowed = frozenset(options or [])
+        minimum, maximum = _as_number(rules.get("min")), _as_number(rules.get("max"))
+        def check_multiselect(value):
+            if not isinstance(value, list):
+                return "must be a list of options"
+            if allowed and not allowed.issuperset(value):
+                return "contains options that are not available"
+            if minimum is not None and len(value) < minimum:
+                return f"requires at least {rules['min']} selections"
+            if maximum is not None and len(value) > maximum:
+                return f"allows at most {rules['max']} selections"
+        checks.append(check_multiselect)
+    elif field_type == "checkbox":
+        checks.append(lambda value: None if isinstance(value, bool) else "must be true or false")
+    
+    if field_type in ("text", "textarea"):
+        min_length, max_length = rules.get("min_length"), rules.get("max_length")
+        pattern = re.compile(rules["pattern"]) if rules.get("pattern") else None
+        def check_text(value):
+            if not isinstance(value, str):
+                return "must be text"
+            if min_length is not None and len(value) < min_length:
+                return f"must be at least {min_length} characters"
+            if max_length is not None and len(value) > max_length:
+                return f"must be at most {max_length} characters"
+            if pattern is not None and not pattern.fullmatch(value):
+                return "has an invalid format"
+        checks.append(check_text)
+    
+    return checks
+
+class TemplateValidator:
+    """Validator compiled once per template version.
+    
+    Type and rule checks run for every non-empty value; required fields are only
+    enforced when the report is submitted, so drafts can be saved incomplete.
+    """
+
+    def __init__(self, fields: List[dict]):
+        self.labels = {field["name"]: field.get("label") or field["name"] for field in fields}
+        self.required = [field["name"] for field in fields if field.get("required")]
+        self.checks = {
+            field["name"]: checks
+            for field in fields
+            if (checks := compile_field_checks(field))
+        }
+
+    def validate(self, data: dict, submitted: bool) -> Dict[str, str]:
+        return self.validate_many([data], [submitted])[0]
+
+    def validate_many(self, rows: List[dict], submitted: List[bool]) -> List[Dict[str, str]]:
+        """Validate a batch column by column so each rule is dispatched once per field"""
+        errors: List[Dict[str, str]] = [{} for _ in rows]
+        for name in self.required:
+            for row_index, row in enumerate(rows):
+                if submitted[row_index] and _is_empty(row.get(name)):
+                    errors[row_index][name] = "is required"
+        for name, checks in self.checks.items():
+            column = [row.get(name) for row in rows]
+            for check in checks:
+                for row_index, value in enumerate(column):
+                    if name in errors[row_index] or _is_empty(value):
+                        continue
+                    message = check(value)
+                    if message:
+                        errors[row_index][name] = message
+        return errors
+
+    def describe(self, errors: Dict[str, str]) -> str:
+        return "Report data failed validation: " + "; ".join(
+            f"{self.labels.get(name, name)} {message}" for name, message in errors.items()
+        )
+
+_template_validators = LRUCache(maxsize=512)
+
+def get_template_validator(template: dict) -> TemplateValidator:
+    # A version's fields never change, so compiled validators are never invalidated
+    key = (template["id"], template.get("version", 1))
+    validator = _template_validators.get(key)
+    if validator is None:
+        validator = TemplateValidator(template.get("fields", []))
+        _template_validators.set(key, validator)
+    return validator
+
+# Request coalescing for identical expensive reads
+SINGLE_FLIGHT_RETENTION_SECONDS = float(os.environ.get("SINGLE_FLIGHT_RETENTION_SECONDS", "2"))
+
+class SingleFlight:
+    """Run at most one computation per key; concurrent callers await the same future"""
+
+    def __init__(self, max_retained: int = 256):
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        self._retained = LRUCache(maxsize=max_retained)
+
+    async def do(self, key, fn, retain: float = 0.0):
+        retained = self._retained.get(key, _MISSING)
+        if retained is not _MISSING:
+            return retained
+        
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done, retain))
+        # Shield so one caller disconnecting does not cancel the shared computation
+        return await asyncio.shield(future)
+
+    def _finish(self, key, future: asyncio.Future, retain: float):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if retain > 0 and not future.cancelled() and future.exception() is None:
+            self._retained.set(key, future.result(), ttl=retain)
+
+def single_flight_key(endpoint: str, **params) -> tuple:
+    """Normalize endpoint parameters so equivalent requests share a key"""
+    normalized = []
+    for name, value in sorted(params.items()):
+        if value is None or value == "":
+            continue
+        normalized.append((name, value.strip().lower() if name == "format" and isinstance(value, str) else value))
+    return (endpoint, tuple(normalized))
+
+single_flight = SingleFlight()
+
+STREAM_COALESCE_WINDOW_CHUNKS = int(os.environ.get("STREAM_COALESCE_WINDOW_CHUNKS", "8"))
+_STREAM_END = object()
+
+class StreamCoalescer:
+    """Share one streamed response among identical requests.
+
+    A request joins a running stream while it has produced at most ``window`` chunks;
+    those chunks are replayed to it, and after that the stream is closed to new joiners
+    so memory stays bounded. Each subscriber has a bounded queue and the producer runs
+    at the pace of the slowest one.
+    """
+
+    def __init__(self, window: int, queue_size: int = 4):
+        self.window = window
+        self.queue_size = queue_size
+        self._streams: Dict[Any, dict] = {}
+
+    async def stream(self, key, make_source):
+        shared = self._streams.get(key)
+        if shared is None or shared["history"] is None:
+            shared = {"history": [], "subscribers": set(), "task": None}
+            self._streams[key] = shared
+            shared["task"] = asyncio.ensure_future(self._produce(key, shared, make_source()))
+        history = list(shared["history"])
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        shared["subscribers"].add(queue)
+        try:
+            for chunk in history:
+                yield chunk
+            while True:
+                chunk = await queue.get()
+                if chunk is _STREAM_END:
+                    return
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                yield chunk
+        finally:
+            shared["subscribers"].discard(queue)
+            while not queue.empty():
+                queue.get_nowait()  # Unblock a producer waiting on this queue
+            if not shared["subscribers"] and not shared["task"].done():
+                shared["task"].cancel()
+                self._close(key, shared)
+
+    def _close(self, key, shared: dict):
+        shared["history"] = None
+        if self._streams.get(key) is shared:
+            del self._streams[key]
+
+    async def _produce(self, key, shared: dict, source):
+        try:
+            async for chunk in source:
+                if shared["history"] is not None:
+                    shared["history"].append(chunk)
+                    if len(shared["history"]) > self.window:
+                        self._close(key, shared)
+                for queue in list(shared["subscribers"]):
+                    await queue.put(chunk)
+            end = _STREAM_END
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            end = exc
+        finally:
+            self._close(key, shared)
+        for queue in list(shared["subscribers"]):
+            await queue.put(end)
+
+stream_coalescer = StreamCoalescer(STREAM_COALESCE_WINDOW_CHUNKS)
+
+_background_tasks = set()
+
+def spawn_background(coro) -> asyncio.Task:
+    """Start a fire-and-forget task and keep a reference until it finishes"""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+# Stale-while-revalidate caching with graceful degradation
+ANALYTICS_FRESH_SECONDS = float(os.environ.get("ANALYTICS_FRESH_SECONDS", "30"))
+ANALYTICS_STALE_SECONDS = float(os.environ.get("ANALYTICS_STALE_SECONDS", "600"))
+ANALYTICS_REFRESH_TIMEOUT_SECONDS = float(os.environ.get("ANALYTICS_REFRESH_TIMEOUT_SECONDS", "5"))
+
+class StaleWhileRevalidateCache:
+    """Serve cached values within a freshness window, revalidate in the background
+    within a stale window, and fall back to the last good value when a refresh
+    fails or runs past its time budget."""
+
+    def __init__(self, fresh_for: float, stale_for: float, refresh_timeout: float):
+        self.fresh_for = fresh_for
+        self.stale_for = stale_for
+        self.refresh_timeout = refresh_timeout
+        self._entries: Dict[Any, dict] = {}
+
+    async def get(self, key, fn) -> Tuple[Any, dict]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry["stored_at"]
+            if age <= self.fresh_for:
+                return entry["value"], self._meta(entry, "fresh")
+            if age <= self.fresh_for + self.stale_for:
+                spawn_background(self._refresh_quietly(key, fn))
+                return entry["value"], self._meta(entry, "stale")
+        
+        refresh = asyncio.ensure_future(self._refresh(key, fn))
+        if entry is None:
+            # Nothing to fall back on, so a cold cache waits for the computation
+            value = await refresh
+            return value, self._meta(self._entries[key], "fresh")
+        
+        try:
+            value = await asyncio.wait_for(asyncio.shield(refresh), timeout=self.refresh_timeout)
+            return value, self._meta(self._entries[key], "fresh")
+        except Exception as exc:
+            if isinstance(exc, asyncio.TimeoutError):
+                # Let the slow refresh finish in the background and repopulate the cache
+                refresh.add_done_callback(self._log_refresh_failure)
+                entry["last_error"] = f"Refresh exceeded {self.refresh_timeout:g}s time budget"
+            else:
+                entry["last_error"] = str(exc)
+            logger.warning(f"Serving degraded cache entry for {key}: {entry['last_error']}")
+            return entry["value"], self._meta(entry, "degraded")
+
+    async def _refresh(self, key, fn):
+        async def compute():
+            value = await fn()
+            self._entries[key] = {
+                "value": value,
+                "stored_at": time.monotonic(),
+                "generated_at": datetime.now(timezone.utc),
+                "last_error": None
+            }
+            return value
+        return await single_flight.do(("swr",) + tuple(key), compute)
+
+    async def _refresh_quietly(self, key, fn):
+        try:
+            await self._refresh(key, fn)
+        except Exception as exc:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["last_error"] = str(exc)
+            logger.warning(f"Background refresh failed for {key}: {exc}")
+
+    @staticmethod
+    def _log_refresh_failure(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Background refresh failed: {future.exception()}")
+
+    @staticmethod
+    def _meta(entry: dict, state: str) -> dict:
+        return {
+            "status": state,
+            "stale": state != "fresh",
+            "generated_at": entry["generated_at"],
+            "age_seconds": round(time.monotonic() - entry["stored_at"], 1),
+            "last_error": entry.get("last_error")
+        }
+
+analytics_cache = StaleWhileRevalidateCache(
+    fresh_for=ANALYTICS_FRESH_SECONDS,
+    stale_for=ANALYTICS_STALE_SECONDS,
+    refresh_timeout=ANALYTICS_REFRESH_TIMEOUT_SECONDS
+)
+
+# Durable job queue backed by the jobs collection. Workers claim jobs with a
+# lease that a heartbeat keeps extending; a job whose lease lapses (the worker
+# died or the server restarted) is claimed again by the next free worker.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get("JOB_POLL_INTERVAL_SECONDS", "2"))
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get("JOB_RETRY_BASE_SECONDS", "10"))
+JOB_RETRY_MAX_SECONDS = float(os.environ.get("JOB_RETRY_MAX_SECONDS", "3600"))
+JOB_RETENTION_DAYS = float(os.environ.get("JOB_RETENTION_DAYS", "7"))
+
+def parse_job_concurrency(value: str) -> Dict[str, int]:
+    """Parse per-type concurrency overrides such as "export=2,bulk_action=1" """
+    limits = {}
+    for item in value.split(","):
+        job_type, _, limit = item.partition("=")
+        if job_type.strip() and limit.strip():
+            limits[job_type.strip()] = max(1, int(limit))
+    return limits
+
+JOB_TYPE_CONCURRENCY = parse_job_concurrency(os.environ.get("JOB_TYPE_CONCURRENCY", ""))
+
+class QueuedJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    type: str
+    payload: dict = {}
+    priority: int = 0  # Higher runs first
+    status: str = "queued"  # queued, running, succeeded, failed
+    attempts: int = 0
+    max_attempts: int = JOB_MAX_ATTEMPTS
+    run_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    lease_expires_at: Optional[datetime] = None
+    worker_id: Optional[str] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+
+JOB_HANDLERS: Dict[str, dict] = {}
+
+def job_handler(job_type: str, concurrency: int = 1, on_retry=None):
+    """Register a coroutine ``handler(payload, job)`` for a job type.
+    
+    ``JOB_TYPE_CONCURRENCY`` overrides the default concurrency per type. ``on_retry(payload)``
+    reopens the job's own status document when an admin retries a failed job.
+    """
+    def register(fn):
+        JOB_HANDLERS[job_type] = {
+            "handler": fn,
+            "concurrency": JOB_TYPE_CONCURRENCY.get(job_type, concurrency),
+            "on_retry": on_retry
+        }
+        return fn
+    return register
+
+def is_final_attempt(job: dict) -> bool:
+    return job["attempts"] >= job["max_attempts"]
+
+def job_retry_delay(attempts: int) -> float:
+    return min(JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), JOB_RETRY_MAX_SECONDS)
+
+async def enqueue_job(job_type: str, payload: dict, priority: int = 0, max_attempts: Optional[int] = None) -> QueuedJob:
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+    job = QueuedJob(type=job_type, payload=payload, priority=priority, max_attempts=max_attempts or JOB_MAX_ATTEMPTS)
+    await db.jobs.insert_one(job.dict())
+    job_pool.notify()
+    return job
+
+async def enqueue_unique_job(job_id: str, job_type: str, payload: dict) -> bool:
+    """Enqueue a job under a fixed id; the unique index turns the same call from every
+    worker into a single job. Returns whether this call enqueued it."""
+    job = QueuedJob(id=job_id, type=job_type, payload=payload)
+    try:
+        await db.jobs.insert_one(job.dict())
+    except DuplicateKeyError:
+        return False
+    job_pool.notify()
+    return True
+
+async def enqueue_periodic_job(job_type: str, payload: dict, interval_seconds: float) -> bool:
+    """Enqueue the job for the current interval unless a worker already has"""
+    slot = int(time.time() // interval_seconds)
+    return await enqueue_unique_job(f"{job_type}:{slot}", job_type, payload)
+
+async def periodic_job_loop(job_type: str, payload: dict, interval_seconds: float):
+    while True:
+        try:
+            await enqueue_periodic_job(job_type, payload, interval_seconds)
+        except Exception:
+            logger.exception(f"Scheduling {job_type} job failed")
+        await asyncio.sleep(interval_seconds - time.time() % interval_seconds)
+
+class JobWorkerPool:
+    """Claim due jobs one at a time and run them as tasks, bounded by a total
+    worker count and by each job type's concurrency."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.worker_id = f"{os.uname().nodename}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._running: Dict[str, int] = {}
+        self._tasks = set()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._dispatcher = spawn_background(self._dispatch_loop())
+
+    async def stop(self):
+        if self._dispatcher:
+            self._dispatcher.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Hand interrupted jobs straight back rather than waiting for their leases to lapse
+        await db.jobs.update_many(
+            {"worker_id": self.worker_id, "status": "running"},
+            {
+                "$set": {"status": "queued", "run_at": datetime.now(timezone.utc), "lease_expires_at": None, "worker_id": None},
+                "$inc": {"attempts": -1}
+            }
+        )
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _claimable_types(self) -> List[str]:
+        if len(self._tasks) >= self.workers:
+            return []
+        return [job_type for job_type, spec in JOB_HANDLERS.items() if self._running.get(job_type, 0) < spec["concurrency"]]
+
+    async def _claim(self, job_types: List[str]) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        return await db.jobs.find_one_and_update(
+            {
+                "type": {"$in": job_types},
+                "$or": [
+                    {"status": "queued", "run_at": {"$lte": now}},
+                    {"status": "running", "lease_expires_at": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": self.worker_id,
+                    "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("priority", -1), ("run_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _dispatch_loop(self):
+        while True:
+            self._wakeup.clear()
+            job = None
+            job_types = self._claimable_types()
+            if job_types:
+                try:
+                    job = await self._claim(job_types)
+                except Exception as exc:
+                    logger.warning(f"Job claim failed: {exc}")
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            self._running[job["type"]] = self._running.get(job["type"], 0) + 1
+            task = asyncio.ensure_future(self._run(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _heartbeat(self, job_id: str, work: asyncio.Future, lease: dict):
+        """Extend the job's lease while it runs; cancel the work once the lease is lost.
+        
+        A failed renewal is retried on the next beat. If the lease would lapse before the
+        beat after that, or another worker already holds the job, the work is cancelled so
+        the job never runs on two workers at once.
+        """
+        interval = JOB_LEASE_SECONDS / 3
+        deadline = time.monotonic() + JOB_LEASE_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                result = await db.jobs.update_one(
+                    {"id": job_id, "worker_id": self.worker_id, "status": "running"},
+                    {"$set": {"lease_expires_at": datetime.now(timezone.utc) + timedelta(seconds=JOB_LEASE_SECONDS)}}
+                )
+            except Exception as exc:
+                if time.monotonic() + interval < deadline:
+                    logger.warning(f"Lease renewal for job {job_id} failed, retrying: {exc}")
+                    continue
+                logger.error(f"Job {job_id} lease is about to lapse after failed renewals, stopping it: {exc}")
+            else:
+                if result.matched_count:
+                    deadline = time.monotonic() + JOB_LEASE_SECONDS
+                    continue
+                logger.error(f"Job {job_id} lease was taken over by another worker, stopping it")
+            lease["lost"] = True
+            work.cancel()
+            return
+
+    async def _run(self, job: dict):
+        if job["attempts"] > job["max_attempts"]:
+            # Reclaimed after its final attempt lost its lease, most likely by crashing the worker
+            now = datetime.now(timezone.utc)
+            await db.jobs.update_one({"id": job["id"], "worker_id": self.worker_id}, {"$set": {
+                "status": "failed", "last_error": "Lease expired on the final attempt",
+                "lease_expires_at": None, "finished_at": now, "updated_at": now
+            }})
+            self._running[job["type"]] -= 1
+            self.notify()
+            return
+        
+        work = asyncio.ensure_future(JOB_HANDLERS[job["type"]]["handler"](job["payload"], job))
+        lease = {"lost": False}
+        heartbeat = asyncio.ensure_future(self._heartbeat(job["id"], work, lease))
+        owned = {"id": job["id"], "worker_id": self.worker_id}
+        try:
+            await work
+            finished_at = datetime.now(timezone.utc)
+            await db.jobs.update_one(owned, {"$set": {
+                "status": "succeeded", "lease_expires_at": None,
+                "finished_at": finished_at, "updated_at": finished_at
+            }})
+        except asyncio.CancelledError:
+            if not lease["lost"]:
+                raise
+            # The job belongs to whichever worker reclaims it once the lease lapses
+        except Exception as exc:
+            logger.exception(f"Job {job['id']} ({job['type']}) failed on attempt {job['attempts']}")
+            now = datetime.now(timezone.utc)
+            if is_final_attempt(job):
+                update = {"status": "failed", "finished_at": now}
+            else:
+                update = {"status": "queued", "run_at": now + timedelta(seconds=job_retry_delay(job["attempts"]))}
+            update.update({"last_error": str(exc), "lease_expires_at": None, "worker_id": None, "updated_at": now})
+            await db.jobs.update_one(owned, {"$set": update})
+        finally:
+            heartbeat.cancel()
+            work.cancel()
+            self._running[job["type"]] -= 1
+            self.notify()
+
+job_pool = JobWorkerPool(JOB_WORKERS)
+
+# Idempotency keys let clients on flaky networks retry writes safely. The first
+# request for a key records its response; retries with the same key replay it.
+IDEMPOTENCY_TTL_HOURS = float(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_CACHE_SECONDS = float(os.environ.get("IDEMPOTENCY_CACHE_SECONDS", "300"))
+IDEMPOTENCY_LOCK_SECONDS = float(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "10"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+_idempotency_responses = LRUCache(maxsize=10000, ttl=IDEMPOTENCY_CACHE_SECONDS)
+
+def request_fingerprint(body) -> str:
+    if isinstance(body, BaseModel):
+        body = body.dict()
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+
+def idempotent_response(record: dict, replayed: bool) -> JSONResponse:
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return JSONResponse(content=record["body"], status_code=record["status_code"], headers=headers)
+
+async def run_idempotent(idempotency_key: Optional[str], user: "User", route: str, body, fn):
+    """Run ``fn`` at most once per (user, route, Idempotency-Key).
+    
+    Without a key ``fn`` simply runs. Completed responses, including 4xx errors, are stored
+    and replayed; server errors release the key so the client can retry.
+    """
+    if idempotency_key is None:
+        return await fn()
+    if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+        )
+    
+    scope = f"{user.id}:{route}:{idempotency_key}"
+    fingerprint = request_fingerprint(body)
+    record = _idempotency_responses.get(scope)
+    executed = False
+    if record is None:
+        async def execute():
+            nonlocal executed
+            executed = True
+            return await execute_idempotent(scope, fingerprint, fn)
+        # Concurrent duplicates within this process share the first request's execution
+        record = await single_flight.do(("idempotency", scope), execute)
+    
+    if record["fingerprint"] != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request body"
+        )
+    return idempotent_response(record, replayed=not executed or record["replayed"])
+
+async def execute_idempotent(scope: str, fingerprint: str, fn) -> dict:
+    now = datetime.now(timezone.utc)
+    lock = {
+        "status": "in_progress",
+        "fingerprint": fingerprint,
+        "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+        "expires_at": now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+    }
+    stored = await claim_idempotency_key(scope, lock)
+    if stored is not None:
+        return stored
+    
+    try:
+        result = await fn()
+        record = {"status_code": status.HTTP_200_OK, "body": jsonable_encoder(result)}
+    except HTTPException as exc:
+        if exc.status_code >= 500:
+            await db.idempotency_keys.delete_one({"key": scope})
+            raise
+        record = {"status_code": exc.status_code, "body": {"detail": exc.detail}}
+    except BaseException:
+        await db.idempotency_keys.delete_one({"key": scope})
+        raise
+    
+    record.update({"fingerprint": fingerprint, "replayed": False})
+    await db.idempotency_keys.update_one(
+        {"key": scope},
+        {"$set": {"status": "completed", "status_code": record["status_code"], "body": record["body"]}}
+    )
+    _idempotency_responses.set(scope, {**record, "replayed": True})
+    return record
+
+async def claim_idempotency_key(scope: str, lock: dict) -> Optional[dict]:
+    """Take the key for this process, or return the stored response once another
+    process finishes with it. A holder whose lock lapsed is assumed dead and replaced."""
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.05
+    while True:
+        try:
+            await db.idempotency_keys.insert_one({"key": scope, "created_at": datetime.now(timezone.utc), **lock})
+            return None
+        except DuplicateKeyError:
+            pass
+        
+        stored = await db.idempotency_keys.find_one({"key": scope}, {"_id": 0})
+        if stored is None:
+            # The holder released the key after a server error
+            continue
+        if stored["status"] == "completed":
+            record = {
+                "status_code": stored["status_code"],
+                "body": stored["body"],
+                "fingerprint": stored["fingerprint"],
+                "replayed": True
+            }
+            _idempotency_responses.set(scope, record)
+            return record
+        
+        taken = await db.idempotency_keys.find_one_and_update(
+            {"key": scope, "status": "in_progress", "locked_until": {"$lt": datetime.now(timezone.utc)}},
+            {"$set": lock}
+        )
+        if taken is not None:
+            return None
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress"
+            )
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+# Append-only audit log. Events are buffered in memory and written in batches so
+# recording an action never adds a database round trip to the request.
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.environ.get("AUDIT_FLUSH_INTERVAL_SECONDS", "2"))
+AUDIT_MAX_BUFFERED = int(os.environ.get("AUDIT_MAX_BUFFERED", "50000"))
+
+class AuditLogEntry(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    action: str  # e.g. user.approve, user.role_change, user.delete, report.approve
+    actor_id: str
+    target_type: str
+    target_id: str
+    details: dict = {}
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class AuditLogWriter:
+    """Buffer audit events and flush them with insert_many when a batch fills or the
+    flush interval passes. The buffer is bounded; events beyond it are counted and dropped."""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_buffered: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.written = 0
+        self.dropped = 0
+        self._buffer = deque()
+        self._batch_ready = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, action: str, actor_id: str, target_type: str, target_id: str, details: Optional[dict] = None):
+        if len(self._buffer) >= self.max_buffered:
+            self.dropped += 1
+            return
+        self._buffer.append(AuditLogEntry(
+            action=action, actor_id=actor_id, target_type=target_type, target_id=target_id, details=details or {}
+        ).dict())
+        if len(self._buffer) >= self.batch_size:
+            self._batch_ready.set()
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def start(self):
+        self._task = spawn_background(self._flush_loop())
+
+    async def stop(self):
+        """Let the flush loop finish its current write, then flush whatever is left"""
+        self._stopping = True
+        self._batch_ready.set()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+
+    async def _flush_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            if self._stopping:
+                return
+            await self.flush()
+
+    def _requeue(self, batch: List[dict]):
+        room = self.max_buffered - len(self._buffer)
+        self.dropped += max(len(batch) - room, 0)
+        self._buffer.extendleft(reversed(batch[:room]))
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                try:
+                    await db.audit_logs.insert_many(batch, ordered=False)
+                except asyncio.CancelledError:
+                    # Keep the in-flight batch for the final flush; ids make a repeat insert safe
+                    self._requeue(batch)
+                    raise
+                except BulkWriteError as exc:
+                    # Entries that did get written are not retried; ids make a retry safe anyway
+                    self.written += exc.details.get("nInserted", 0)
+                    logger.warning(f"Audit log flush partially failed: {len(exc.details.get('writeErrors', []))} errors")
+                except Exception as exc:
+                    # Put the batch back and try again on the next tick
+                    self._requeue(batch)
+                    logger.warning(f"Audit log flush failed, {len(self._buffer)} events buffered: {exc}")
+                    return
+                else:
+                    self.written += len(batch)
+            if self.dropped:
+                logger.warning(f"Audit log buffer full, {self.dropped} events dropped so far")
+
+audit_log = AuditLogWriter(AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_SECONDS, AUDIT_MAX_BUFFERED)
+
 # Database initialization
 async def init_database():
     # Create indexes
@@ -290,10 +1494,13 @@ async def init_database():
     
     # New indexes for reporting
     await db.report_templates.create_index([("name", 1)], unique=True)
+    await db.report_submissions.create_index([("id", 1)], unique=True)
     await db.report_submissions.create_index([("user_id", 1)])
     await db.report_submissions.create_index([("template_id", 1)])
     await db.report_submissions.create_index([("report_period", 1)])
     await db.report_submissions.create_index([("user_id", 1), ("template_id", 1), ("report_period", 1)], unique=True)
+    await db.report_submissions.create_index([("template_id", 1), ("report_period", 1), ("location_id", 1)])
+    await db.report_submissions.create_index([("template_id", 1), ("report_period", 1), ("status", 1), ("user_id", 1)])
     
     # Enhanced Stage 3 indexes
     await db.dynamic_fields.create_index([("section", 1)])
@@ -307,6 +1514,42 @@ async def init_database():
     await db.report_submissions.create_index([("created_at", -1)])
     await db.report_submissions.create_index([("submitted_at", -1)])
     
+    # Incremental export watermarks and deletion tombstones
+    await db.report_submissions.create_index([("updated_at", 1), ("id", 1)])
+    await db.report_tombstones.create_index([("updated_at", 1), ("id", 1)])
+    await db.report_tombstones.create_index([("deleted_at", 1)], expireAfterSeconds=TOMBSTONE_RETENTION_DAYS * 86400)
+    
+    # Report revision history
+    await db.report_revisions.create_index([("report_id", 1), ("revision", 1)], unique=True)
+    await db.report_revisions.create_index([("report_id", 1), ("kind", 1), ("revision", -1)])
+    await db.report_revisions.create_index([("created_at", 1)])
+    
+    # Filter-based bulk action jobs
+    await db.bulk_action_jobs.create_index([("id", 1)], unique=True)
+    await db.bulk_action_jobs.create_index([("status", 1), ("created_at", 1)])
+    
+    # Background export jobs; documents are also expired by Mongo as a backstop to the artifact sweeper
+    await db.export_jobs.create_index([("id", 1)], unique=True)
+    await db.export_jobs.create_index([("status", 1), ("created_at", 1)])
+    await db.export_jobs.create_index([("expires_at", 1)], expireAfterSeconds=int(EXPORT_CLEANUP_INTERVAL_SECONDS) * 2)
+    
+    # Job queue: claim order, lapsed-lease recovery, and retention of finished jobs
+    await db.jobs.create_index([("id", 1)], unique=True)
+    await db.jobs.create_index([("type", 1), ("status", 1), ("priority", -1), ("run_at", 1)])
+    await db.jobs.create_index([("status", 1), ("lease_expires_at", 1)])
+    await db.jobs.create_index([("finished_at", 1)], expireAfterSeconds=int(JOB_RETENTION_DAYS * 86400))
+    
+    # Idempotency keys expire at their own expires_at
+    await db.idempotency_keys.create_index([("key", 1)], unique=True)
+    await db.idempotency_keys.create_index([("expires_at", 1)], expireAfterSeconds=0)
+    
+    # Audit log lookups by time, actor, target and action
+    await db.audit_logs.create_index([("id", 1)], unique=True)
+    await db.audit_logs.create_index([("created_at", -1)])
+    await db.audit_logs.create_index([("actor_id", 1), ("created_at", -1)])
+    await db.audit_logs.create_index([("target_type", 1), ("target_id", 1), ("created_at", -1)])
+    await db.audit_logs.create_index([("action", 1), ("created_at", -1)])
+    
     # Text search index for report data
     try:
         await db.report_submissions.create_index([
@@ -492,6 +1735,15 @@ async def init_database():
         }
         await db.report_templates.insert_one(default_template)
         logger.info("Default report template created: Monthly Progress Report")
+    
+    # Immutable template versions
+    await db.report_template_versions.create_index([("template_id", 1), ("version", 1)], unique=True)
+    await db.report_templates.create_index([("dynamic_field_ids", 1)])
+    await backfill_template_versions()
+    
+    # Data keys per template for exports
+    await db.report_data_keys.create_index([("template_id", 1), ("key", 1)], unique=True)
+    await schedule_report_data_keys_backfill()
 
 # Authentication routes
 @api_router.post("/auth/register", response_model=UserResponse)
@@ -522,6 +1774,7 @@ async def register(user_data: UserCreate):
     
     new_user = User(**user_dict)
     await db.users.insert_one(new_user.dict())
+    invalidate_user_directory()
     
     return UserResponse(**new_user.dict())
 
@@ -585,11 +1838,13 @@ async def approve_user(user_id: str, current_user: User = Depends(get_admin_user
         {"id": user_id},
         {"$set": {"approved": True}}
     )
+    invalidate_user_directory()
     if result.matched_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    audit_log.record("user.approve", current_user.id, "user", user_id)
     return {"message": "User approved successfully"}
 
 @api_router.put("/admin/users/{user_id}/role")
@@ -604,11 +1859,13 @@ async def update_user_role(user_id: str, role_data: dict, current_user: User = D
         {"id": user_id},
         {"$set": {"role": role_data["role"]}}
     )
+    invalidate_user_directory()
     if result.matched_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    audit_log.record("user.role_change", current_user.id, "user", user_id, {"role": role_data["role"]})
     return {"message": f"User role updated to {role_data['role']} successfully"}
 
 @api_router.delete("/admin/users/{user_id}")
@@ -621,11 +1878,13 @@ async def delete_user(user_id: str, current_user: User = Depends(get_admin_user)
         )
     
     result = await db.users.delete_one({"id": user_id})
+    invalidate_user_directory()
     if result.deleted_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    audit_log.record("user.delete", current_user.id, "user", user_id)
     return {"message": "User deleted successfully"}
 
 # Admin routes - Location Management
@@ -676,6 +1935,28 @@ async def delete_location(location_id: str, current_user: User = Depends(get_adm
         )
     return {"message": "Location deleted successfully"}
 
+async def on_dynamic_field_changed(field_id: str, actor_id: str):
+    """Give every active template that references the field a new version and refresh only those in the cache.
+    
+    Inactive templates are left alone: reactivating one is an update, which records a new
+    version with the field definitions current at that time.
+    """
+    dynamic_field_resolver.invalidate_field(field_id)
+    referencing = await db.report_templates.distinct("id", {"dynamic_field_ids": field_id, "active": True})
+    bumped = []
+    for template_id in referencing:
+        template = await db.report_templates.find_one_and_update(
+            {"id": template_id, "active": True},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if template is None:
+            continue  # Deactivated since the lookup
+        await snapshot_template_version(template, actor_id)
+        bumped.append(template)
+    await template_cache.refresh_resolved(bumped)
+
 # Enhanced Stage 3: Dynamic Field Management APIs (Admin Only)
 @api_router.get("/admin/dynamic-fields", response_model=List[DynamicField])
 async def get_all_dynamic_fields(current_user: User = Depends(get_admin_user), include_deleted: bool = False):
@@ -708,6 +1989,8 @@ async def create_dynamic_field(field_data: DynamicFieldCreate, current_user: Use
             detail="Choices must be provided for dropdown and multiselect fields"
         )
     
+    ensure_valid_rules([field_data.dict()])
+    
     new_field = DynamicField(
         **field_data.dict(),
         created_by=current_user.id
@@ -737,6 +2020,7 @@ async def update_dynamic_field(field_id: str, field_data: DynamicFieldUpdate, cu
     
     # Prepare update data
     update_data = {k: v for k, v in field_data.dict().items() if v is not None}
+    ensure_valid_rules([{**existing_field, **update_data}])
     update_data["updated_at"] = datetime.now(timezone.utc)
     
     await db.dynamic_fields.update_one(
@@ -744,6 +2028,8 @@ async def update_dynamic_field(field_id: str, field_data: DynamicFieldUpdate, cu
         {"$set": update_data}
     )
     
+    await on_dynamic_field_changed(field_id, current_user.id)
+    
     updated_field = await db.dynamic_fields.find_one({"id": field_id})
     return DynamicField(**updated_field)
 
@@ -759,6 +2045,7 @@ async def soft_delete_dynamic_field(field_id: str, current_user: User = Depends(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Dynamic field not found"
         )
+    await on_dynamic_field_changed(field_id, current_user.id)
     return {"message": "Dynamic field deleted successfully"}
 
 @api_router.post("/admin/dynamic-fields/{field_id}/restore")
@@ -773,11 +2060,17 @@ async def restore_dynamic_field(field_id: str, current_user: User = Depends(get_
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Dynamic field not found"
         )
+    await on_dynamic_field_changed(field_id, current_user.id)
     return {"message": "Dynamic field restored successfully"}
 
 # Admin routes - System Statistics (backward compatibility)
 @api_router.get("/admin/stats")
 async def get_system_stats(current_user: User = Depends(get_admin_user)):
+    return await single_flight.do(
+        single_flight_key("admin/stats"), compute_system_stats, retain=SINGLE_FLIGHT_RETENTION_SECONDS
+    )
+
+async def compute_system_stats():
     total_users = await db.users.count_documents({})
     approved_users = await db.users.count_documents({"approved": True})
     pending_users = await db.users.count_documents({"approved": False})
@@ -828,37 +2121,29 @@ async def create_template_from_dynamic_fields(
             detail="Some selected fields were not found or are deleted"
         )
     
-    # Convert dynamic fields to report fields
-    report_fields = []
-    for i, field in enumerate(selected_fields):
-        report_field = {
-            "id": str(uuid.uuid4()),
-            "name": field["label"].lower().replace(" ", "_"),
-            "label": field["label"],
-            "field_type": field["field_type"],
-            "required": False,  # Default to not required, can be customized
-            "options": field.get("choices"),
-            "placeholder": field.get("placeholder"),
-            "validation": field.get("validation"),
-            "order": i + 1
-        }
-        report_fields.append(report_field)
-    
-    # Create the new template
+    # Reference the fields so later edits propagate; their data keys are fixed now
+    fields_by_id = {field["id"]: field for field in selected_fields}
     new_template = ReportTemplate(
         name=request.template_name,
         description=request.template_description,
-        fields=report_fields,
+        dynamic_field_ids=request.field_ids,
+        dynamic_field_names={field_id: dynamic_field_name(fields_by_id[field_id]) for field_id in request.field_ids},
         created_by=current_user.id
     )
     
     await db.report_templates.insert_one(new_template.dict())
-    return new_template
+    await snapshot_template_version(new_template.dict(), current_user.id)
+    invalidate_template_cache(new_template.id)
+    return ReportTemplate(**await dynamic_field_resolver.resolve(new_template.dict()))
 
 # System Analytics and Enhanced Statistics
 @api_router.get("/admin/analytics")
 async def get_system_analytics(current_user: User = Depends(get_admin_user)):
     """Get enhanced system analytics and metrics"""
+    analytics, cache_meta = await analytics_cache.get(single_flight_key("admin/analytics"), compute_system_analytics)
+    return {**analytics, "cache": cache_meta}
+
+async def compute_system_analytics():
     # Basic user and location stats
     total_users = await db.users.count_documents({})
     approved_users = await db.users.count_documents({"approved": True})
@@ -930,49 +2215,443 @@ async def get_system_analytics(current_user: User = Depends(get_admin_user)):
         "submission_rate": round((submitted_reports / total_reports * 100) if total_reports > 0 else 0, 1)
     }
 
-# Report Templates for Users (Enhanced)
-@api_router.get("/report-templates/enhanced", response_model=List[ReportTemplate])
-async def get_enhanced_report_templates(current_user: User = Depends(get_current_user)):
-    """Get active report templates with enhanced metadata"""
-    templates = await db.report_templates.find({"active": True}).to_list(1000)
-    return [ReportTemplate(**template) for template in templates]
+# Choice-distribution analytics for dropdown/multiselect fields
+CHOICE_FIELD_TYPES = ("dropdown", "multiselect")
 
-# Report Template Management APIs (Admin Only)
-@api_router.get("/admin/report-templates", response_model=List[ReportTemplate])
-async def get_all_report_templates(current_user: User = Depends(get_admin_user)):
-    templates = await db.report_templates.find().to_list(1000)
-    return [ReportTemplate(**template) for template in templates]
+_choice_distribution_cache = LRUCache(maxsize=512)
 
-@api_router.post("/admin/report-templates", response_model=ReportTemplate)
-async def create_report_template(template_data: ReportTemplateCreate, current_user: User = Depends(get_admin_user)):
-    # Check if template name already exists
-    existing_template = await db.report_templates.find_one({"name": template_data.name})
-    if existing_template:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Report template name already exists"
-        )
-    
-    # Convert fields to include IDs
-    fields_with_ids = []
-    for field in template_data.fields:
-        field_dict = field.dict()
-        field_dict["id"] = str(uuid.uuid4())
-        fields_with_ids.append(field_dict)
-    
-    new_template = ReportTemplate(
-        **template_data.dict(exclude={"fields"}),
-        fields=fields_with_ids,
-        created_by=current_user.id
-    )
-    await db.report_templates.insert_one(new_template.dict())
-    return new_template
+async def get_template_choice_fields(template: dict) -> List[dict]:
+    """Collect dropdown/multiselect fields of a template with their declared choices"""
+    template = await dynamic_field_resolver.resolve(template)
+    return [
+        {
+            "name": field["name"],
+            "label": field.get("label", field["name"]),
+            "field_type": field["field_type"],
+            "choices": field.get("options") or []
+        }
+        for field in sorted(template.get("fields", []), key=lambda f: f.get("order", 0))
+        if field.get("field_type") in CHOICE_FIELD_TYPES
+    ]
 
-@api_router.put("/admin/report-templates/{template_id}", response_model=ReportTemplate)
-async def update_report_template(template_id: str, template_data: ReportTemplateUpdate, current_user: User = Depends(get_admin_user)):
-    # Check if template exists
-    existing_template = await db.report_templates.find_one({"id": template_id})
-    if not existing_template:
+@api_router.get("/admin/analytics/choice-distribution")
+async def get_choice_distribution(
+    template_id: str,
+    current_user: User = Depends(get_admin_user),
+    report_period: Optional[str] = None,
+    location_id: Optional[str] = None,
+    report_status: Optional[str] = Query(None, alias="status")
+):
+    """Per-choice counts for dropdown/multiselect fields, broken down by period and location"""
+    template = await db.report_templates.find_one({"id": template_id})
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report template not found"
+        )
+    
+    template = await dynamic_field_resolver.resolve(template)
+    cache_key = (
+        template_id, report_period, location_id, report_status,
+        template.get("updated_at"), template.get("fields_stamp"), submission_generation(template_id, report_period)
+    )
+    cached = _choice_distribution_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    choice_fields = await get_template_choice_fields(template)
+    
+    match = {"template_id": template_id}
+    if report_period:
+        match["report_period"] = report_period
+    if location_id:
+        match["location_id"] = location_id
+    if report_status:
+        match["status"] = report_status
+    
+    facet_results = {}
+    if choice_fields:
+        facets = {}
+        for index, field in enumerate(choice_fields):
+            facets[f"f{index}"] = [
+                {"$project": {"_id": 0, "report_period": 1, "location_id": 1, "value": f"$data.{field['name']}"}},
+                # Scalar values unwind as single-element arrays, so dropdowns and multiselects share a pipeline
+                {"$unwind": "$value"},
+                {"$group": {
+                    "_id": {"report_period": "$report_period", "location_id": "$location_id", "value": "$value"},
+                    "count": {"$sum": 1}
+                }}
+            ]
+        pipeline = [{"$match": match}, {"$facet": facets}]
+        aggregated = await db.report_submissions.aggregate(pipeline).to_list(1)
+        facet_results = aggregated[0] if aggregated else {}
+    
+    locations = await db.locations.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(1000)
+    location_names = {location["id"]: location["name"] for location in locations}
+    
+    fields_output = []
+    for index, field in enumerate(choice_fields):
+        choices = field["choices"]
+        choice_set = set(choices)
+        totals = {choice: 0 for choice in choices}
+        other_total = 0
+        breakdown = {}
+        for row in facet_results.get(f"f{index}", []):
+            group = row["_id"]
+            value = str(group.get("value"))
+            bucket_key = (group.get("report_period"), group.get("location_id"))
+            bucket = breakdown.get(bucket_key)
+            if bucket is None:
+                bucket = breakdown[bucket_key] = {
+                    "report_period": bucket_key[0],
+                    "location_id": bucket_key[1],
+                    "location_name": location_names.get(bucket_key[1]),
+                    "counts": {choice: 0 for choice in choices},
+                    "other": 0
+                }
+            if value in choice_set:
+                bucket["counts"][value] += row["count"]
+                totals[value] += row["count"]
+            else:
+                bucket["other"] += row["count"]
+                other_total += row["count"]
+        
+        fields_output.append({
+            "name": field["name"],
+            "label": field["label"],
+            "field_type": field["field_type"],
+            "choices": choices,
+            "totals": totals,
+            "other": other_total,
+            "breakdown": sorted(
+                breakdown.values(),
+                key=lambda b: (b["report_period"] or "", b["location_name"] or "")
+            )
+        })
+    
+    result = {
+        "template_id": template_id,
+        "template_name": template["name"],
+        "filters": {"report_period": report_period, "location_id": location_id, "status": report_status},
+        "fields": fields_output,
+        "generated_at": datetime.now(timezone.utc)
+    }
+    _choice_distribution_cache.set(cache_key, result)
+    return result
+
+# Field completion-rate analytics
+_field_completion_memo = LRUCache(maxsize=256)
+
+def current_report_period() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m")
+
+def is_closed_period(report_period: str) -> bool:
+    """Periods before the current month no longer receive routine submissions"""
+    return report_period < current_report_period()
+
+@api_router.get("/admin/analytics/field-completion")
+async def get_field_completion(
+    template_id: str,
+    current_user: User = Depends(get_admin_user),
+    report_period: Optional[str] = None,
+    report_status: Optional[str] = Query(None, alias="status")
+):
+    """Fill rate of every template field per report period"""
+    template = await db.report_templates.find_one({"id": template_id})
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report template not found"
+        )
+    
+    template = await dynamic_field_resolver.resolve(template)
+    fields = sorted(template.get("fields", []), key=lambda f: f.get("order", 0))
+    field_names = [field["name"] for field in fields]
+    
+    # Closed periods are memoized per template/status/schema and revalidated via the
+    # period-scoped submission generation, so only open or changed periods are aggregated.
+    memo_key = (template_id, report_status, template.get("updated_at"), template.get("fields_stamp"))
+    memo = _field_completion_memo.get(memo_key)
+    if memo is None:
+        memo = {}
+        _field_completion_memo.set(memo_key, memo)
+    
+    requested_periods = [report_period] if report_period else None
+    memoized = {
+        period: entry["row"]
+        for period, entry in memo.items()
+        if (requested_periods is None or period in requested_periods)
+        and entry["generation"] == submission_generation(template_id, period)
+    }
+    
+    rows = dict(memoized)
+    if not (report_period and report_period in memoized):
+        match = {"template_id": template_id}
+        if report_period:
+            match["report_period"] = report_period
+        elif memoized:
+            match["report_period"] = {"$nin": list(memoized)}
+        if report_status:
+            match["status"] = report_status
+        
+        pipeline = [
+            {"$match": match},
+            {"$project": {
+                "_id": 0,
+                "report_period": 1,
+                "filled": {"$filter": {
+                    "input": {"$objectToArray": {"$ifNull": ["$data", {}]}},
+                    "as": "entry",
+                    "cond": {"$and": [
+                        {"$ne": ["$$entry.v", None]},
+                        {"$ne": ["$$entry.v", ""]},
+                        {"$ne": ["$$entry.v", []]}
+                    ]}
+                }}
+            }},
+            {"$facet": {
+                "totals": [
+                    {"$group": {"_id": "$report_period", "total": {"$sum": 1}}}
+                ],
+                "filled": [
+                    {"$unwind": "$filled"},
+                    {"$match": {"filled.k": {"$in": field_names}}},
+                    {"$group": {
+                        "_id": {"report_period": "$report_period", "field": "$filled.k"},
+                        "count": {"$sum": 1}
+                    }}
+                ]
+            }}
+        ]
+        aggregated = await db.report_submissions.aggregate(pipeline).to_list(1)
+        facets = aggregated[0] if aggregated else {"totals": [], "filled": []}
+        
+        filled_counts = {}
+        for row in facets["filled"]:
+            filled_counts[(row["_id"]["report_period"], row["_id"]["field"])] = row["count"]
+        
+        for total_row in facets["totals"]:
+            period = total_row["_id"]
+            total = total_row["total"]
+            row = {
+                "report_period": period,
+                "submissions": total,
+                "fields": [
+                    {
+                        "name": field["name"],
+                        "label": field.get("label", field["name"]),
+                        "required": field.get("required", False),
+                        "filled": filled_counts.get((period, field["name"]), 0),
+                        "fill_rate": round(filled_counts.get((period, field["name"]), 0) / total * 100, 1) if total else 0
+                    }
+                    for field in fields
+                ]
+            }
+            rows[period] = row
+            if period and is_closed_period(period):
+                memo[period] = {"generation": submission_generation(template_id, period), "row": row}
+    
+    periods = [
+        dict(row, closed=bool(row["report_period"]) and is_closed_period(row["report_period"]))
+        for _, row in sorted(rows.items(), key=lambda item: item[0] or "", reverse=True)
+    ]
+    return {
+        "template_id": template_id,
+        "template_name": template["name"],
+        "filters": {"report_period": report_period, "status": report_status},
+        "periods": periods
+    }
+
+# Submission compliance: approved users without a submitted report
+COMPLETED_REPORT_STATUSES = ["submitted", "reviewed", "approved"]
+
+def bitset_from_indexes(indexes, size: int) -> int:
+    """Pack member indexes into an int bitset"""
+    buffer = bytearray((size + 7) // 8)
+    for index in indexes:
+        buffer[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(buffer, "little")
+
+def bitset_indexes(bitset: int) -> List[int]:
+    """Unpack an int bitset into sorted member indexes"""
+    indexes = []
+    for byte_index, byte in enumerate(bitset.to_bytes((bitset.bit_length() + 7) // 8, "little")):
+        while byte:
+            low_bit = byte & -byte
+            indexes.append((byte_index << 3) + low_bit.bit_length() - 1)
+            byte ^= low_bit
+    return indexes
+
+class ApprovedUserDirectory:
+    """Snapshot of approved reporting users with per-location membership bitsets"""
+
+    def __init__(self, users: List[dict]):
+        self.users = users
+        self.index = {user["id"]: position for position, user in enumerate(users)}
+        by_location: Dict[Optional[str], List[int]] = {}
+        for position, user in enumerate(users):
+            by_location.setdefault(user.get("location_id"), []).append(position)
+        self.location_masks = {
+            location_id: bitset_from_indexes(positions, len(users))
+            for location_id, positions in by_location.items()
+        }
+
+    def mask_for(self, user_ids) -> int:
+        return bitset_from_indexes(
+            (self.index[user_id] for user_id in user_ids if user_id in self.index),
+            len(self.users)
+        )
+
+    def members(self, bitset: int) -> List[dict]:
+        return [self.users[position] for position in bitset_indexes(bitset)]
+
+# Writes in this process invalidate the directory at once; the age limit bounds how
+# long approvals and deletions made through other workers take to show up
+USER_DIRECTORY_CACHE_SECONDS = float(os.environ.get("USER_DIRECTORY_CACHE_SECONDS", "60"))
+
+_user_directory: Dict[str, Any] = {"generation": 0, "directory": None, "built_for": None, "built_at": 0.0}
+
+def invalidate_user_directory():
+    _user_directory["generation"] += 1
+
+async def get_approved_user_directory() -> ApprovedUserDirectory:
+    if time.monotonic() - _user_directory["built_at"] > USER_DIRECTORY_CACHE_SECONDS:
+        invalidate_user_directory()
+    generation = _user_directory["generation"]
+    if _user_directory["directory"] is None or _user_directory["built_for"] != generation:
+        await single_flight.do(("user_directory", generation), lambda: build_user_directory(generation))
+    return _user_directory["directory"]
+
+async def build_user_directory(generation: int):
+    built_at = time.monotonic()
+    users = await db.users.find(
+        {"approved": True, "role": "USER"},
+        {"_id": 0, "id": 1, "username": 1, "email": 1, "location_id": 1}
+    ).sort("username", 1).to_list(None)
+    _user_directory["directory"] = ApprovedUserDirectory(users)
+    _user_directory["built_for"] = generation
+    _user_directory["built_at"] = built_at
+
+@api_router.get("/admin/compliance")
+async def get_submission_compliance(
+    template_id: str,
+    report_period: str,
+    current_user: User = Depends(get_admin_user),
+    location_id: Optional[str] = None,
+    include_users: bool = True
+):
+    """Approved users per location who have not submitted a report for a template/period"""
+    template = await db.report_templates.find_one({"id": template_id}, {"_id": 0, "id": 1, "name": 1})
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report template not found"
+        )
+    
+    directory = await get_approved_user_directory()
+    
+    # Covered by the (template_id, report_period, status, user_id) index
+    submitted_user_ids = await db.report_submissions.distinct("user_id", {
+        "template_id": template_id,
+        "report_period": report_period,
+        "status": {"$in": COMPLETED_REPORT_STATUSES}
+    })
+    submitted_mask = directory.mask_for(submitted_user_ids)
+    
+    locations = await db.locations.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(1000)
+    location_names = {location["id"]: location["name"] for location in locations}
+    
+    location_ids = [location_id] if location_id else list(directory.location_masks)
+    breakdown = []
+    totals = {"expected": 0, "submitted": 0, "missing": 0}
+    for loc_id in location_ids:
+        location_mask = directory.location_masks.get(loc_id, 0)
+        missing_mask = location_mask & ~submitted_mask
+        expected = bin(location_mask).count("1")
+        missing = bin(missing_mask).count("1")
+        entry = {
+            "location_id": loc_id,
+            "location_name": location_names.get(loc_id, "Unassigned" if loc_id is None else "Unknown Location"),
+            "expected": expected,
+            "submitted": expected - missing,
+            "missing": missing,
+            "compliance_rate": round((expected - missing) / expected * 100, 1) if expected else 100.0
+        }
+        if include_users:
+            entry["missing_users"] = [
+                {"id": user["id"], "username": user["username"], "email": user.get("email")}
+                for user in directory.members(missing_mask)
+            ]
+        breakdown.append(entry)
+        totals["expected"] += expected
+        totals["submitted"] += expected - missing
+        totals["missing"] += missing
+    
+    breakdown.sort(key=lambda entry: (-entry["missing"], entry["location_name"]))
+    return {
+        "template_id": template_id,
+        "template_name": template["name"],
+        "report_period": report_period,
+        **totals,
+        "compliance_rate": round(totals["submitted"] / totals["expected"] * 100, 1) if totals["expected"] else 100.0,
+        "locations": breakdown
+    }
+
+# Report Templates for Users (Enhanced)
+@api_router.get("/report-templates/enhanced", response_model=List[ReportTemplate])
+async def get_enhanced_report_templates(request: Request, current_user: User = Depends(get_current_user)):
+    """Get active report templates with enhanced metadata"""
+    return await active_templates_response(request)
+
+# Report Template Management APIs (Admin Only)
+@api_router.get("/admin/report-templates", response_model=List[ReportTemplate])
+async def get_all_report_templates(current_user: User = Depends(get_admin_user)):
+    templates = await db.report_templates.find().to_list(1000)
+    return [ReportTemplate(**template) for template in await resolve_templates(templates)]
+
+@api_router.post("/admin/report-templates", response_model=ReportTemplate)
+async def create_report_template(
+    template_data: ReportTemplateCreate,
+    current_user: User = Depends(get_admin_user),
+    idempotency_key: Optional[str] = Header(None)
+):
+    return await run_idempotent(
+        idempotency_key, current_user, "POST /admin/report-templates", template_data,
+        lambda: insert_report_template(template_data, current_user)
+    )
+
+async def insert_report_template(template_data: ReportTemplateCreate, current_user: User) -> ReportTemplate:
+    # Check if template name already exists
+    existing_template = await db.report_templates.find_one({"name": template_data.name})
+    if existing_template:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Report template name already exists"
+        )
+    ensure_valid_rules([field.dict() for field in template_data.fields])
+    
+    # Convert fields to include IDs
+    fields_with_ids = []
+    for field in template_data.fields:
+        field_dict = field.dict()
+        field_dict["id"] = str(uuid.uuid4())
+        fields_with_ids.append(field_dict)
+    
+    new_template = ReportTemplate(
+        **template_data.dict(exclude={"fields"}),
+        fields=fields_with_ids,
+        created_by=current_user.id
+    )
+    await db.report_templates.insert_one(new_template.dict())
+    await snapshot_template_version(new_template.dict(), current_user.id)
+    invalidate_template_cache(new_template.id)
+    return new_template
+
+@api_router.put("/admin/report-templates/{template_id}", response_model=ReportTemplate)
+async def update_report_template(template_id: str, template_data: ReportTemplateUpdate, current_user: User = Depends(get_admin_user)):
+    # Check if template exists
+    existing_template = await db.report_templates.find_one({"id": template_id})
+    if not existing_template:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Report template not found"
@@ -999,23 +2678,36 @@ async def update_report_template(template_id: str, template_data: ReportTemplate
         update_data["active"] = template_data.active
     
     if template_data.fields is not None:
-        # Convert fields to include IDs
+        ensure_valid_rules([field.dict() for field in template_data.fields])
+        dynamic_ids = {name: field_id for field_id, name in (existing_template.get("dynamic_field_names") or {}).items()}
+        overrides = dict(existing_template.get("dynamic_field_overrides") or {})
+        existing_ids = {field["name"]: field["id"] for field in existing_template.get("fields", [])}
         fields_with_ids = []
         for field in template_data.fields:
+            # Referenced dynamic fields echoed back by the client stay references, keeping only
+            # their per-template required flag and order
+            if field.name in dynamic_ids:
+                overrides[dynamic_ids[field.name]] = {key: getattr(field, key) for key in DYNAMIC_FIELD_OVERRIDES}
+                continue
             field_dict = field.dict()
-            field_dict["id"] = str(uuid.uuid4())
+            # Fields keep their id across versions when their name is unchanged
+            field_dict["id"] = existing_ids.get(field.name) or str(uuid.uuid4())
             fields_with_ids.append(field_dict)
         update_data["fields"] = fields_with_ids
+        update_data["dynamic_field_overrides"] = overrides
     
     update_data["updated_at"] = datetime.now(timezone.utc)
     
-    await db.report_templates.update_one(
+    # Every update is a new immutable version; earlier versions stay as they were
+    updated_template = await db.report_templates.find_one_and_update(
         {"id": template_id},
-        {"$set": update_data}
+        {"$set": update_data, "$inc": {"version": 1}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
-    
-    updated_template = await db.report_templates.find_one({"id": template_id})
-    return ReportTemplate(**updated_template)
+    await snapshot_template_version(updated_template, current_user.id)
+    invalidate_template_cache(template_id)
+    return ReportTemplate(**await dynamic_field_resolver.resolve(updated_template))
 
 @api_router.delete("/admin/report-templates/{template_id}")
 async def delete_report_template(template_id: str, current_user: User = Depends(get_admin_user)):
@@ -1028,6 +2720,7 @@ async def delete_report_template(template_id: str, current_user: User = Depends(
         )
     
     result = await db.report_templates.delete_one({"id": template_id})
+    invalidate_template_cache(template_id)
     if result.deleted_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1036,26 +2729,65 @@ async def delete_report_template(template_id: str, current_user: User = Depends(
     return {"message": "Report template deleted successfully"}
 
 # Report Templates for Users
+async def active_templates_response(request: Request) -> Response:
+    """The cached active template list, or 304 when the client already has it"""
+    content, etag = await template_cache.list_json()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"etag": etag})
+    return Response(content=content, media_type="application/json", headers={"etag": etag})
+
 @api_router.get("/report-templates", response_model=List[ReportTemplate])
-async def get_active_report_templates(current_user: User = Depends(get_current_user)):
-    templates = await db.report_templates.find({"active": True}).to_list(1000)
-    return [ReportTemplate(**template) for template in templates]
+async def get_active_report_templates(request: Request, current_user: User = Depends(get_current_user)):
+    return await active_templates_response(request)
 
 @api_router.get("/report-templates/{template_id}", response_model=ReportTemplate)
 async def get_report_template(template_id: str, current_user: User = Depends(get_current_user)):
-    template = await db.report_templates.find_one({"id": template_id, "active": True})
-    if not template:
+    content = await template_cache.get_json(template_id)
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report template not found"
+        )
+    return Response(content=content, media_type="application/json")
+
+@api_router.get("/admin/report-templates/{template_id}/versions")
+async def get_report_template_versions(template_id: str, current_user: User = Depends(get_admin_user)):
+    versions = await db.report_template_versions.find(
+        {"template_id": template_id}, {"_id": 0}
+    ).sort("version", -1).to_list(None)
+    if not versions:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Report template not found"
         )
-    return ReportTemplate(**template)
+    return [
+        {
+            "version": version["version"],
+            "name": version["name"],
+            "field_count": len(version.get("fields", [])),
+            "created_by": version["created_by"],
+            "created_at": version["created_at"]
+        }
+        for version in versions
+    ]
+
+@api_router.get("/report-templates/{template_id}/versions/{version}", response_model=ReportTemplateVersion)
+async def get_report_template_version(template_id: str, version: int, current_user: User = Depends(get_current_user)):
+    """The exact schema a submission was filled against, for rendering historical reports"""
+    content = await get_template_version_json(template_id, version)
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report template version not found"
+        )
+    return Response(content=content, media_type="application/json")
 
 # Report Submission APIs
 @api_router.get("/reports", response_model=List[ReportSubmissionResponse])
 async def get_user_reports(current_user: User = Depends(get_current_user)):
-    # Get user's own reports
+    # Get user's own reports, including saves still buffered in surge mode
     reports = await db.report_submissions.find({"user_id": current_user.id}).to_list(1000)
+    reports = surge_buffer.overlay_user_reports(current_user.id, reports)
     
     # Enrich with template and location names
     enriched_reports = []
@@ -1112,384 +2844,2470 @@ async def get_all_reports(current_user: User = Depends(get_admin_user)):
     
     return enriched_reports
 
+def build_report_upsert(
+    report_data: ReportSubmissionCreate,
+    user_id: str,
+    location_id: Optional[str],
+    now: datetime,
+    template_version: Optional[int] = None,
+    report_id: Optional[str] = None
+) -> Tuple[dict, list]:
+    """Filter and update pipeline that create or update a report in one write.
+    
+    The filter matches the unique (user_id, template_id, report_period) index, so
+    its fields are copied into inserted documents. User-supplied values are wrapped
+    in $literal so strings starting with "$" are never read as field paths.
+    ``report_id`` is only used when the report is created.
+    """
+    report_filter = {
+        "user_id": user_id,
+        "template_id": report_data.template_id,
+        "report_period": report_data.report_period
+    }
+    is_new = {"$eq": [{"$ifNull": ["$created_at", None]}, None]}
+    if report_data.status == "submitted":
+        submitted_at = {"$cond": [{"$ne": ["$status", "submitted"]}, now, "$submitted_at"]}
+    else:
+        submitted_at = {"$ifNull": ["$submitted_at", None]}
+    
+    pipeline = [{"$set": {
+        "id": {"$ifNull": ["$id", report_id or str(uuid.uuid4())]},
+        "location_id": {"$cond": [is_new, {"$literal": location_id}, "$location_id"]},
+        "data": {"$literal": report_data.data},
+        "status": {"$literal": report_data.status},
+        "template_version": template_version,
+        "submitted_at": submitted_at,
+        "revision": {"$add": [{"$ifNull": ["$revision", 0]}, 1]},
+        "created_at": {"$ifNull": ["$created_at", now]},
+        "updated_at": now
+    }}]
+    return report_filter, pipeline
+
 @api_router.post("/reports", response_model=ReportSubmission)
-async def create_or_update_report(report_data: ReportSubmissionCreate, current_user: User = Depends(get_current_user)):
+async def create_or_update_report(
+    report_data: ReportSubmissionCreate,
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
+):
+    return await run_idempotent(
+        idempotency_key, current_user, "POST /reports", report_data,
+        lambda: save_report(report_data, current_user)
+    )
+
+async def save_report(report_data: ReportSubmissionCreate, current_user: User) -> ReportSubmission:
     # Check if template exists and is active
-    template = await db.report_templates.find_one({"id": report_data.template_id, "active": True})
+    template = await get_active_template(report_data.template_id)
     if not template:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Report template not found or inactive"
         )
     
-    # Check if report already exists for this user, template, and period
-    existing_report = await db.report_submissions.find_one({
-        "user_id": current_user.id,
-        "template_id": report_data.template_id,
-        "report_period": report_data.report_period
-    })
+    validator = get_template_validator(template)
+    errors = validator.validate(report_data.data, report_data.status == "submitted")
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=validator.describe(errors)
+        )
     
-    if existing_report:
-        # Update existing report
-        update_data = {
-            "data": report_data.data,
-            "status": report_data.status,
-            "updated_at": datetime.now(timezone.utc)
+    if surge_buffer.is_active() and surge_buffer.has_room():
+        # Answer with the stored report's id and created_at, as the write will keep them
+        stored = await db.report_submissions.find_one(
+            {"user_id": current_user.id, "template_id": report_data.template_id, "report_period": report_data.report_period},
+            {"_id": 0, "data": 0}
+        )
+        entry = await surge_buffer.submit(report_data, current_user, template.get("version"), stored["id"] if stored else None)
+        return ReportSubmission(**overlay_pending_report(stored, entry))
+    if surge_buffer.buffered:
+        # Write a buffered save of this report first so it cannot land on top of this one
+        await surge_buffer.flush_keys([(current_user.id, report_data.template_id, report_data.report_period)])
+    
+    report_filter, pipeline = build_report_upsert(
+        report_data, current_user.id, current_user.location_id, datetime.now(timezone.utc), template.get("version")
+    )
+    try:
+        report = await db.report_submissions.find_one_and_update(
+            report_filter, pipeline, projection={"_id": 0}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # A concurrent save inserted the report first; the retry takes the update path
+        report = await db.report_submissions.find_one_and_update(
+            report_filter, pipeline, projection={"_id": 0}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    
+    await record_report_revisions([report], current_user.id)
+    await record_report_data_keys([report])
+    invalidate_submission_caches(report_data.template_id, report_data.report_period)
+    return ReportSubmission(**report)
+
+# Batch report submission
+REPORT_BATCH_MAX_ITEMS = int(os.environ.get("REPORT_BATCH_MAX_ITEMS", "500"))
+
+class ReportBatchRequest(BaseModel):
+    reports: List[ReportSubmissionCreate]
+
+class ReportBatchItemResult(BaseModel):
+    index: int
+    template_id: str
+    report_period: str
+    result: str  # created, updated, superseded, error
+    id: Optional[str] = None
+    detail: Optional[str] = None
+
+class ReportBatchResponse(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    results: List[ReportBatchItemResult]
+
+@api_router.post("/reports/batch", response_model=ReportBatchResponse)
+async def create_or_update_reports_batch(batch: ReportBatchRequest, current_user: User = Depends(get_current_user)):
+    """Create or update many reports with one unordered bulk write"""
+    if not batch.reports:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No reports provided"
+        )
+    if len(batch.reports) > REPORT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch may contain at most {REPORT_BATCH_MAX_ITEMS} reports"
+        )
+    
+    results = [
+        ReportBatchItemResult(index=index, template_id=item.template_id, report_period=item.report_period, result="pending")
+        for index, item in enumerate(batch.reports)
+    ]
+    
+    templates = {}
+    for template_id in {item.template_id for item in batch.reports}:
+        templates[template_id] = await get_active_template(template_id)
+    
+    for index, item in enumerate(batch.reports):
+        if not templates[item.template_id]:
+            results[index].result = "error"
+            results[index].detail = "Report template not found or inactive"
+    
+    # Validate each template's items as one column-wise batch
+    for template_id, template in templates.items():
+        if not template:
+            continue
+        indexes = [index for index, item in enumerate(batch.reports) if item.template_id == template_id]
+        validator = get_template_validator(template)
+        batch_errors = validator.validate_many(
+            [batch.reports[index].data for index in indexes],
+            [batch.reports[index].status == "submitted" for index in indexes]
+        )
+        for index, errors in zip(indexes, batch_errors):
+            if errors:
+                results[index].result = "error"
+                results[index].detail = validator.describe(errors)
+    
+    # The last item for a (template, period) wins, matching sequential POST /reports semantics
+    latest_index = {}
+    for index, item in enumerate(batch.reports):
+        if results[index].result == "error":
+            continue
+        key = (item.template_id, item.report_period)
+        if key in latest_index:
+            results[latest_index[key]].result = "superseded"
+        latest_index[key] = index
+    
+    item_indexes = sorted(latest_index.values())
+    if surge_buffer.buffered:
+        await surge_buffer.flush_keys([(current_user.id, *key) for key in latest_index])
+    now = datetime.now(timezone.utc)
+    operations = []
+    for index in item_indexes:
+        item = batch.reports[index]
+        report_filter, pipeline = build_report_upsert(
+            item, current_user.id, current_user.location_id, now, templates[item.template_id].get("version")
+        )
+        operations.append(UpdateOne(report_filter, pipeline, upsert=True))
+    
+    upserted_ops = set()
+    failed_ops = {}
+    if operations:
+        try:
+            bulk_result = await db.report_submissions.bulk_write(operations, ordered=False)
+            upserted_ops = set(bulk_result.upserted_ids)
+        except BulkWriteError as exc:
+            upserted_ops = {entry["index"] for entry in exc.details.get("upserted", [])}
+            failed_ops = {entry["index"]: entry.get("errmsg", "Write failed") for entry in exc.details.get("writeErrors", [])}
+    
+    for op_index, index in enumerate(item_indexes):
+        if op_index in failed_ops:
+            results[index].result = "error"
+            results[index].detail = failed_ops[op_index]
+        else:
+            results[index].result = "created" if op_index in upserted_ops else "updated"
+    
+    written = [batch.reports[index] for op_index, index in enumerate(item_indexes) if op_index not in failed_ops]
+    if written:
+        saved = await db.report_submissions.find(
+            {
+                "user_id": current_user.id,
+                "$or": [{"template_id": item.template_id, "report_period": item.report_period} for item in written]
+            },
+            {"_id": 0, "id": 1, "template_id": 1, "report_period": 1, "status": 1, "data": 1, "revision": 1}
+        ).to_list(None)
+        await record_report_revisions(saved, current_user.id)
+        await record_report_data_keys(saved)
+        saved_ids = {(report["template_id"], report["report_period"]): report["id"] for report in saved}
+        for index in item_indexes:
+            item = batch.reports[index]
+            results[index].id = saved_ids.get((item.template_id, item.report_period))
+        for item in written:
+            invalidate_submission_caches(item.template_id, item.report_period)
+    
+    return ReportBatchResponse(
+        created=sum(1 for result in results if result.result == "created"),
+        updated=sum(1 for result in results if result.result == "updated"),
+        failed=sum(1 for result in results if result.result == "error"),
+        results=results
+    )
+
+# Month-end surge mode: validated submissions are acknowledged from an in-memory
+# buffer backed by an fsynced journal and written with grouped bulk_writes. The
+# buffer coalesces by (user, template, period), so only the latest save is written.
+# The buffer lives in one server process: reads served by that process see its
+# buffered saves, but read-your-writes does not hold across processes until the
+# buffer is flushed.
+SURGE_MODE = os.environ.get("SURGE_MODE", "off").lower()  # off, on, auto (last SURGE_AUTO_DAYS of the month)
+SURGE_AUTO_DAYS = int(os.environ.get("SURGE_AUTO_DAYS", "2"))
+SURGE_FLUSH_INTERVAL_SECONDS = float(os.environ.get("SURGE_FLUSH_INTERVAL_SECONDS", "1"))
+SURGE_FLUSH_BATCH_SIZE = int(os.environ.get("SURGE_FLUSH_BATCH_SIZE", "500"))
+SURGE_MAX_BUFFERED = int(os.environ.get("SURGE_MAX_BUFFERED", "20000"))
+SURGE_MAX_FLUSH_ATTEMPTS = int(os.environ.get("SURGE_MAX_FLUSH_ATTEMPTS", "5"))
+# Each server process needs its own journal file
+SURGE_JOURNAL_PATH = Path(os.environ.get("SURGE_JOURNAL_PATH", str(ROOT_DIR / "surge" / "journal.jsonl")))
+SURGE_MODES = ("off", "on", "auto")
+
+class SurgeJournal:
+    """Append-only JSONL journal with group commit: concurrent appends share one write and fsync"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lines: List[str] = []
+        self._waiters: List[asyncio.Future] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def append(self, record: dict):
+        future = asyncio.get_running_loop().create_future()
+        self._lines.append(json.dumps(record, default=str))
+        self._waiters.append(future)
+        if self._writer is None or self._writer.done():
+            self._writer = spawn_background(self._write())
+        await future
+
+    async def _write(self):
+        async with self._lock:
+            while self._lines:
+                lines, waiters = self._lines, self._waiters
+                self._lines, self._waiters = [], []
+                try:
+                    await asyncio.to_thread(self._append_lines, lines)
+                except Exception as exc:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(exc)
+                    continue
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+
+    def _append_lines(self, lines: List[str]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as journal:
+            journal.write("\n".join(lines) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    async def truncate(self, is_drained):
+        """Remove the journal if ``is_drained()`` still holds once pending appends are written"""
+        async with self._lock:
+            if not self._lines and is_drained():
+                await asyncio.to_thread(self.path.unlink, missing_ok=True)
+
+    def read(self) -> List[dict]:
+        if not self.path.exists():
+            return []
+        records = []
+        with open(self.path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-write was never acknowledged
+                    continue
+        return records
+
+def overlay_pending_report(report: Optional[dict], entry: dict) -> dict:
+    """A report as it will look once a buffered submission is written"""
+    submission = entry["report"]
+    base = report or {
+        "id": entry["id"],
+        "user_id": entry["user_id"],
+        "template_id": submission["template_id"],
+        "report_period": submission["report_period"],
+        "location_id": entry["location_id"],
+        "created_at": entry["acked_at"]
+    }
+    submitted_at = base.get("submitted_at")
+    if submission["status"] == "submitted" and base.get("status") != "submitted":
+        submitted_at = entry["acked_at"]
+    return {
+        **base,
+        "data": submission["data"],
+        "status": submission["status"],
+        "revision": base.get("revision", 0) + 1,
+        "template_version": entry.get("template_version"),
+        "submitted_at": submitted_at,
+        "updated_at": entry["acked_at"]
+    }
+
+class SurgeBuffer:
+    def __init__(self, journal: SurgeJournal, mode: str, batch_size: int, flush_interval: float, max_buffered: int):
+        self.journal = journal
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.flushed = 0
+        self.dead_lettered = 0
+        self._pending: Dict[tuple, dict] = {}
+        self._flushing: Dict[tuple, dict] = {}
+        self._inflight: Dict[tuple, asyncio.Future] = {}  # key -> resolves when its batch write ends
+        self._keys_by_id: Dict[str, tuple] = {}  # acknowledged id -> key of a buffered entry
+        self._report_ids = LRUCache(maxsize=50000)  # (user, template, period) -> stored report id
+        self._aliases = LRUCache(maxsize=50000)  # acknowledged id -> stored report id
+        self._seq = 0
+        self._batch_ready = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def is_active(self, now: Optional[datetime] = None) -> bool:
+        if self.mode == "on":
+            return True
+        if self.mode == "auto":
+            today = (now or datetime.now(timezone.utc)).date()
+            next_month = (today.replace(day=28) + timedelta(days=4)).replace(day=1)
+            return (next_month - today).days <= SURGE_AUTO_DAYS
+        return False
+
+    @property
+    def buffered(self) -> int:
+        return len(self._pending) + len(self._flushing)
+
+    def has_room(self) -> bool:
+        return len(self._pending) < self.max_buffered
+
+    async def submit(
+        self, report_data: ReportSubmissionCreate, user: User, template_version: Optional[int], report_id: Optional[str] = None
+    ) -> dict:
+        """Buffer a validated submission and return its entry once it is journaled.
+        
+        ``report_id`` is the id of the stored report, when the caller has read it.
+        """
+        key = (user.id, report_data.template_id, report_data.report_period)
+        previous = self._pending.get(key) or self._flushing.get(key)
+        self._seq += 1
+        entry = {
+            "seq": self._seq,
+            "id": previous["id"] if previous else report_id or self._report_ids.get(key) or str(uuid.uuid4()),
+            "user_id": user.id,
+            "location_id": user.location_id,
+            "template_version": template_version,
+            "report": report_data.dict(),
+            "acked_at": datetime.now(timezone.utc),
+            "attempts": 0
         }
+        # Buffer before journaling so a concurrent flush never truncates an unflushed entry
+        self._pending[key] = entry
+        self._keys_by_id[entry["id"]] = key
+        if len(self._pending) >= self.batch_size:
+            self._batch_ready.set()
+        try:
+            await self.journal.append({"op": "put", **entry})
+        except Exception as exc:
+            logger.warning(f"Surge journal write failed, flushing synchronously: {exc}")
+            await self.flush_keys([key])
+        return entry
+
+    def resolve_id(self, report_id: str) -> str:
+        return self._aliases.get(report_id, report_id)
+
+    def _entries(self) -> Dict[tuple, dict]:
+        return {**self._flushing, **self._pending}
+
+    def pending_for(self, user_id: str, template_id: str, report_period: str) -> Optional[dict]:
+        key = (user_id, template_id, report_period)
+        return self._pending.get(key) or self._flushing.get(key)
+
+    def key_for(self, report_id: str) -> Optional[tuple]:
+        """The (user, template, period) key of a buffered entry acknowledged under ``report_id``"""
+        return self._keys_by_id.get(report_id)
+
+    def find_pending(self, report_id: str) -> Optional[dict]:
+        key = self.key_for(report_id)
+        return self.pending_for(*key) if key else None
+
+    def overlay_user_reports(self, user_id: str, reports: List[dict]) -> List[dict]:
+        """Apply the user's buffered submissions to reports read from the database"""
+        entries = {key: entry for key, entry in self._entries().items() if key[0] == user_id}
+        if not entries:
+            return reports
+        merged = []
+        for report in reports:
+            entry = entries.pop((report["user_id"], report["template_id"], report["report_period"]), None)
+            merged.append(overlay_pending_report(report, entry) if entry else report)
+        merged.extend(overlay_pending_report(None, entry) for entry in entries.values())
+        return merged
+
+    def start(self):
+        self._task = spawn_background(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.warning(f"Surge buffer flush failed: {exc}")
+
+    async def flush(self):
+        """Write everything buffered so far; entries that fail are retried on the next flush"""
+        async with self._flush_lock:
+            keys = list(self._pending)
+            for start in range(0, len(keys), self.batch_size):
+                await self._flush_batch(keys[start:start + self.batch_size])
+            await self._truncate_if_drained()
+
+    async def flush_keys(self, keys: List[tuple]):
+        """Write only these buffered reports, e.g. before a direct write to the same reports"""
+        while True:
+            inflight = {self._inflight[key] for key in keys if key in self._inflight}
+            if not inflight:
+                break
+            # An older save of the same report is being written; let it land first
+            await asyncio.wait(inflight)
+        await self._flush_batch(keys)
+        await self._truncate_if_drained()
+
+    async def _flush_batch(self, keys: List[tuple]):
+        # A key already being written stays pending so two writes of one report never race
+        batch = {key: self._pending.pop(key) for key in keys if key in self._pending and key not in self._inflight}
+        if not batch:
+            return
+        done = asyncio.get_running_loop().create_future()
+        self._flushing.update(batch)
+        self._inflight.update(dict.fromkeys(batch, done))
+        try:
+            await self._write_batch(batch)
+        finally:
+            for key, entry in batch.items():
+                self._flushing.pop(key, None)
+                self._inflight.pop(key, None)
+                if key not in self._pending and self._keys_by_id.get(entry["id"]) == key:
+                    del self._keys_by_id[entry["id"]]
+            done.set_result(None)
+
+    async def _truncate_if_drained(self):
+        if not self.buffered:
+            await self.journal.truncate(lambda: not self.buffered)
+
+    async def _write_batch(self, batch: Dict[tuple, dict]):
+        items = list(batch.items())
+        operations = []
+        for key, entry in items:
+            report_filter, pipeline = build_report_upsert(
+                ReportSubmissionCreate(**entry["report"]), entry["user_id"], entry["location_id"],
+                entry["acked_at"], entry.get("template_version"), report_id=entry["id"]
+            )
+            operations.append(UpdateOne(report_filter, pipeline, upsert=True))
         
-        if report_data.status == "submitted" and existing_report.get("status") != "submitted":
-            update_data["submitted_at"] = datetime.now(timezone.utc)
+        failed = {}
+        try:
+            await db.report_submissions.bulk_write(operations, ordered=False)
+        except BulkWriteError as exc:
+            failed = {error["index"]: error.get("errmsg", "Write failed") for error in exc.details.get("writeErrors", [])}
+        except Exception as exc:
+            failed = {index: str(exc) for index in range(len(items))}
         
-        await db.report_submissions.update_one(
-            {"id": existing_report["id"]},
-            {"$set": update_data}
+        dead = []
+        for index, error in failed.items():
+            key, entry = items[index]
+            entry["attempts"] += 1
+            if key in self._pending:
+                continue  # A newer submission for the same report supersedes this one
+            if entry["attempts"] < SURGE_MAX_FLUSH_ATTEMPTS:
+                self._pending[key] = entry
+            else:
+                logger.error(f"Dropping buffered report {entry['id']} after {entry['attempts']} failed writes: {error}")
+                dead.append({**entry, "error": error, "failed_at": datetime.now(timezone.utc)})
+        if dead:
+            self.dead_lettered += len(dead)
+            await db.surge_dead_letters.insert_many(dead)
+        
+        written = [entry for index, (key, entry) in enumerate(items) if index not in failed]
+        if written:
+            await self._after_write(batch, written)
+        finished = written + dead
+        if finished:
+            await self.journal.append({"op": "flushed", "seqs": [entry["seq"] for entry in finished]})
+
+    async def _after_write(self, batch: Dict[tuple, dict], written: List[dict]):
+        saved = await db.report_submissions.find(
+            {"$or": [
+                {"user_id": entry["user_id"], "template_id": entry["report"]["template_id"], "report_period": entry["report"]["report_period"]}
+                for entry in written
+            ]},
+            {"_id": 0, "id": 1, "user_id": 1, "template_id": 1, "report_period": 1, "status": 1, "data": 1, "revision": 1}
+        ).to_list(None)
+        by_actor: Dict[str, List[dict]] = {}
+        for report in saved:
+            key = (report["user_id"], report["template_id"], report["report_period"])
+            entry = batch.get(key)
+            if entry is None:
+                continue
+            self._report_ids.set(key, report["id"])
+            if report["id"] != entry["id"]:
+                self._aliases.set(entry["id"], report["id"])
+            by_actor.setdefault(report["user_id"], []).append(report)
+            invalidate_submission_caches(report["template_id"], report["report_period"])
+        for actor_id, reports in by_actor.items():
+            await record_report_revisions(reports, actor_id)
+        await record_report_data_keys(saved)
+        self.flushed += len(written)
+
+    async def replay(self):
+        """Re-buffer journaled submissions that were not written before the last shutdown"""
+        records = await asyncio.to_thread(self.journal.read)
+        flushed = set()
+        latest: Dict[tuple, dict] = {}
+        for record in records:
+            if record.get("op") == "flushed":
+                flushed.update(record["seqs"])
+            elif record.get("op") == "put":
+                key = (record["user_id"], record["report"]["template_id"], record["report"]["report_period"])
+                if key not in latest or latest[key]["seq"] < record["seq"]:
+                    latest[key] = record
+        for key, record in latest.items():
+            self._seq = max(self._seq, record["seq"])
+            if record["seq"] in flushed:
+                continue
+            record.pop("op")
+            record["acked_at"] = datetime.fromisoformat(record["acked_at"])
+            self._pending[key] = record
+            self._keys_by_id[record["id"]] = key
+        if self._pending:
+            logger.info(f"Replaying {len(self._pending)} journaled report submissions")
+        await self.flush()
+
+surge_buffer = SurgeBuffer(
+    SurgeJournal(SURGE_JOURNAL_PATH), SURGE_MODE, SURGE_FLUSH_BATCH_SIZE, SURGE_FLUSH_INTERVAL_SECONDS, SURGE_MAX_BUFFERED
+)
+
+class SurgeModeUpdate(BaseModel):
+    mode: str
+
+@api_router.get("/admin/surge-mode")
+async def get_surge_mode(current_user: User = Depends(get_admin_user)):
+    return {
+        "mode": surge_buffer.mode,
+        "active": surge_buffer.is_active(),
+        "buffered": surge_buffer.buffered,
+        "flushed": surge_buffer.flushed,
+        "dead_lettered": surge_buffer.dead_lettered
+    }
+
+@api_router.put("/admin/surge-mode")
+async def update_surge_mode(update: SurgeModeUpdate, current_user: User = Depends(get_admin_user)):
+    """Switch surge mode for this server process; SURGE_MODE sets the value at startup"""
+    if update.mode not in SURGE_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid mode. Must be one of: {', '.join(SURGE_MODES)}"
         )
+    surge_buffer.mode = update.mode
+    if not surge_buffer.is_active():
+        await surge_buffer.flush()
+    return await get_surge_mode(current_user)
+
+# Partial-field draft autosave with write coalescing
+DRAFT_COALESCE_SECONDS = float(os.environ.get("DRAFT_COALESCE_SECONDS", "0.5"))
+
+class ReportDataPatch(BaseModel):
+    data: dict = {}
+    remove: List[str] = []
+
+class DraftPatchCoalescer:
+    """Merge patches that arrive for the same report within a short window into one write"""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pending: Dict[Any, dict] = {}
+
+    async def submit(self, key, set_fields: dict, unset_fields: List[str], flush):
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = {"set": {}, "unset": set(), "patches": 0, "future": asyncio.get_running_loop().create_future()}
+            self._pending[key] = entry
+            spawn_background(self._flush_later(key, entry, flush))
         
-        updated_report = await db.report_submissions.find_one({"id": existing_report["id"]})
-        return ReportSubmission(**updated_report)
-    else:
-        # Create new report
-        new_report = ReportSubmission(
-            **report_data.dict(),
-            user_id=current_user.id,
-            location_id=current_user.location_id,
-            submitted_at=datetime.now(timezone.utc) if report_data.status == "submitted" else None
+        for name, value in set_fields.items():
+            entry["set"][name] = value
+            entry["unset"].discard(name)
+        for name in unset_fields:
+            entry["set"].pop(name, None)
+            entry["unset"].add(name)
+        entry["patches"] += 1
+        return await asyncio.shield(entry["future"])
+
+    async def _flush_later(self, key, entry: dict, flush):
+        future = entry["future"]
+        try:
+            await asyncio.sleep(self.window)
+            if self._pending.get(key) is entry:
+                del self._pending[key]
+            future.set_result(await flush(entry["set"], entry["unset"], entry["patches"]))
+        except Exception as exc:
+            future.set_exception(exc)
+        finally:
+            if self._pending.get(key) is entry:
+                del self._pending[key]
+            if not future.done():
+                # Cancelled, e.g. at shutdown; release every waiting patch instead of leaving it hanging
+                future.set_exception(HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Draft save was interrupted, please retry"
+                ))
+
+draft_patch_coalescer = DraftPatchCoalescer(DRAFT_COALESCE_SECONDS)
+
+def validate_data_keys(keys) -> None:
+    invalid = [key for key in keys if not key or "." in key or key.startswith("$")]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid field names: {', '.join(repr(key) for key in invalid)}"
         )
-        await db.report_submissions.insert_one(new_report.dict())
-        return new_report
 
-@api_router.get("/reports/{report_id}", response_model=ReportSubmissionResponse)
-async def get_report(report_id: str, current_user: User = Depends(get_current_user)):
-    report = await db.report_submissions.find_one({"id": report_id})
-    if not report:
+@api_router.patch("/reports/{report_id}/data")
+async def patch_report_data(report_id: str, patch: ReportDataPatch, current_user: User = Depends(get_current_user)):
+    """Apply only changed data keys; rapid successive patches are merged into one write"""
+    if not patch.data and not patch.remove:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No changes provided"
+        )
+    validate_data_keys(list(patch.data) + patch.remove)
+    if surge_buffer.buffered:
+        # The patch applies on top of a buffered save of this report, which may not have an id
+        # in the database yet; only that save is written, not the whole buffer
+        pending_key = surge_buffer.key_for(report_id)
+        if not pending_key:
+            stored = await db.report_submissions.find_one(
+                {"id": surge_buffer.resolve_id(report_id)}, {"_id": 0, "user_id": 1, "template_id": 1, "report_period": 1}
+            )
+            if stored:
+                pending_key = (stored["user_id"], stored["template_id"], stored["report_period"])
+        if pending_key:
+            await surge_buffer.flush_keys([pending_key])
+    report_id = surge_buffer.resolve_id(report_id)
+    
+    report_filter = {"id": report_id}
+    if current_user.role != "ADMIN":
+        report_filter["user_id"] = current_user.id
+    
+    stored = await db.report_submissions.find_one(report_filter, {"_id": 0, "template_id": 1, "status": 1, "data": 1})
+    if not stored:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Report not found"
         )
+    if current_user.role != "ADMIN":
+        if stored["status"] != "draft":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Only draft reports can be edited"
+            )
+        # Also guards the write against a submit that lands before the flush
+        report_filter["status"] = "draft"
+    template = await get_active_template(stored["template_id"])
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report template not found or inactive"
+        )
+    # Validate the report as it will read after this patch, as a full save would
+    data = {**stored.get("data", {}), **patch.data}
+    for name in patch.remove:
+        data.pop(name, None)
+    validator = get_template_validator(template)
+    errors = validator.validate(data, stored["status"] == "submitted")
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=validator.describe(errors)
+        )
+    
+    async def flush(set_fields: dict, unset_fields: set, patches: int):
+        update = {"$set": {
+            **{f"data.{name}": value for name, value in set_fields.items()},
+            # The draft is now being filled against the template's current version
+            "template_version": template.get("version", 1),
+            "updated_at": datetime.now(timezone.utc)
+        }, "$inc": {"revision": 1}}
+        if unset_fields:
+            update["$unset"] = {f"data.{name}": "" for name in unset_fields}
+        report = await db.report_submissions.find_one_and_update(
+            report_filter,
+            update,
+            projection={"_id": 0, "id": 1, "template_id": 1, "report_period": 1, "status": 1, "data": 1, "revision": 1, "updated_at": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not report:
+            if "status" in report_filter and await db.report_submissions.count_documents({"id": report_id}, limit=1):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Only draft reports can be edited"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Report not found"
+            )
+        await record_report_patch_revision(report, set_fields, unset_fields, current_user.id)
+        await record_report_data_keys([report])
+        invalidate_submission_caches(report["template_id"], report["report_period"])
+        return {
+            "id": report["id"],
+            "status": report["status"],
+            "revision": report["revision"],
+            "updated_at": report["updated_at"],
+            "updated_fields": sorted(set_fields),
+            "removed_fields": sorted(unset_fields),
+            "coalesced_patches": patches
+        }
+    
+    return await draft_patch_coalescer.submit(
+        (report_id, report_filter.get("user_id")), patch.data, patch.remove, flush
+    )
+
+@api_router.get("/reports/{report_id}", response_model=ReportSubmissionResponse)
+async def get_report(report_id: str, current_user: User = Depends(get_current_user)):
+    # Users can only see their own reports, admins can see all
+    report = await get_readable_report(report_id, current_user, include_pending=True)
+    
+    # Enrich with names
+    template = await db.report_templates.find_one({"id": report["template_id"]})
+    template_name = template["name"] if template else "Unknown Template"
+    
+    user = await db.users.find_one({"id": report["user_id"]})
+    username = user["username"] if user else "Unknown User"
+    
+    location_name = None
+    if report.get("location_id"):
+        location = await db.locations.find_one({"id": report["location_id"]})
+        location_name = location["name"] if location else None
+    
+    return ReportSubmissionResponse(
+        **report,
+        template_name=template_name,
+        username=username,
+        location_name=location_name
+    )
+
+# Report revision history. Each save stores only the top-level data keys it set or
+# removed relative to the previous revision, plus a full snapshot every
+# REVISION_SNAPSHOT_INTERVAL revisions, so any revision rebuilds from at most one
+# snapshot and a bounded run of deltas.
+REVISION_SNAPSHOT_INTERVAL = int(os.environ.get("REVISION_SNAPSHOT_INTERVAL", "20"))
+REVISION_RETENTION_DAYS = float(os.environ.get("REVISION_RETENTION_DAYS", "90"))
+REVISION_COMPACTION_INTERVAL_HOURS = float(os.environ.get("REVISION_COMPACTION_INTERVAL_HOURS", "24"))  # 0 disables
+REVISION_CACHE_SIZE = int(os.environ.get("REVISION_CACHE_SIZE", "2048"))
+
+# Latest known (revision, data) per report, used as the base of the next delta
+_revision_heads = LRUCache(maxsize=REVISION_CACHE_SIZE)
+
+class ReportRevisionSummary(BaseModel):
+    revision: int
+    kind: str  # snapshot, delta
+    status: str
+    actor_id: str
+    changed_fields: List[str] = []
+    removed_fields: List[str] = []
+    created_at: datetime
+
+class ReportRevision(BaseModel):
+    report_id: str
+    revision: int
+    status: str
+    actor_id: str
+    data: dict
+    created_at: datetime
+
+class RevisionHistoryGap(Exception):
+    """A revision in the requested chain is missing, so it cannot be rebuilt"""
+
+def diff_report_data(old: dict, new: dict) -> Tuple[dict, List[str]]:
+    changed = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+def apply_revision_delta(data: dict, revision: dict) -> dict:
+    if revision["kind"] == "snapshot":
+        return dict(revision["data"])
+    data = {**data, **revision["set"]}
+    for key in revision["unset"]:
+        data.pop(key, None)
+    return data
+
+async def reconstruct_report_data(report_id: str, revision: int) -> dict:
+    head = _revision_heads.get(report_id)
+    if head is not None and head[0] == revision:
+        return dict(head[1])
+    
+    snapshot = await db.report_revisions.find_one(
+        {"report_id": report_id, "kind": "snapshot", "revision": {"$lte": revision}},
+        sort=[("revision", -1)]
+    )
+    if snapshot is None:
+        raise RevisionHistoryGap(f"No snapshot at or before revision {revision}")
+    data = dict(snapshot["data"])
+    expected = snapshot["revision"] + 1
+    async for delta in db.report_revisions.find(
+        {"report_id": report_id, "revision": {"$gt": snapshot["revision"], "$lte": revision}}
+    ).sort("revision", 1):
+        if delta["revision"] != expected:
+            raise RevisionHistoryGap(f"Revision {expected} is missing")
+        data = apply_revision_delta(data, delta)
+        expected += 1
+    if expected != revision + 1:
+        raise RevisionHistoryGap(f"Revision {expected} is missing")
+    return data
+
+async def previous_revision_data(report_id: str, revision: int) -> Optional[dict]:
+    """Data as of ``revision - 1``, or None when it cannot be established"""
+    if revision <= 1:
+        return {}
+    try:
+        return await reconstruct_report_data(report_id, revision - 1)
+    except RevisionHistoryGap:
+        return None
+
+def build_revision(report: dict, actor_id: str, previous: Optional[dict], now: datetime) -> dict:
+    """Revision document for a saved report; falls back to a snapshot when the base is unknown"""
+    revision = {
+        "report_id": report["id"],
+        "revision": report["revision"],
+        "status": report["status"],
+        "actor_id": actor_id,
+        "created_at": now
+    }
+    if previous is None or report["revision"] % REVISION_SNAPSHOT_INTERVAL == 1:
+        revision.update({"kind": "snapshot", "data": report["data"]})
+    else:
+        changed, removed = diff_report_data(previous, report["data"])
+        revision.update({"kind": "delta", "set": changed, "unset": removed})
+    return revision
+
+async def record_report_revisions(reports: List[dict], actor_id: str):
+    """Store a revision for each freshly saved report (with its new data and revision number)"""
+    now = datetime.now(timezone.utc)
+    revisions = []
+    for report in reports:
+        previous = await previous_revision_data(report["id"], report["revision"])
+        revisions.append(build_revision(report, actor_id, previous, now))
+        _revision_heads.set(report["id"], (report["revision"], report["data"]))
+    if not revisions:
+        return
+    try:
+        await db.report_revisions.insert_many(revisions, ordered=False)
+    except Exception as exc:
+        # History is best-effort; a missing revision forces a snapshot on the next save
+        for report in reports:
+            _revision_heads.pop(report["id"])
+        logger.warning(f"Failed to record report revisions: {exc}")
+
+async def record_report_patch_revision(report: dict, set_fields: dict, unset_fields, actor_id: str):
+    """Store a revision for a PATCH flush, whose delta is exactly the patched keys"""
+    if report["revision"] % REVISION_SNAPSHOT_INTERVAL == 1:
+        revision = build_revision(report, actor_id, None, datetime.now(timezone.utc))
+    else:
+        revision = {
+            "report_id": report["id"],
+            "revision": report["revision"],
+            "status": report["status"],
+            "actor_id": actor_id,
+            "created_at": datetime.now(timezone.utc),
+            "kind": "delta",
+            "set": set_fields,
+            "unset": sorted(unset_fields)
+        }
+    _revision_heads.set(report["id"], (report["revision"], report["data"]))
+    try:
+        await db.report_revisions.insert_one(revision)
+    except Exception as exc:
+        _revision_heads.pop(report["id"])
+        logger.warning(f"Failed to record revision {report['revision']} of report {report['id']}: {exc}")
+
+async def compact_report_revisions(report_id: str, base_revision: int) -> int:
+    """Fold everything up to ``base_revision`` into a single snapshot; returns revisions removed"""
+    data = await reconstruct_report_data(report_id, base_revision)
+    await db.report_revisions.update_one(
+        {"report_id": report_id, "revision": base_revision},
+        {"$set": {"kind": "snapshot", "data": data, "compacted_at": datetime.now(timezone.utc)}, "$unset": {"set": "", "unset": ""}}
+    )
+    result = await db.report_revisions.delete_many({"report_id": report_id, "revision": {"$lt": base_revision}})
+    return result.deleted_count
+
+@job_handler("revision_compaction")
+async def handle_revision_compaction(payload: dict, job: dict):
+    """Collapse history older than the retention window into one snapshot per report"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=payload.get("retention_days", REVISION_RETENTION_DAYS))
+    bases = db.report_revisions.aggregate([
+        {"$match": {"created_at": {"$lt": cutoff}}},
+        {"$group": {"_id": "$report_id", "base_revision": {"$max": "$revision"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ])
+    async for base in bases:
+        try:
+            await compact_report_revisions(base["_id"], base["base_revision"])
+        except RevisionHistoryGap as exc:
+            logger.warning(f"Skipping revision compaction of report {base['_id']}: {exc}")
+
+async def get_readable_report(
+    report_id: str, current_user: User, projection: Optional[dict] = None, include_pending: bool = False
+) -> dict:
+    """Fetch a report the user may see; ``include_pending`` applies saves buffered in surge mode"""
+    report_id = surge_buffer.resolve_id(report_id)
+    report = await db.report_submissions.find_one({"id": report_id}, projection)
+    if include_pending and surge_buffer.buffered:
+        if report:
+            entry = surge_buffer.pending_for(report["user_id"], report["template_id"], report["report_period"])
+        else:
+            entry = surge_buffer.find_pending(report_id)
+        if entry:
+            report = overlay_pending_report(report, entry)
+    if not report:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report not found"
+        )
+    if current_user.role != "ADMIN" and report["user_id"] != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view this report"
+        )
+    return report
+
+@api_router.get("/reports/{report_id}/revisions", response_model=List[ReportRevisionSummary])
+async def get_report_revisions(report_id: str, current_user: User = Depends(get_current_user), limit: int = 100):
+    report_id = surge_buffer.resolve_id(report_id)
+    await get_readable_report(report_id, current_user, {"_id": 0, "user_id": 1})
+    revisions = await db.report_revisions.find(
+        {"report_id": report_id}, {"_id": 0, "data": 0}
+    ).sort("revision", -1).to_list(limit)
+    return [
+        ReportRevisionSummary(
+            **revision,
+            changed_fields=sorted(revision.get("set", {})),
+            removed_fields=revision.get("unset", [])
+        )
+        for revision in revisions
+    ]
+
+@api_router.get("/reports/{report_id}/revisions/{revision}", response_model=ReportRevision)
+async def get_report_revision(report_id: str, revision: int, current_user: User = Depends(get_current_user)):
+    report_id = surge_buffer.resolve_id(report_id)
+    await get_readable_report(report_id, current_user, {"_id": 0, "user_id": 1})
+    stored = await db.report_revisions.find_one({"report_id": report_id, "revision": revision}, {"_id": 0, "data": 0})
+    if not stored:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Revision not found"
+        )
+    try:
+        data = await reconstruct_report_data(report_id, revision)
+    except RevisionHistoryGap as exc:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Revision history is incomplete: {exc}"
+        )
+    return ReportRevision(report_id=report_id, data=data, **{
+        key: stored[key] for key in ("revision", "status", "actor_id", "created_at")
+    })
+
+@api_router.post("/admin/reports/revisions/compact", response_model=QueuedJob, status_code=status.HTTP_202_ACCEPTED)
+async def compact_revisions(current_user: User = Depends(get_admin_user), retention_days: float = REVISION_RETENTION_DAYS):
+    """Queue compaction of revision history older than ``retention_days``"""
+    return await enqueue_job("revision_compaction", {"retention_days": retention_days})
+
+# Data keys seen per template, recorded as reports are written, so exports can include
+# keys no template defines anymore without scanning every report. Keys are never
+# removed, so an export may carry a few always-empty columns.
+DATA_KEY_CACHE_SIZE = int(os.environ.get("DATA_KEY_CACHE_SIZE", "100000"))
+
+_recorded_data_keys = LRUCache(maxsize=DATA_KEY_CACHE_SIZE)  # (template id, key) already stored
+
+async def record_report_data_keys(reports: List[dict]):
+    """Store the (template, data key) pairs of written reports that are not known yet"""
+    new_keys = {
+        (report["template_id"], key)
+        for report in reports
+        for key in report.get("data") or {}
+        if (report["template_id"], key) not in _recorded_data_keys
+    }
+    if not new_keys:
+        return
+    try:
+        await db.report_data_keys.bulk_write([
+            UpdateOne({"template_id": template_id, "key": key}, {"$setOnInsert": {"template_id": template_id, "key": key}}, upsert=True)
+            for template_id, key in new_keys
+        ], ordered=False)
+    except Exception as exc:
+        # Left unmarked, so the next write of these keys records them again
+        logger.warning(f"Failed to record report data keys: {exc}")
+        return
+    for pair in new_keys:
+        _recorded_data_keys.set(pair, True)
+
+@job_handler("report_data_keys_backfill")
+async def handle_report_data_keys_backfill(payload: dict, job: dict):
+    """Record the data keys of reports written before keys were tracked; a one-time full scan"""
+    pairs = db.report_submissions.aggregate([
+        {"$project": {"_id": 0, "template_id": 1, "keys": {"$map": {
+            "input": {"$objectToArray": {"$ifNull": ["$data", {}]}}, "in": "$$this.k"
+        }}}},
+        {"$unwind": "$keys"},
+        {"$group": {"_id": {"template_id": "$template_id", "key": "$keys"}}}
+    ])
+    batch = []
+    async for pair in pairs:
+        batch.append({"template_id": pair["_id"]["template_id"], "data": {pair["_id"]["key"]: None}})
+        if len(batch) >= 1000:
+            await record_report_data_keys(batch)
+            batch = []
+    await record_report_data_keys(batch)
+
+async def schedule_report_data_keys_backfill():
+    if await db.report_data_keys.find_one({}, {"_id": 1}) or not await db.report_submissions.find_one({}, {"_id": 1}):
+        return
+    await enqueue_unique_job("report_data_keys_backfill", "report_data_keys_backfill", {})
+
+# Advanced Report Management - Search, Filter, Export
+def build_report_search_query(
+    search_term: Optional[str] = None,
+    status: Optional[str] = None,
+    template_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    location_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+) -> dict:
+    query = {}
+    
+    if search_term:
+        # Search in report data fields
+        query["$text"] = {"$search": search_term}
+    
+    if status:
+        query["status"] = status
+    
+    if template_id:
+        query["template_id"] = template_id
+    
+    if user_id:
+        query["user_id"] = user_id
+    
+    if location_id:
+        query["location_id"] = location_id
+    
+    if date_from or date_to:
+        date_query = {}
+        if date_from:
+            date_query["$gte"] = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
+        if date_to:
+            date_query["$lte"] = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
+        query["created_at"] = date_query
+    
+    return query
+
+@api_router.get("/admin/reports/search")
+async def search_reports(
+    current_user: User = Depends(get_admin_user),
+    search_term: Optional[str] = None,
+    status: Optional[str] = None,
+    template_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    location_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    page: int = 1,
+    limit: int = 20
+):
+    """Advanced search and filtering for reports"""
+    query = build_report_search_query(search_term, status, template_id, user_id, location_id, date_from, date_to)
+    
+    # Calculate pagination
+    skip = (page - 1) * limit
+    
+    # Get total count
+    total_count = await db.report_submissions.count_documents(query)
+    
+    # Get reports
+    reports_cursor = db.report_submissions.find(query).skip(skip).limit(limit).sort("created_at", -1)
+    reports = await reports_cursor.to_list(limit)
+    
+    # Enrich with names
+    enriched_reports = []
+    for report in reports:
+        template = await db.report_templates.find_one({"id": report["template_id"]})
+        template_name = template["name"] if template else "Unknown Template"
+        
+        user = await db.users.find_one({"id": report["user_id"]})
+        username = user["username"] if user else "Unknown User"
+        
+        location_name = None
+        if report.get("location_id"):
+            location = await db.locations.find_one({"id": report["location_id"]})
+            location_name = location["name"] if location else None
+        
+        enriched_report = ReportSubmissionResponse(
+            **report,
+            template_name=template_name,
+            username=username,
+            location_name=location_name
+        )
+        enriched_reports.append(enriched_report)
+    
+    return {
+        "reports": enriched_reports,
+        "total_count": total_count,
+        "page": page,
+        "limit": limit,
+        "total_pages": (total_count + limit - 1) // limit
+    }
+
+# Tombstones let incremental exports propagate deletions downstream
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get("TOMBSTONE_RETENTION_DAYS", "90"))
+
+async def record_report_tombstones(reports: List[dict], deleted_by: str):
+    if not reports:
+        return
+    deleted_at = datetime.now(timezone.utc)
+    await db.report_tombstones.insert_many([
+        {
+            "id": report["id"],
+            "template_id": report.get("template_id"),
+            "user_id": report.get("user_id"),
+            "report_period": report.get("report_period"),
+            "deleted_by": deleted_by,
+            "deleted_at": deleted_at,
+            "updated_at": deleted_at
+        }
+        for report in reports
+    ])
+
+class BulkActionRequest(BaseModel):
+    action: str
+    report_ids: List[str]
+
+BULK_ACTION_CHUNK_SIZE = int(os.environ.get("BULK_ACTION_CHUNK_SIZE", "500"))
+BULK_ACTION_STATUSES = {"approve": "approved", "reject": "rejected", "mark_reviewed": "reviewed"}
+BULK_ACTION_PAST_TENSE = {
+    "delete": "deleted",
+    "approve": "approved",
+    "reject": "rejected",
+    "mark_reviewed": "marked as reviewed"
+}
+
+def validate_bulk_action(action: str):
+    valid_actions = ["delete", *BULK_ACTION_STATUSES]
+    if action not in valid_actions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid action. Must be one of: {', '.join(valid_actions)}"
+        )
+
+async def apply_report_action_chunk(
+    action: str, report_ids: List[str], actor_id: str, bulk_action_job_id: Optional[str] = None
+) -> dict:
+    """Apply a bulk action to one chunk of report ids, audit it, and report which ids were missing"""
+    if action == "delete":
+        # Deletes need the reports' keys for tombstones and cache invalidation anyway
+        reports = await db.report_submissions.find(
+            {"id": {"$in": report_ids}},
+            {"_id": 0, "id": 1, "template_id": 1, "user_id": 1, "report_period": 1}
+        ).to_list(None)
+        found_ids = {report["id"] for report in reports}
+        await record_report_tombstones(reports, actor_id)
+        result = await db.report_submissions.delete_many({"id": {"$in": list(found_ids)}})
+        await db.report_revisions.delete_many({"report_id": {"$in": list(found_ids)}})
+        for report in reports:
+            invalidate_submission_caches(report["template_id"], report["report_period"])
+        matched = modified = result.deleted_count
+        missing_ids = [report_id for report_id in report_ids if report_id not in found_ids]
+    else:
+        now = datetime.now(timezone.utc)
+        result = await db.report_submissions.update_many(
+            {"id": {"$in": report_ids}},
+            {"$set": {
+                "status": BULK_ACTION_STATUSES[action],
+                "reviewed_at": now,
+                "reviewed_by": actor_id,
+                "updated_at": now
+            }}
+        )
+        matched, modified = result.matched_count, result.modified_count
+        missing_ids = []
+        if matched < len(report_ids):
+            # Only look up ids when some of them did not match
+            found_ids = set(await db.report_submissions.distinct("id", {"id": {"$in": report_ids}}))
+            missing_ids = [report_id for report_id in report_ids if report_id not in found_ids]
+    
+    audit_details = {"status": BULK_ACTION_STATUSES[action]} if action != "delete" else {}
+    if bulk_action_job_id:
+        audit_details["bulk_action_job_id"] = bulk_action_job_id
+    missing = set(missing_ids)
+    for report_id in report_ids:
+        if report_id not in missing:
+            audit_log.record(f"report.{action}", actor_id, "report", report_id, audit_details)
+    
+    return {"requested": len(report_ids), "matched": matched, "modified": modified, "missing_ids": missing_ids}
+
+@api_router.post("/admin/reports/bulk-actions")
+async def bulk_report_actions(
+    request: BulkActionRequest,
+    current_user: User = Depends(get_admin_user),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Perform bulk actions on reports in chunks, reporting ids that were not found"""
+    return await run_idempotent(
+        idempotency_key, current_user, "POST /admin/reports/bulk-actions", request,
+        lambda: apply_bulk_report_actions(request, current_user)
+    )
+
+async def apply_bulk_report_actions(request: BulkActionRequest, current_user: User) -> dict:
+    validate_bulk_action(request.action)
+    
+    if not request.report_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No report IDs provided"
+        )
+    
+    report_ids = list(dict.fromkeys(request.report_ids))
+    chunks = []
+    for start in range(0, len(report_ids), BULK_ACTION_CHUNK_SIZE):
+        chunk_result = await apply_report_action_chunk(
+            request.action, report_ids[start:start + BULK_ACTION_CHUNK_SIZE], current_user.id
+        )
+        chunks.append({"index": len(chunks), **chunk_result})
+    
+    if request.action != "delete":
+        invalidate_submission_caches()
+    
+    matched = sum(chunk["matched"] for chunk in chunks)
+    missing_ids = [report_id for chunk in chunks for report_id in chunk["missing_ids"]]
+    return {
+        "message": f"Successfully {BULK_ACTION_PAST_TENSE[request.action]} {matched} reports",
+        "action": request.action,
+        "requested": len(report_ids),
+        "matched": matched,
+        "modified": sum(chunk["modified"] for chunk in chunks),
+        "missing_ids": missing_ids,
+        "chunks": chunks
+    }
+
+# Filter-based bulk actions run as resumable background jobs
+class BulkFilterActionRequest(BaseModel):
+    action: str
+    search_term: Optional[str] = None
+    status: Optional[str] = None
+    template_id: Optional[str] = None
+    user_id: Optional[str] = None
+    location_id: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    confirm_all: bool = False  # Required to act on every report when no filter is set
+
+class BulkActionJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    action: str
+    filters: dict
+    confirm_all: bool = False
+    status: str = "queued"  # queued, running, completed, failed
+    total_estimate: Optional[int] = None
+    processed: int = 0
+    matched: int = 0
+    modified: int = 0
+    checkpoint: Optional[str] = None  # Last report id processed, in id order
+    error: Optional[str] = None
+    created_by: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+async def run_bulk_action_job(job_id: str, final_attempt: bool = True):
+    """Process a filter-based bulk action in id order, checkpointing after every chunk.
+    
+    A restarted job continues after its checkpoint. A chunk that was applied but not
+    yet checkpointed is applied again, which is harmless for every bulk action.
+    """
+    job = await db.bulk_action_jobs.find_one({"id": job_id})
+    if not job or job["status"] not in ("queued", "running"):
+        return
+    
+    try:
+        query = build_report_search_query(**job["filters"])
+        started = {"status": "running", "updated_at": datetime.now(timezone.utc)}
+        if not job.get("started_at"):
+            started["started_at"] = started["updated_at"]
+        if job.get("total_estimate") is None:
+            started["total_estimate"] = await db.report_submissions.count_documents(query)
+        await db.bulk_action_jobs.update_one({"id": job_id}, {"$set": started})
+        
+        checkpoint = job.get("checkpoint")
+        while True:
+            page_query = dict(query)
+            if checkpoint:
+                page_query["id"] = {"$gt": checkpoint}
+            page = await db.report_submissions.find(page_query, {"_id": 0, "id": 1}).sort("id", 1).limit(
+                BULK_ACTION_CHUNK_SIZE
+            ).to_list(BULK_ACTION_CHUNK_SIZE)
+            if not page:
+                break
+            
+            report_ids = [report["id"] for report in page]
+            chunk_result = await apply_report_action_chunk(job["action"], report_ids, job["created_by"], job_id)
+            checkpoint = report_ids[-1]
+            await db.bulk_action_jobs.update_one(
+                {"id": job_id},
+                {
+                    "$set": {"checkpoint": checkpoint, "updated_at": datetime.now(timezone.utc)},
+                    "$inc": {
+                        "processed": len(report_ids),
+                        "matched": chunk_result["matched"],
+                        "modified": chunk_result["modified"]
+                    }
+                }
+            )
+        
+        finished_at = datetime.now(timezone.utc)
+        await db.bulk_action_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": "completed", "completed_at": finished_at, "updated_at": finished_at}}
+        )
+    except Exception as exc:
+        # Leave a retryable job running so the next attempt resumes from the checkpoint
+        failed_at = datetime.now(timezone.utc)
+        update = {"error": str(exc), "updated_at": failed_at}
+        if final_attempt:
+            update.update({"status": "failed", "completed_at": failed_at})
+        await db.bulk_action_jobs.update_one({"id": job_id}, {"$set": update})
+        raise
+    finally:
+        invalidate_submission_caches()
+
+async def reopen_bulk_action_job(payload: dict):
+    await db.bulk_action_jobs.update_one(
+        {"id": payload["bulk_action_job_id"], "status": "failed"},
+        {"$set": {"status": "running", "updated_at": datetime.now(timezone.utc)}, "$unset": {"completed_at": ""}}
+    )
+
+@job_handler("bulk_action", on_retry=reopen_bulk_action_job)
+async def handle_bulk_action_job(payload: dict, job: dict):
+    await run_bulk_action_job(payload["bulk_action_job_id"], final_attempt=is_final_attempt(job))
+
+@api_router.post("/admin/reports/bulk-actions/jobs", response_model=BulkActionJob, status_code=status.HTTP_202_ACCEPTED)
+async def create_bulk_action_job(request: BulkFilterActionRequest, current_user: User = Depends(get_admin_user)):
+    """Apply a bulk action to every report matching search filters, in the background"""
+    validate_bulk_action(request.action)
+    filters = request.dict(exclude={"action", "confirm_all"})
+    try:
+        query = build_report_search_query(**filters)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid filter: {exc}"
+        )
+    if not query and not request.confirm_all:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No filter provided; set confirm_all to apply the action to every report"
+        )
+    
+    job = BulkActionJob(action=request.action, filters=filters, confirm_all=request.confirm_all, created_by=current_user.id)
+    await db.bulk_action_jobs.insert_one(job.dict())
+    await enqueue_job("bulk_action", {"bulk_action_job_id": job.id})
+    audit_log.record("report.bulk_action_job", current_user.id, "bulk_action_job", job.id, {"action": job.action, "filters": filters})
+    return job
+
+@api_router.get("/admin/reports/bulk-actions/jobs", response_model=List[BulkActionJob])
+async def get_bulk_action_jobs(current_user: User = Depends(get_admin_user), limit: int = 50):
+    jobs = await db.bulk_action_jobs.find().sort("created_at", -1).to_list(limit)
+    return [BulkActionJob(**job) for job in jobs]
+
+@api_router.get("/admin/reports/bulk-actions/jobs/{job_id}", response_model=BulkActionJob)
+async def get_bulk_action_job(job_id: str, current_user: User = Depends(get_admin_user)):
+    job = await db.bulk_action_jobs.find_one({"id": job_id})
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Bulk action job not found"
+        )
+    return BulkActionJob(**job)
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "500"))
+EXPORT_MAX_PARTITIONS = int(os.environ.get("EXPORT_MAX_PARTITIONS", "8"))
+EXPORT_PARTITION_BUFFER = int(os.environ.get("EXPORT_PARTITION_BUFFER", "4"))  # Batches buffered per partition
+EXPORT_BASE_COLUMNS = [
+    "report_id", "template_name", "username", "location_name", "report_period",
+    "status", "submitted_at", "created_at", "updated_at"
+]
+
+def build_export_query(
+    status: Optional[str] = None,
+    template_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+) -> dict:
+    query = {}
+    
+    if status:
+        query["status"] = status
+    if template_id:
+        query["template_id"] = template_id
+    if user_id:
+        query["user_id"] = user_id
+    
+    if date_from or date_to:
+        date_query = {}
+        if date_from:
+            date_query["$gte"] = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
+        if date_to:
+            date_query["$lte"] = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
+        query["created_at"] = date_query
+    
+    return query
+
+async def resolve_report_names(reports: List[dict]) -> dict:
+    """Resolve template, user and location names for a batch of reports in three queries"""
+    template_ids = {report["template_id"] for report in reports}
+    user_ids = {report["user_id"] for report in reports}
+    location_ids = {report["location_id"] for report in reports if report.get("location_id")}
+    
+    templates = await db.report_templates.find(
+        {"id": {"$in": list(template_ids)}}, {"_id": 0, "id": 1, "name": 1}
+    ).to_list(None)
+    users = await db.users.find(
+        {"id": {"$in": list(user_ids)}}, {"_id": 0, "id": 1, "username": 1}
+    ).to_list(None)
+    locations = await db.locations.find(
+        {"id": {"$in": list(location_ids)}}, {"_id": 0, "id": 1, "name": 1}
+    ).to_list(None) if location_ids else []
+    
+    return {
+        "templates": {template["id"]: template["name"] for template in templates},
+        "users": {user["id"]: user["username"] for user in users},
+        "locations": {location["id"]: location["name"] for location in locations}
+    }
+
+def export_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "; ".join(str(item) for item in value)
+    return str(value)
+
+def flatten_report_for_export(report: dict, names: dict) -> dict:
+    """Flatten a report and its resolved names into a single export row"""
+    flat_data = {
+        "report_id": report["id"],
+        "template_name": names["templates"].get(report["template_id"], "Unknown Template"),
+        "username": names["users"].get(report["user_id"], "Unknown User"),
+        "location_name": names["locations"].get(report.get("location_id"), ""),
+        "report_period": report["report_period"],
+        "status": report["status"],
+        "submitted_at": report["submitted_at"].isoformat() if report.get("submitted_at") else "",
+        "created_at": report["created_at"].isoformat(),
+        "updated_at": report["updated_at"].isoformat()
+    }
+    
+    for key, value in (report.get("data") or {}).items():
+        flat_data[f"data_{key}"] = export_cell(value)
+    
+    return flat_data
+
+async def iter_export_batches(query: dict, batch_size: int = EXPORT_BATCH_SIZE, partitions: int = 1):
+    """Yield (reports, names) per cursor batch, resolving names in bulk for each batch"""
+    if partitions > 1:
+        async for batch in iter_partitioned_export_batches(query, partitions, batch_size):
+            yield batch
+        return
+    
+    cursor = db.report_submissions.find(query, {"_id": 0}).sort("created_at", 1).batch_size(batch_size)
+    batch = []
+    async for report in cursor:
+        batch.append(report)
+        if len(batch) >= batch_size:
+            yield batch, await resolve_report_names(batch)
+            batch = []
+    if batch:
+        yield batch, await resolve_report_names(batch)
+
+async def plan_export_partitions(query: dict, partitions: int) -> List[dict]:
+    """Split an export query into contiguous created_at ranges holding about as many reports each.
+    
+    Bounds are the created_at values at evenly spaced positions of the sorted result, so
+    months with a submission spike split as finely as quiet ones. Each bound costs one
+    skip over the created_at index.
+    """
+    total = await db.report_submissions.count_documents(query)
+    bounds = []
+    for index in range(partitions):
+        found = await db.report_submissions.find(query, {"_id": 0, "created_at": 1}).sort(
+            "created_at", 1
+        ).skip(total * index // partitions).limit(1).to_list(1)
+        # Reports sharing a created_at stay in one range, which may leave fewer ranges
+        if found and (not bounds or found[0]["created_at"] > bounds[-1]):
+            bounds.append(found[0]["created_at"])
+    # The first value found is the earliest, which the first range already starts below
+    bounds = bounds[1:]
+    if not bounds:
+        return [query]
+    
+    ranges = [{"$lt": bounds[0]}]
+    ranges.extend({"$gte": lower, "$lt": upper} for lower, upper in zip(bounds, bounds[1:]))
+    ranges.append({"$gte": bounds[-1]})
+    return [{"$and": [query, {"created_at": created_at}]} for created_at in ranges]
+
+async def iter_partitioned_export_batches(query: dict, partitions: int, batch_size: int = EXPORT_BATCH_SIZE):
+    """Read and enrich partitions concurrently, each on its own cursor, and yield batches
+    as soon as any partition has one. Rows are sorted within a partition only."""
+    partition_queries = await plan_export_partitions(query, min(partitions, EXPORT_MAX_PARTITIONS))
+    done = object()
+    queue = asyncio.Queue(maxsize=EXPORT_PARTITION_BUFFER * len(partition_queries))
+    
+    async def produce(partition_query: dict):
+        try:
+            async for batch in iter_export_batches(partition_query, batch_size):
+                await queue.put(batch)
+            await queue.put(done)
+        except Exception as exc:
+            await queue.put(exc)
+    
+    producers = [asyncio.ensure_future(produce(partition_query)) for partition_query in partition_queries]
+    try:
+        remaining = len(producers)
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        for producer in producers:
+            producer.cancel()
+
+async def get_export_template_ids(query: dict) -> List[str]:
+    if "template_id" in query:
+        return [query["template_id"]]
+    return await db.report_submissions.distinct("template_id", query)
+
+async def get_export_template_fields(template_ids: List[str]) -> List[dict]:
+    """Ordered union of the field definitions of every template covered by an export"""
+    templates = await resolve_templates(await db.report_templates.find(
+        {"id": {"$in": template_ids}},
+        {"_id": 0, "id": 1, "name": 1, "fields": 1, "dynamic_field_ids": 1, "dynamic_field_names": 1, "dynamic_field_overrides": 1, "updated_at": 1}
+    ).sort("name", 1).to_list(None))
+    
+    fields = []
+    positions = {}
+    for template in templates:
+        for field in sorted(template.get("fields", []), key=lambda f: f.get("order", 0)):
+            position = positions.get(field["name"])
+            if position is None:
+                positions[field["name"]] = len(fields)
+                fields.append(field)
+                continue
+            first = fields[position]
+            if ARROW_FIELD_TYPES.get(first.get("field_type")) != ARROW_FIELD_TYPES.get(field.get("field_type")):
+                # Templates disagree on the type; a text column keeps every value instead of nulling some
+                if first.get("field_type") != "text":
+                    logger.warning(
+                        f"Export field {field['name']!r} has conflicting types "
+                        f"({first.get('field_type')}, {field.get('field_type')}); exporting it as text"
+                    )
+                    fields[position] = {**first, "field_type": "text"}
+    return fields
+
+async def get_export_data_keys(template_ids: List[str]) -> List[str]:
+    """Every data key recorded for the exported templates, including keys no template defines anymore"""
+    keys = await db.report_data_keys.distinct("key", {"template_id": {"$in": template_ids}})
+    return sorted(keys)
+
+async def get_export_fields(query: dict) -> List[dict]:
+    """Template fields in template order, then data keys that no exported template defines
+    anymore as text fields, so that no submitted value is left out"""
+    template_ids = await get_export_template_ids(query)
+    fields = await get_export_template_fields(template_ids)
+    known = {field["name"] for field in fields}
+    fields.extend(
+        {"name": key, "field_type": "text"}
+        for key in await get_export_data_keys(template_ids)
+        if key not in known
+    )
+    return fields
+
+def export_filename(extension: str) -> str:
+    return f"reports_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+async def stream_reports_csv(query: dict, on_batch=None, partitions: int = 1):
+    """Write CSV rows incrementally, one cursor batch at a time, with the columns of ``get_export_fields``"""
+    field_names = [field["name"] for field in await get_export_fields(query)]
+    header = EXPORT_BASE_COLUMNS + [f"data_{name}" for name in field_names]
+    
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=header, extrasaction="ignore", restval="")
+    writer.writeheader()
+    yield buffer.getvalue()
+    
+    async for reports, names in iter_export_batches(query, partitions=partitions):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(flatten_report_for_export(report, names) for report in reports)
+        yield buffer.getvalue()
+        if on_batch:
+            await on_batch(len(reports))
+
+async def stream_reports_jsonl(query: dict, on_batch=None, partitions: int = 1):
+    """Write one JSON object per line, one cursor batch at a time"""
+    async for reports, names in iter_export_batches(query, partitions=partitions):
+        yield "".join(json.dumps(flatten_report_for_export(report, names)) + "\n" for report in reports)
+        if on_batch:
+            await on_batch(len(reports))
+
+# Columnar (Parquet / Arrow IPC) export
+ARROW_FIELD_TYPES = {
+    "number": pa.float64(),
+    "date": pa.date32(),
+    "multiselect": pa.list_(pa.string()),
+    "checkbox": pa.bool_()
+}
+COLUMNAR_EXPORT_FORMATS = {
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrows", "application/vnd.apache.arrow.stream")
+}
+TRUE_STRINGS = {"true", "yes", "on", "1"}
+
+def build_export_arrow_schema(fields: List[dict]) -> pa.Schema:
+    timestamp = pa.timestamp("us", tz="UTC")
+    columns = [
+        ("report_id", pa.string()),
+        ("template_name", pa.string()),
+        ("username", pa.string()),
+        ("location_name", pa.string()),
+        ("report_period", pa.string()),
+        ("status", pa.string()),
+        ("submitted_at", timestamp),
+        ("created_at", timestamp),
+        ("updated_at", timestamp)
+    ]
+    columns.extend(
+        (f"data_{field['name']}", ARROW_FIELD_TYPES.get(field.get("field_type"), pa.string()))
+        for field in fields
+    )
+    return pa.schema(columns)
+
+def coerce_export_value(field_type: Optional[str], value):
+    """Coerce a submitted value to the Arrow type of its template field, or None"""
+    if value is None or value == "":
+        return None
+    try:
+        if field_type == "number":
+            return float(value)
+        if field_type == "date":
+            if isinstance(value, datetime):
+                return value.date()
+            return date.fromisoformat(str(value)[:10])
+        if field_type == "multiselect":
+            return [str(item) for item in value] if isinstance(value, list) else [str(value)]
+        if field_type == "checkbox":
+            return value if isinstance(value, bool) else str(value).strip().lower() in TRUE_STRINGS
+    except (TypeError, ValueError):
+        return None
+    return export_cell(value)
+
+def reports_to_record_batch(reports: List[dict], names: dict, schema: pa.Schema, fields: List[dict]) -> pa.RecordBatch:
+    columns = {
+        "report_id": [report["id"] for report in reports],
+        "template_name": [names["templates"].get(report["template_id"], "Unknown Template") for report in reports],
+        "username": [names["users"].get(report["user_id"], "Unknown User") for report in reports],
+        "location_name": [names["locations"].get(report.get("location_id")) for report in reports],
+        "report_period": [report["report_period"] for report in reports],
+        "status": [report["status"] for report in reports],
+        "submitted_at": [report.get("submitted_at") for report in reports],
+        "created_at": [report.get("created_at") for report in reports],
+        "updated_at": [report.get("updated_at") for report in reports]
+    }
+    for field in fields:
+        columns[f"data_{field['name']}"] = [
+            coerce_export_value(field.get("field_type"), (report.get("data") or {}).get(field["name"]))
+            for report in reports
+        ]
+    return pa.record_batch(
+        [pa.array(columns[column.name], type=column.type) for column in schema],
+        schema=schema
+    )
+
+class DrainableSink(io.RawIOBase):
+    """Write-only sink that tracks its absolute position while handing written bytes to a stream"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def stream_reports_columnar(query: dict, format: str, on_batch=None, partitions: int = 1):
+    """Write typed record batches per cursor batch as Parquet row groups or Arrow IPC messages"""
+    fields = await get_export_fields(query)
+    schema = build_export_arrow_schema(fields)
+    
+    sink = DrainableSink()
+    if format == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    
+    try:
+        async for reports, names in iter_export_batches(query, partitions=partitions):
+            writer.write_batch(reports_to_record_batch(reports, names, schema, fields))
+            yield sink.drain()
+            if on_batch:
+                await on_batch(len(reports))
+    finally:
+        writer.close()
+    yield sink.drain()
+
+async def stream_reports_export(query: dict, format: str, on_batch=None, partitions: int = 1):
+    """Encode an export as bytes in any supported format"""
+    if format in COLUMNAR_EXPORT_FORMATS:
+        async for chunk in stream_reports_columnar(query, format, on_batch, partitions):
+            yield chunk
+        return
+    if format == "csv":
+        stream = stream_reports_csv(query, on_batch, partitions)
+    else:
+        stream = stream_reports_jsonl(query, on_batch, partitions)
+    async for chunk in stream:
+        yield chunk.encode("utf-8")
+
+@api_router.get("/admin/reports/export")
+async def export_reports(
+    current_user: User = Depends(get_admin_user),
+    format: str = "csv",
+    status: Optional[str] = None,
+    template_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    partitions: int = 1
+):
+    """Export reports in CSV, JSON, Parquet or Arrow IPC format.
     
-    # Check permissions - users can only see their own reports, admins can see all
-    if current_user.role != "ADMIN" and report["user_id"] != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to view this report"
-        )
+    partitions > 1 reads created_at ranges concurrently on separate cursors; rows are then
+    only sorted within each range.
+    """
+    filters = {
+        "status": status,
+        "template_id": template_id,
+        "user_id": user_id,
+        "date_from": date_from,
+        "date_to": date_to
+    }
     
-    # Enrich with names
-    template = await db.report_templates.find_one({"id": report["template_id"]})
-    template_name = template["name"] if template else "Unknown Template"
+    # Identical streamed exports that start together share one database scan
+    stream_key = single_flight_key("admin/reports/export", format=format, partitions=partitions, **filters)
+    query = build_export_query(**filters)
     
-    user = await db.users.find_one({"id": report["user_id"]})
-    username = user["username"] if user else "Unknown User"
+    if format.lower() in COLUMNAR_EXPORT_FORMATS:
+        extension, media_type = COLUMNAR_EXPORT_FORMATS[format.lower()]
+        filename = export_filename(extension)
+        return StreamingResponse(
+            stream_coalescer.stream(
+                stream_key, lambda: stream_reports_columnar(query, format.lower(), partitions=partitions)
+            ),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
     
-    location_name = None
-    if report.get("location_id"):
-        location = await db.locations.find_one({"id": report["location_id"]})
-        location_name = location["name"] if location else None
+    if format.lower() == "csv":
+        filename = export_filename("csv")
+        return StreamingResponse(
+            stream_coalescer.stream(stream_key, lambda: stream_reports_csv(query, partitions=partitions)),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
     
-    return ReportSubmissionResponse(
-        **report,
-        template_name=template_name,
-        username=username,
-        location_name=location_name
+    return await single_flight.do(
+        single_flight_key("admin/reports/export", format="json", **filters),
+        lambda: compute_reports_export(**filters, partitions=partitions)
     )
 
-# Advanced Report Management - Search, Filter, Export
-@api_router.get("/admin/reports/search")
-async def search_reports(
-    current_user: User = Depends(get_admin_user),
-    search_term: Optional[str] = None,
+async def compute_reports_export(
     status: Optional[str] = None,
     template_id: Optional[str] = None,
     user_id: Optional[str] = None,
-    location_id: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
-    page: int = 1,
-    limit: int = 20
+    partitions: int = 1
 ):
-    """Advanced search and filtering for reports"""
-    # Build query
-    query = {}
+    query = build_export_query(status, template_id, user_id, date_from, date_to)
     
-    if search_term:
-        # Search in report data fields
-        query["$text"] = {"$search": search_term}
+    export_data = []
+    async for reports, names in iter_export_batches(query, partitions=partitions):
+        export_data.extend(flatten_report_for_export(report, names) for report in reports)
     
-    if status:
-        query["status"] = status
+    return {
+        "format": "json",
+        "data": export_data,
+        "filename": export_filename("json")
+    }
+
+# Incremental export keyed on an (updated_at, id) watermark. updated_at comes from the
+# app server clock, not commit order, so a write can commit after a newer timestamp was
+# already read. Changes from the last INCREMENTAL_EXPORT_SAFETY_LAG_SECONDS are held back
+# until they are that old, so late commits within the lag still land after the watermark.
+INCREMENTAL_EXPORT_MAX_LIMIT = 5000
+INCREMENTAL_EXPORT_SAFETY_LAG_SECONDS = float(os.environ.get("INCREMENTAL_EXPORT_SAFETY_LAG_SECONDS", "5"))
+
+def encode_watermark(updated_at: datetime, item_id: str) -> str:
+    payload = json.dumps({"updated_at": updated_at.isoformat(), "id": item_id})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_watermark(watermark: str) -> Tuple[datetime, str]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(watermark.encode("ascii")))
+        return datetime.fromisoformat(payload["updated_at"]), payload["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid watermark"
+        )
+
+def after_watermark_query(updated_at: datetime, item_id: str) -> dict:
+    return {"$or": [
+        {"updated_at": {"$gt": updated_at}},
+        {"updated_at": updated_at, "id": {"$gt": item_id}}
+    ]}
+
+@api_router.get("/admin/reports/export/incremental")
+async def export_reports_incremental(
+    current_user: User = Depends(get_admin_user),
+    since: Optional[str] = None,
+    template_id: Optional[str] = None,
+    limit: int = 1000
+):
+    """Changes and deletions since a watermark, in (updated_at, id) order.
     
+    Only changes older than the safety lag are returned; the next watermark therefore
+    never passes ``safe_until`` and the following request re-reads the held-back tail.
+    """
+    limit = max(1, min(limit, INCREMENTAL_EXPORT_MAX_LIMIT))
+    safe_until = datetime.now(timezone.utc) - timedelta(seconds=INCREMENTAL_EXPORT_SAFETY_LAG_SECONDS)
+    query = {"updated_at": {"$lt": safe_until}}
+    if since:
+        query.update(after_watermark_query(*decode_watermark(since)))
     if template_id:
         query["template_id"] = template_id
     
-    if user_id:
-        query["user_id"] = user_id
+    # Both collections are read in watermark order and merged, so a single
+    # watermark covers upserts and deletions alike.
+    order = [("updated_at", 1), ("id", 1)]
+    reports = await db.report_submissions.find(query, {"_id": 0}).sort(order).limit(limit + 1).to_list(limit + 1)
+    tombstones = await db.report_tombstones.find(query, {"_id": 0}).sort(order).limit(limit + 1).to_list(limit + 1)
     
-    if location_id:
-        query["location_id"] = location_id
+    changes = sorted(
+        [("upsert", report) for report in reports] + [("delete", tombstone) for tombstone in tombstones],
+        key=lambda change: (change[1]["updated_at"], change[1]["id"])
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
     
-    if date_from or date_to:
-        date_query = {}
-        if date_from:
-            date_query["$gte"] = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
-        if date_to:
-            date_query["$lte"] = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
-        query["created_at"] = date_query
+    names = await resolve_report_names([doc for op, doc in changes if op == "upsert"])
+    items = []
+    for op, doc in changes:
+        if op == "upsert":
+            items.append({"op": "upsert", "report": flatten_report_for_export(doc, names)})
+        else:
+            items.append({
+                "op": "delete",
+                "report_id": doc["id"],
+                "template_id": doc.get("template_id"),
+                "report_period": doc.get("report_period"),
+                "deleted_at": doc["deleted_at"]
+            })
     
-    # Calculate pagination
-    skip = (page - 1) * limit
+    next_watermark = since
+    if changes:
+        last = changes[-1][1]
+        next_watermark = encode_watermark(last["updated_at"], last["id"])
     
-    # Get total count
-    total_count = await db.report_submissions.count_documents(query)
+    return {
+        "items": items,
+        "count": len(items),
+        "has_more": has_more,
+        "watermark": since,
+        "next_watermark": next_watermark,
+        "safe_until": safe_until
+    }
+
+# Background export jobs with on-disk artifacts
+EXPORT_DIR = Path(os.environ.get("EXPORT_DIR", str(ROOT_DIR / "exports")))
+EXPORT_JOB_CONCURRENCY = int(os.environ.get("EXPORT_JOB_CONCURRENCY", "2"))
+EXPORT_JOB_TTL_HOURS = float(os.environ.get("EXPORT_JOB_TTL_HOURS", "24"))
+EXPORT_CLEANUP_INTERVAL_SECONDS = float(os.environ.get("EXPORT_CLEANUP_INTERVAL_SECONDS", "300"))
+EXPORT_JOB_FORMATS = {
+    "csv": ("csv.gz", "application/gzip", True),
+    "json": ("jsonl.gz", "application/gzip", True),
+    "arrow": ("arrows.gz", "application/gzip", True),
+    # Parquet column chunks are already zstd-compressed
+    "parquet": ("parquet", "application/vnd.apache.parquet", False)
+}
+
+class ExportJobCreate(BaseModel):
+    format: str = "csv"
+    status: Optional[str] = None
+    template_id: Optional[str] = None
+    user_id: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    partitions: int = 1
+
+class ExportJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    format: str
+    filters: dict
+    partitions: int = 1
+    status: str = "queued"  # queued, running, completed, failed
+    total_rows: Optional[int] = None
+    rows_written: int = 0
+    artifact_size: Optional[int] = None
+    filename: Optional[str] = None
+    error: Optional[str] = None
+    created_by: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+
+def export_artifact_path(job_id: str, format: str) -> Path:
+    return EXPORT_DIR / f"{job_id}.{EXPORT_JOB_FORMATS[format][0]}"
+
+async def run_export_job(job_id: str, final_attempt: bool = True):
+    """Write an export job's artifact to disk, recording progress on the job document"""
+    job = await db.export_jobs.find_one({"id": job_id})
+    if not job or job["status"] not in ("queued", "running"):
+        return
     
-    # Get reports
-    reports_cursor = db.report_submissions.find(query).skip(skip).limit(limit).sort("created_at", -1)
-    reports = await reports_cursor.to_list(limit)
+    await db.export_jobs.update_one(
+        {"id": job_id},
+        {"$set": {"status": "running", "started_at": datetime.now(timezone.utc), "rows_written": 0}}
+    )
     
-    # Enrich with names
-    enriched_reports = []
-    for report in reports:
-        template = await db.report_templates.find_one({"id": report["template_id"]})
-        template_name = template["name"] if template else "Unknown Template"
-        
-        user = await db.users.find_one({"id": report["user_id"]})
-        username = user["username"] if user else "Unknown User"
+    format = job["format"]
+    path = export_artifact_path(job_id, format)
+    partial_path = path.with_name(path.name + ".part")
+    rows_written = 0
+    
+    async def record_progress(count: int):
+        nonlocal rows_written
+        rows_written += count
+        await db.export_jobs.update_one({"id": job_id}, {"$set": {"rows_written": rows_written}})
+    
+    try:
+        query = build_export_query(**job["filters"])
+        total_rows = await db.report_submissions.count_documents(query)
+        await db.export_jobs.update_one({"id": job_id}, {"$set": {"total_rows": total_rows}})
         
-        location_name = None
-        if report.get("location_id"):
-            location = await db.locations.find_one({"id": report["location_id"]})
-            location_name = location["name"] if location else None
+        EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+        compress = EXPORT_JOB_FORMATS[format][2]
+        artifact = gzip.open(partial_path, "wb") if compress else open(partial_path, "wb")
+        try:
+            async for chunk in stream_reports_export(
+                query, format, on_batch=record_progress, partitions=job.get("partitions", 1)
+            ):
+                await asyncio.to_thread(artifact.write, chunk)
+        finally:
+            artifact.close()
+        os.replace(partial_path, path)
         
-        enriched_report = ReportSubmissionResponse(
-            **report,
-            template_name=template_name,
-            username=username,
-            location_name=location_name
+        completed_at = datetime.now(timezone.utc)
+        await db.export_jobs.update_one(
+            {"id": job_id},
+            {"$set": {
+                "status": "completed",
+                "artifact_size": path.stat().st_size,
+                "filename": f"reports_export_{job['created_at'].strftime('%Y%m%d_%H%M%S')}.{EXPORT_JOB_FORMATS[format][0]}",
+                "completed_at": completed_at,
+                "expires_at": completed_at + timedelta(hours=EXPORT_JOB_TTL_HOURS)
+            }}
         )
-        enriched_reports.append(enriched_report)
-    
-    return {
-        "reports": enriched_reports,
-        "total_count": total_count,
-        "page": page,
-        "limit": limit,
-        "total_pages": (total_count + limit - 1) // limit
-    }
+    except Exception as exc:
+        partial_path.unlink(missing_ok=True)
+        failed_at = datetime.now(timezone.utc)
+        if final_attempt:
+            update = {
+                "status": "failed",
+                "error": str(exc),
+                "completed_at": failed_at,
+                "expires_at": failed_at + timedelta(hours=EXPORT_JOB_TTL_HOURS)
+            }
+        else:
+            update = {"status": "queued", "error": str(exc)}
+        await db.export_jobs.update_one({"id": job_id}, {"$set": update})
+        raise
 
-class BulkActionRequest(BaseModel):
-    action: str
-    report_ids: List[str]
+async def reopen_export_job(payload: dict):
+    await db.export_jobs.update_one(
+        {"id": payload["export_job_id"], "status": "failed"},
+        {"$set": {"status": "queued"}, "$unset": {"completed_at": "", "expires_at": ""}}
+    )
 
-@api_router.post("/admin/reports/bulk-actions")
-async def bulk_report_actions(
-    request: BulkActionRequest,
-    current_user: User = Depends(get_admin_user)
-):
-    """Perform bulk actions on reports"""
-    valid_actions = ["delete", "approve", "reject", "mark_reviewed"]
+@job_handler("export", concurrency=EXPORT_JOB_CONCURRENCY, on_retry=reopen_export_job)
+async def handle_export_job(payload: dict, job: dict):
+    await run_export_job(payload["export_job_id"], final_attempt=is_final_attempt(job))
+
+async def cleanup_expired_exports():
+    """Delete expired export artifacts and their job documents"""
+    now = datetime.now(timezone.utc)
+    expired = await db.export_jobs.find(
+        {"expires_at": {"$lte": now}}, {"_id": 0, "id": 1, "format": 1}
+    ).to_list(None)
+    for job in expired:
+        if job.get("format") in EXPORT_JOB_FORMATS:
+            export_artifact_path(job["id"], job["format"]).unlink(missing_ok=True)
+    if expired:
+        await db.export_jobs.delete_many({"id": {"$in": [job["id"] for job in expired]}})
     
-    if request.action not in valid_actions:
+    # Artifacts whose job documents are already gone (e.g. removed by the TTL index)
+    if EXPORT_DIR.exists():
+        orphan_cutoff = time.time() - EXPORT_JOB_TTL_HOURS * 3600 - EXPORT_CLEANUP_INTERVAL_SECONDS
+        for artifact in EXPORT_DIR.iterdir():
+            if artifact.is_file() and artifact.stat().st_mtime < orphan_cutoff:
+                artifact.unlink(missing_ok=True)
+
+async def export_cleanup_loop():
+    while True:
+        try:
+            await cleanup_expired_exports()
+        except Exception:
+            logger.exception("Export artifact cleanup failed")
+        await asyncio.sleep(EXPORT_CLEANUP_INTERVAL_SECONDS)
+
+def parse_byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range "bytes=" header into an inclusive (start, end) pair.
+
+    Returns None when the whole file should be sent and raises ValueError when the
+    range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if not start_text:
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise ValueError("Empty suffix range")
+            return max(size - suffix, 0), size - 1
+        start = int(start_text)
+        end = min(int(end_text), size - 1) if end_text else size - 1
+    except ValueError:
+        raise ValueError(f"Invalid range: {range_header}")
+    if start >= size or start > end:
+        raise ValueError(f"Unsatisfiable range: {range_header}")
+    return start, end
+
+class RangeFileResponse(Response):
+    """Serve a byte range of a file, using the ASGI zero-copy (sendfile) extension
+    when the server provides it and chunked reads otherwise"""
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: Path, start: int, end: int, size: int, headers: dict, media_type: str):
+        super().__init__(status_code=status.HTTP_206_PARTIAL_CONTENT, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        
+        count = self.end - self.start + 1
+        with open(self.path, "rb") as artifact:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": artifact,
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False
+                })
+                return
+            
+            artifact.seek(self.start)
+            while count > 0:
+                chunk = await asyncio.to_thread(artifact.read, min(self.chunk_size, count))
+                count -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": count > 0 and bool(chunk)})
+                if not chunk:
+                    break
+
+@api_router.post("/admin/reports/export-jobs", response_model=ExportJob, status_code=status.HTTP_202_ACCEPTED)
+async def create_export_job(job_data: ExportJobCreate, current_user: User = Depends(get_admin_user)):
+    """Queue an export to be written to disk in the background"""
+    format = job_data.format.lower()
+    if format not in EXPORT_JOB_FORMATS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid action. Must be one of: {', '.join(valid_actions)}"
+            detail=f"Invalid format. Must be one of: {', '.join(EXPORT_JOB_FORMATS)}"
         )
     
-    if not request.report_ids:
+    filters = job_data.dict(exclude={"format", "partitions"})
+    try:
+        build_export_query(**filters)
+    except ValueError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No report IDs provided"
+            detail=f"Invalid filter: {exc}"
         )
     
-    # Check that all reports exist
-    existing_reports = await db.report_submissions.find({"id": {"$in": request.report_ids}}).to_list(1000)
-    if len(existing_reports) != len(request.report_ids):
+    job = ExportJob(
+        format=format,
+        filters=filters,
+        partitions=max(1, min(job_data.partitions, EXPORT_MAX_PARTITIONS)),
+        created_by=current_user.id
+    )
+    await db.export_jobs.insert_one(job.dict())
+    await enqueue_job("export", {"export_job_id": job.id})
+    return job
+
+@api_router.get("/admin/reports/export-jobs", response_model=List[ExportJob])
+async def get_export_jobs(current_user: User = Depends(get_admin_user), limit: int = 50):
+    jobs = await db.export_jobs.find().sort("created_at", -1).to_list(limit)
+    return [ExportJob(**job) for job in jobs]
+
+@api_router.get("/admin/reports/export-jobs/{job_id}", response_model=ExportJob)
+async def get_export_job(job_id: str, current_user: User = Depends(get_admin_user)):
+    job = await db.export_jobs.find_one({"id": job_id})
+    if not job:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Some report IDs were not found"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    return ExportJob(**job)
+
+@api_router.get("/admin/reports/export-jobs/{job_id}/download")
+async def download_export_job(job_id: str, request: Request, current_user: User = Depends(get_admin_user)):
+    """Download a finished export artifact, honouring Range requests for resumable downloads"""
+    job = await db.export_jobs.find_one({"id": job_id})
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    if job["status"] != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Export job is {job['status']}"
         )
     
-    if request.action == "delete":
-        result = await db.report_submissions.delete_many({"id": {"$in": request.report_ids}})
-        return {"message": f"Successfully deleted {result.deleted_count} reports"}
+    path = export_artifact_path(job_id, job["format"])
+    if not path.exists():
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Export artifact has expired"
+        )
     
-    elif request.action in ["approve", "reject", "mark_reviewed"]:
-        update_data = {
-            "reviewed_at": datetime.now(timezone.utc),
-            "reviewed_by": current_user.id
-        }
-        
-        if request.action == "approve":
-            update_data["status"] = "approved"
-        elif request.action == "reject":
-            update_data["status"] = "rejected"
-        elif request.action == "mark_reviewed":
-            update_data["status"] = "reviewed"
-        
-        result = await db.report_submissions.update_many(
-            {"id": {"$in": request.report_ids}},
-            {"$set": update_data}
+    size = path.stat().st_size
+    etag = f'"{job_id}-{size}"'
+    media_type = EXPORT_JOB_FORMATS[job["format"]][1]
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "content-disposition": f'attachment; filename="{job["filename"]}"'
+    }
+    
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
+    try:
+        byte_range = parse_byte_range(range_header, size)
+    except ValueError:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"content-range": f"bytes */{size}", "accept-ranges": "bytes"}
         )
-        
-        return {"message": f"Successfully {request.action}ed {result.modified_count} reports"}
+    
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    return RangeFileResponse(path, byte_range[0], byte_range[1], size, headers, media_type)
 
-@api_router.get("/admin/reports/export")
-async def export_reports(
+# Admin inspection of the job queue
+@api_router.get("/admin/jobs", response_model=List[QueuedJob])
+async def get_queued_jobs(
     current_user: User = Depends(get_admin_user),
-    format: str = "csv",
-    status: Optional[str] = None,
-    template_id: Optional[str] = None,
-    user_id: Optional[str] = None,
-    date_from: Optional[str] = None,
-    date_to: Optional[str] = None
+    job_status: Optional[str] = Query(None, alias="status"),
+    job_type: Optional[str] = Query(None, alias="type"),
+    limit: int = 50
 ):
-    """Export reports in CSV or JSON format"""
-    # Build query
     query = {}
+    if job_status:
+        query["status"] = job_status
+    if job_type:
+        query["type"] = job_type
+    jobs = await db.jobs.find(query).sort("created_at", -1).to_list(limit)
+    return [QueuedJob(**job) for job in jobs]
+
+@api_router.get("/admin/jobs/summary")
+async def get_job_queue_summary(current_user: User = Depends(get_admin_user)):
+    """Job counts by type and status, plus this process's worker usage"""
+    counts = await db.jobs.aggregate([
+        {"$group": {"_id": {"type": "$type", "status": "$status"}, "count": {"$sum": 1}}}
+    ]).to_list(None)
+    by_type = {
+        job_type: {"concurrency": spec["concurrency"], "running_here": job_pool._running.get(job_type, 0)}
+        for job_type, spec in JOB_HANDLERS.items()
+    }
+    for row in counts:
+        by_type.setdefault(row["_id"]["type"], {})[row["_id"]["status"]] = row["count"]
+    return {"worker_id": job_pool.worker_id, "workers": job_pool.workers, "types": by_type}
+
+@api_router.get("/admin/jobs/{job_id}", response_model=QueuedJob)
+async def get_queued_job(job_id: str, current_user: User = Depends(get_admin_user)):
+    job = await db.jobs.find_one({"id": job_id})
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return QueuedJob(**job)
+
+@api_router.post("/admin/jobs/{job_id}/retry", response_model=QueuedJob)
+async def retry_queued_job(job_id: str, current_user: User = Depends(get_admin_user)):
+    """Requeue a failed job with a fresh set of attempts"""
+    job = await db.jobs.find_one({"id": job_id, "status": "failed"})
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Only failed jobs can be retried"
+        )
+    # Reopen the status document first so a worker never claims a job whose document is still failed
+    on_retry = JOB_HANDLERS.get(job["type"], {}).get("on_retry")
+    if on_retry:
+        await on_retry(job["payload"])
     
-    if status:
-        query["status"] = status
-    if template_id:
-        query["template_id"] = template_id
-    if user_id:
-        query["user_id"] = user_id
-    
+    now = datetime.now(timezone.utc)
+    job = await db.jobs.find_one_and_update(
+        {"id": job_id, "status": "failed"},
+        {
+            "$set": {"status": "queued", "attempts": 0, "run_at": now, "updated_at": now},
+            "$unset": {"finished_at": ""}
+        },
+        return_document=ReturnDocument.AFTER
+    )
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Job was retried concurrently"
+        )
+    job_pool.notify()
+    return QueuedJob(**job)
+
+# Audit log queries
+@api_router.get("/admin/audit-logs", response_model=List[AuditLogEntry])
+async def get_audit_logs(
+    current_user: User = Depends(get_admin_user),
+    action: Optional[str] = None,
+    actor_id: Optional[str] = None,
+    target_type: Optional[str] = None,
+    target_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Newest-first audit events; pass the oldest created_at seen as date_to to page back"""
+    query = {}
+    if action:
+        query["action"] = action
+    if actor_id:
+        query["actor_id"] = actor_id
+    if target_type:
+        query["target_type"] = target_type
+    if target_id:
+        query["target_id"] = target_id
     if date_from or date_to:
-        date_query = {}
-        if date_from:
-            date_query["$gte"] = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
-        if date_to:
-            date_query["$lte"] = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
+        try:
+            date_query = {}
+            if date_from:
+                date_query["$gte"] = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
+            if date_to:
+                date_query["$lt"] = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid date: {exc}"
+            )
         query["created_at"] = date_query
     
-    # Get reports
-    reports = await db.report_submissions.find(query).to_list(1000)
-    
-    # Enrich with names
-    export_data = []
-    for report in reports:
-        template = await db.report_templates.find_one({"id": report["template_id"]})
-        template_name = template["name"] if template else "Unknown Template"
-        
-        user = await db.users.find_one({"id": report["user_id"]})
-        username = user["username"] if user else "Unknown User"
-        
-        location_name = None
-        if report.get("location_id"):
-            location = await db.locations.find_one({"id": report["location_id"]})
-            location_name = location["name"] if location else None
-        
-        # Flatten report data for export
-        flat_data = {
-            "report_id": report["id"],
-            "template_name": template_name,
-            "username": username,
-            "location_name": location_name or "",
-            "report_period": report["report_period"],
-            "status": report["status"],
-            "submitted_at": report.get("submitted_at", "").isoformat() if report.get("submitted_at") else "",
-            "created_at": report["created_at"].isoformat(),
-            "updated_at": report["updated_at"].isoformat()
-        }
-        
-        # Add report data fields
-        for key, value in report.get("data", {}).items():
-            flat_data[f"data_{key}"] = str(value) if value is not None else ""
-        
-        export_data.append(flat_data)
-    
-    if format.lower() == "csv":
-        # For now, return the data structure - in production you'd generate actual CSV
-        return {
-            "format": "csv",
-            "data": export_data,
-            "filename": f"reports_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        }
-    else:
-        return {
-            "format": "json",
-            "data": export_data,
-            "filename": f"reports_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        }
+    entries = await db.audit_logs.find(query, {"_id": 0}).sort("created_at", -1).to_list(limit)
+    return [AuditLogEntry(**entry) for entry in entries]
+
+@api_router.get("/admin/audit-logs/writer")
+async def get_audit_log_writer_stats(current_user: User = Depends(get_admin_user)):
+    return {"buffered": audit_log.buffered, "written": audit_log.written, "dropped": audit_log.dropped}
 
 # Enhanced Template Builder with Preview
+# The builder previews on every edit, so rendered fields are cached by their
+# definition and whole previews by a content hash of the template JSON.
+PREVIEW_CACHE_SIZE = int(os.environ.get("PREVIEW_CACHE_SIZE", "256"))
+
+_field_preview_fragments = LRUCache(maxsize=4096)
+_template_previews = LRUCache(maxsize=PREVIEW_CACHE_SIZE)
+
+def preview_cache_key(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
 @api_router.post("/admin/report-templates/preview")
 async def preview_template(
     template_data: dict,
     current_user: User = Depends(get_admin_user)
 ):
     """Generate a preview of how a template will look"""
+    # Validate the template structure
+    if "name" not in template_data or "fields" not in template_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Template must have name and fields"
+        )
+    
+    key = preview_cache_key(template_data)
+    preview = _template_previews.get(key)
+    if preview is not None:
+        return preview
+    
     try:
-        # Validate the template structure
-        if "name" not in template_data or "fields" not in template_data:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Template must have name and fields"
-            )
-        
-        # Generate preview HTML
-        html_preview = f"""
-        <div class="template-preview">
-            <h3>{template_data.get('name', 'Untitled Template')}</h3>
-            <p>{template_data.get('description', '')}</p>
-            <form class="preview-form">
-        """
-        
-        for field in template_data.get('fields', []):
-            field_html = generate_field_html_preview(field)
-            html_preview += field_html
-        
-        html_preview += """
-            </form>
-        </div>
-        """
-        
-        return {
-            "preview_html": html_preview,
-            "field_count": len(template_data.get('fields', [])),
-            "estimated_completion_time": len(template_data.get('fields', [])) * 2  # 2 minutes per field estimate
-        }
+        fields = template_data.get("fields") or []
+        parts = [
+            '<div class="template-preview">',
+            f'<h3>{html.escape(str(template_data.get("name") or "Untitled Template"))}</h3>',
+            f'<p>{html.escape(str(template_data.get("description") or ""))}</p>',
+            '<form class="preview-form">'
+        ]
+        parts.extend(generate_field_html_preview(field) for field in fields)
+        parts.append('</form></div>')
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error generating preview: {str(e)}"
         )
+    
+    preview = {
+        "preview_html": "".join(parts),
+        "field_count": len(fields),
+        "estimated_completion_time": len(fields) * 2  # 2 minutes per field estimate
+    }
+    _template_previews.set(key, preview)
+    return preview
 
 def generate_field_html_preview(field: dict) -> str:
-    """Generate HTML preview for a single field"""
+    """Generate HTML preview for a single field, reusing fragments for unchanged definitions"""
+    key = preview_cache_key(field)
+    fragment = _field_preview_fragments.get(key)
+    if fragment is None:
+        fragment = render_field_html_preview(field)
+        _field_preview_fragments.set(key, fragment)
+    return fragment
+
+def render_field_html_preview(field: dict) -> str:
     field_type = field.get('field_type', 'text')
-    label = field.get('label', 'Untitled Field')
-    placeholder = field.get('placeholder', '')
-    required = field.get('required', False)
+    label = html.escape(str(field.get('label') or 'Untitled Field'))
+    placeholder = html.escape(str(field.get('placeholder') or ''))
     
-    html = f'<div class="field-preview mb-3">'
-    html += f'<label class="form-label">{label}'
-    if required:
-        html += ' <span class="text-danger">*</span>'
-    html += '</label>'
+    parts = ['<div class="field-preview mb-3">', f'<label class="form-label">{label}']
+    if field.get('required', False):
+        parts.append(' <span class="text-danger">*</span>')
+    parts.append('</label>')
     
     if field_type == 'text':
-        html += f'<input type="text" class="form-control" placeholder="{placeholder}" disabled>'
+        parts.append(f'<input type="text" class="form-control" placeholder="{placeholder}" disabled>')
     elif field_type == 'textarea':
-        html += f'<textarea class="form-control" placeholder="{placeholder}" rows="3" disabled></textarea>'
+        parts.append(f'<textarea class="form-control" placeholder="{placeholder}" rows="3" disabled></textarea>')
     elif field_type == 'number':
-        html += f'<input type="number" class="form-control" placeholder="{placeholder}" disabled>'
+        parts.append(f'<input type="number" class="form-control" placeholder="{placeholder}" disabled>')
     elif field_type == 'date':
-        html += f'<input type="date" class="form-control" disabled>'
-    elif field_type == 'dropdown':
-        html += '<select class="form-control" disabled>'
-        html += '<option>Select an option...</option>'
-        for option in field.get('options', []):
-            html += f'<option>{option}</option>'
-        html += '</select>'
+        parts.append('<input type="date" class="form-control" disabled>')
+    elif field_type in ('dropdown', 'multiselect'):
+        options = [f'<option>{html.escape(str(option))}</option>' for option in field.get('options') or []]
+        if field_type == 'dropdown':
+            parts.append('<select class="form-control" disabled><option>Select an option...</option>')
+        else:
+            parts.append('<select class="form-control" multiple disabled>')
+        parts.extend(options)
+        parts.append('</select>')
     elif field_type == 'checkbox':
-        html += f'<div class="form-check">'
-        html += f'<input type="checkbox" class="form-check-input" disabled>'
-        html += f'<label class="form-check-label">{label}</label>'
-        html += '</div>'
+        parts.append(
+            '<div class="form-check">'
+            '<input type="checkbox" class="form-check-input" disabled>'
+            f'<label class="form-check-label">{label}</label>'
+            '</div>'
+        )
     elif field_type == 'file':
-        html += '<input type="file" class="form-control" disabled>'
+        parts.append('<input type="file" class="form-control" disabled>')
     
-    html += '</div>'
-    return html
+    parts.append('</div>')
+    return "".join(parts)
 
 # Enhanced Field Type Support
 @api_router.get("/admin/field-types")
@@ -1574,6 +5392,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Content-Disposition"],
 )
 
 # Configure logging
@@ -1586,8 +5405,24 @@ logger = logging.getLogger(__name__)
 @app.on_event("startup")
 async def startup_event():
     await init_database()
+    await surge_buffer.replay()
+    surge_buffer.start()
+    audit_log.start()
+    job_pool.start()
+    app.state.export_cleanup_task = spawn_background(export_cleanup_loop())
+    app.state.revision_compaction_task = None
+    if REVISION_COMPACTION_INTERVAL_HOURS > 0:
+        app.state.revision_compaction_task = spawn_background(
+            periodic_job_loop("revision_compaction", {}, REVISION_COMPACTION_INTERVAL_HOURS * 3600)
+        )
     logger.info("MonthlyReportsHub started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    app.state.export_cleanup_task.cancel()
+    if app.state.revision_compaction_task:
+        app.state.revision_compaction_task.cancel()
+    await surge_buffer.stop()
+    await job_pool.stop()
+    await audit_log.stop()
     client.close()
\ No newline at end of file
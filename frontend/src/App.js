@@ -1590,10 +1590,18 @@ const Dashboard = () => {
   const handleExport = async (filters) => {
     try {
       const params = new URLSearchParams({...filters, format: 'csv'}).toString();
-      const response = await axios.get(`/admin/reports/export?${params}`);
+      const response = await axios.get(`/admin/reports/export?${params}`, { responseType: 'blob' });
       
-      // For now, just show the export data - in production you'd trigger download
-      alert(`Export ready: ${response.data.filename}\nRecords: ${response.data.data.length}`);
+      const disposition = response.headers['content-disposition'] || '';
+      const filenameMatch = disposition.match(/filename="?([^"]+)"?/);
+      const url = window.URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = filenameMatch ? filenameMatch[1] : 'reports_export.csv';
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      window.URL.revokeObjectURL(url);
     } catch (error) {
       console.error('Failed to export reports:', error);
       setError('Failed to export reports');
@@ -17,12 +17,14 @@ class Stage3EnhancedAPITester:
         self.created_template_id = None
         self.test_report_ids = []
 
-    def run_test(self, name, method, endpoint, expected_status, data=None, token=None, expect_json=True, params=None):
+    def run_test(self, name, method, endpoint, expected_status, data=None, token=None, expect_json=True, params=None, extra_headers=None):
         """Run a single API test"""
         url = f"{self.api_url}/{endpoint}"
         headers = {'Content-Type': 'application/json'}
         if token:
             headers['Authorization'] = f'Bearer {token}'
+        if extra_headers:
+            headers.update(extra_headers)
 
         self.tests_run += 1
         print(f"\n🔍 Testing {name}...")
@@ -48,6 +50,8 @@ class Stage3EnhancedAPITester:
                 response = requests.post(url, json=data, headers=headers, params=params, timeout=10)
             elif method == 'PUT':
                 response = requests.put(url, json=data, headers=headers, params=params, timeout=10)
+            elif method == 'PATCH':
+                response = requests.patch(url, json=data, headers=headers, params=params, timeout=10)
             elif method == 'DELETE':
                 response = requests.delete(url, headers=headers, params=params, timeout=10)
 
@@ -695,6 +699,243 @@ class Stage3EnhancedAPITester:
             }
         )
 
+    # Background jobs, revisions, idempotency and template versions
+    def test_invalid_validation_pattern(self):
+        """Test that a dynamic field with an invalid regex pattern is rejected"""
+        return self.run_test(
+            "Create Field With Invalid Pattern",
+            "POST",
+            "admin/dynamic-fields",
+            400,
+            data={
+                "section": "Test Section",
+                "label": "Broken Pattern Field",
+                "field_type": "text",
+                "validation": {"pattern": "("}
+            },
+            token=self.admin_token
+        )
+
+    def get_test_template_id(self):
+        """The template created from dynamic fields, or any existing template"""
+        if self.created_template_id:
+            return self.created_template_id
+        success, response = self.run_test(
+            "Get Templates",
+            "GET",
+            "admin/report-templates",
+            200,
+            token=self.admin_token
+        )
+        return response[0]['id'] if success and response else None
+
+    def test_idempotent_report_save(self):
+        """Test that retrying a report save with the same Idempotency-Key replays the response"""
+        template_id = self.get_test_template_id()
+        if not template_id:
+            print("❌ No template available for idempotency test")
+            return False
+        
+        key = f"stage3-{datetime.now().timestamp()}"
+        report_data = {
+            "template_id": template_id,
+            "report_period": "2025-03",
+            "status": "draft",
+            "data": {}
+        }
+        success1, first = self.run_test(
+            "Save Report With Idempotency-Key",
+            "POST",
+            "reports",
+            200,
+            data=report_data,
+            token=self.user_token,
+            extra_headers={"Idempotency-Key": key}
+        )
+        success2, replay = self.run_test(
+            "Retry Report Save With Same Key",
+            "POST",
+            "reports",
+            200,
+            data=report_data,
+            token=self.user_token,
+            extra_headers={"Idempotency-Key": key}
+        )
+        success3, _ = self.run_test(
+            "Reuse Key With Different Body (Should Fail)",
+            "POST",
+            "reports",
+            422,
+            data={**report_data, "report_period": "2025-04"},
+            token=self.user_token,
+            extra_headers={"Idempotency-Key": key}
+        )
+        return success1 and success2 and success3 and first.get("id") == replay.get("id")
+
+    def test_patch_report_draft(self):
+        """Test partial draft autosave"""
+        if not self.test_report_ids:
+            print("❌ No test report IDs available for draft patch")
+            return False
+        
+        success, patched = self.run_test(
+            "Patch Report Draft Data",
+            "PATCH",
+            f"reports/{self.test_report_ids[0]}/data",
+            200,
+            data={"data": {"test_field": "Patched draft data"}},
+            token=self.user_token
+        )
+        return success and patched.get("updated_fields") == ["test_field"]
+
+    def test_report_revisions(self):
+        """Test listing a report's revisions and reading the latest one"""
+        if not self.test_report_ids:
+            print("❌ No test report IDs available for revision history")
+            return False
+        
+        report_id = self.test_report_ids[0]
+        success1, revisions = self.run_test(
+            "Get Report Revisions",
+            "GET",
+            f"reports/{report_id}/revisions",
+            200,
+            token=self.user_token
+        )
+        if not success1 or not revisions:
+            return False
+        
+        success2, revision = self.run_test(
+            "Get Report At Latest Revision",
+            "GET",
+            f"reports/{report_id}/revisions/{revisions[0]['revision']}",
+            200,
+            token=self.user_token
+        )
+        return success2 and "data" in revision
+
+    def test_template_versions(self):
+        """Test listing and reading immutable template versions"""
+        template_id = self.get_test_template_id()
+        if not template_id:
+            print("❌ No template available for version test")
+            return False
+        
+        success1, versions = self.run_test(
+            "List Template Versions",
+            "GET",
+            f"admin/report-templates/{template_id}/versions",
+            200,
+            token=self.admin_token
+        )
+        if not success1 or not versions:
+            return False
+        
+        success2, _ = self.run_test(
+            "Get Template Version",
+            "GET",
+            f"report-templates/{template_id}/versions/{versions[0]['version']}",
+            200,
+            token=self.user_token
+        )
+        return success2
+
+    def test_bulk_action_job_requires_filter(self):
+        """Test that a filter-based bulk action without any filter is rejected"""
+        success1, _ = self.run_test(
+            "Bulk Action Job Without Filter (Should Fail)",
+            "POST",
+            "admin/reports/bulk-actions/jobs",
+            400,
+            data={"action": "approve"},
+            token=self.admin_token
+        )
+        success2, _ = self.run_test(
+            "Bulk Action Job With Filter",
+            "POST",
+            "admin/reports/bulk-actions/jobs",
+            202,
+            data={"action": "mark_reviewed", "user_id": self.test_user_id},
+            token=self.admin_token
+        )
+        return success1 and success2
+
+    def test_export_job(self):
+        """Test queueing a background export job"""
+        success, job = self.run_test(
+            "Create Export Job",
+            "POST",
+            "admin/reports/export-jobs",
+            202,
+            data={"format": "csv", "status": "submitted"},
+            token=self.admin_token
+        )
+        if not success:
+            return False
+        
+        success2, _ = self.run_test(
+            "Get Export Job",
+            "GET",
+            f"admin/reports/export-jobs/{job['id']}",
+            200,
+            token=self.admin_token
+        )
+        return success2
+
+    def test_incremental_export(self):
+        """Test the watermark-based incremental export"""
+        success, page = self.run_test(
+            "Incremental Export",
+            "GET",
+            "admin/reports/export/incremental",
+            200,
+            token=self.admin_token,
+            params={"limit": 10}
+        )
+        return success and "next_watermark" in page and "safe_until" in page
+
+    def test_job_queue_endpoints(self):
+        """Test the durable job queue admin endpoints"""
+        endpoints = [
+            ("List Jobs", "admin/jobs"),
+            ("Job Summary", "admin/jobs/summary")
+        ]
+        results = [
+            self.run_test(name, "GET", endpoint, 200, token=self.admin_token)[0]
+            for name, endpoint in endpoints
+        ]
+        success, _ = self.run_test(
+            "Job Queue (User Access - Should Fail)",
+            "GET",
+            "admin/jobs",
+            403,
+            token=self.user_token
+        )
+        return all(results) and success
+
+    def test_audit_log_endpoints(self):
+        """Test the audit log admin endpoints"""
+        endpoints = [
+            ("List Audit Logs", "admin/audit-logs"),
+            ("Audit Log Writer Status", "admin/audit-logs/writer")
+        ]
+        results = [
+            self.run_test(name, "GET", endpoint, 200, token=self.admin_token)[0]
+            for name, endpoint in endpoints
+        ]
+        return all(results)
+
+    def test_surge_mode_status(self):
+        """Test reading the surge mode status"""
+        success, response = self.run_test(
+            "Get Surge Mode",
+            "GET",
+            "admin/surge-mode",
+            200,
+            token=self.admin_token
+        )
+        return success and "buffered" in response
+
     # Authorization Tests
     def test_dynamic_fields_user_access(self):
         """Test that regular users cannot access dynamic fields endpoints"""
@@ -774,6 +1015,19 @@ def main():
         ("Export Reports (JSON)", tester.test_export_reports_json),
         ("Export Reports (With Filters)", tester.test_export_reports_with_filters),
         
+        # Background jobs, revisions, idempotency and template versions
+        ("Invalid Validation Pattern", tester.test_invalid_validation_pattern),
+        ("Idempotent Report Save", tester.test_idempotent_report_save),
+        ("Patch Report Draft", tester.test_patch_report_draft),
+        ("Report Revisions", tester.test_report_revisions),
+        ("Template Versions", tester.test_template_versions),
+        ("Bulk Action Job Requires Filter", tester.test_bulk_action_job_requires_filter),
+        ("Export Job", tester.test_export_job),
+        ("Incremental Export", tester.test_incremental_export),
+        ("Job Queue Endpoints", tester.test_job_queue_endpoints),
+        ("Audit Log Endpoints", tester.test_audit_log_endpoints),
+        ("Surge Mode Status", tester.test_surge_mode_status),
+        
         # Authorization Tests
         ("Dynamic Fields (User Access - Should Fail)", tester.test_dynamic_fields_user_access),
         ("Analytics (User Access - Should Fail)", tester.test_analytics_user_access),
@@ -0,0 +1,31 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py reads these at import time; the Motor client connects lazily, so unit
+# tests of pure helpers never need a running MongoDB
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """An in-memory Motor database swapped in for ``server.db``, with the module
+    level caches emptied so nothing leaks between tests"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+
+    database = AsyncMongoMockClient()[os.environ["DB_NAME"]]
+    monkeypatch.setattr(server, "db", database)
+    for value in vars(server).values():
+        if isinstance(value, server.LRUCache):
+            value.clear()
+    monkeypatch.setattr(server, "dynamic_field_resolver", server.DynamicFieldResolver(server.TEMPLATE_CACHE_SECONDS))
+    monkeypatch.setattr(server, "template_cache", server.TemplateCache(server.TEMPLATE_CACHE_SECONDS))
+    return database
@@ -0,0 +1,159 @@
+import asyncio
+import itertools
+
+import pytest
+from fastapi import HTTPException
+
+from server import User, current_report_period, get_choice_distribution, get_field_completion, invalidate_submission_caches
+
+ADMIN = User(id="a1", username="admin", email="admin@example.com", role="ADMIN")
+
+TEMPLATE = {
+    "id": "t1",
+    "name": "Monthly",
+    "description": "Monthly progress",
+    "created_by": "a1",
+    "active": True,
+    "fields": [
+        {"name": "status", "label": "Status", "field_type": "dropdown", "options": ["On Track", "Delayed"], "order": 1},
+        {"name": "tags", "label": "Tags", "field_type": "multiselect", "options": ["a", "b"], "order": 2},
+        {"name": "summary", "label": "Summary", "field_type": "text", "order": 3},
+    ],
+}
+
+
+@pytest.fixture
+def submissions(mongo):
+    asyncio.run(mongo.report_templates.insert_one(dict(TEMPLATE)))
+    asyncio.run(mongo.locations.insert_many([{"id": "north", "name": "North"}, {"id": "south", "name": "South"}]))
+
+    ids = itertools.count()
+
+    def insert(*reports):
+        asyncio.run(mongo.report_submissions.insert_many([
+            {"id": f"r{index}", "template_id": "t1", "user_id": f"u{index}", "status": "submitted", **report}
+            for index, report in zip(ids, reports)
+        ]))
+    return insert
+
+
+def distribution(report_period=None, location_id=None, status=None):
+    return asyncio.run(get_choice_distribution(
+        "t1", current_user=ADMIN, report_period=report_period, location_id=location_id, report_status=status
+    ))
+
+
+def test_choice_counts_per_field_period_and_location(submissions):
+    submissions(
+        {"report_period": "2024-01", "location_id": "north", "data": {"status": "On Track", "tags": ["a", "b"]}},
+        {"report_period": "2024-01", "location_id": "north", "data": {"status": "Delayed", "tags": ["a"]}},
+        {"report_period": "2024-02", "location_id": "south", "data": {"status": "Cancelled", "tags": []}},
+        {"report_period": "2024-02", "location_id": "south", "data": {"summary": "no choices"}},
+    )
+
+    status, tags = distribution()["fields"]
+
+    assert [status["name"], tags["name"]] == ["status", "tags"]
+    assert status["totals"] == {"On Track": 1, "Delayed": 1}
+    assert status["other"] == 1
+    assert tags["totals"] == {"a": 2, "b": 1}
+    assert [(bucket["report_period"], bucket["location_name"], bucket["counts"], bucket["other"]) for bucket in status["breakdown"]] == [
+        ("2024-01", "North", {"On Track": 1, "Delayed": 1}, 0),
+        ("2024-02", "South", {"On Track": 0, "Delayed": 0}, 1),
+    ]
+
+
+def test_filters_narrow_the_counted_reports(submissions):
+    submissions(
+        {"report_period": "2024-01", "location_id": "north", "data": {"status": "On Track"}},
+        {"report_period": "2024-01", "location_id": "south", "data": {"status": "Delayed"}, "status": "draft"},
+    )
+
+    assert distribution(location_id="south")["fields"][0]["totals"] == {"On Track": 0, "Delayed": 1}
+    assert distribution(status="submitted")["fields"][0]["totals"] == {"On Track": 1, "Delayed": 0}
+
+
+def test_cached_result_is_reused_until_a_submission_changes(submissions):
+    submissions({"report_period": "2024-01", "location_id": "north", "data": {"status": "On Track"}})
+    first = distribution(report_period="2024-01")
+
+    submissions({"report_period": "2024-01", "location_id": "north", "data": {"status": "Delayed"}})
+    assert distribution(report_period="2024-01") is first
+
+    invalidate_submission_caches("t1", "2024-01")
+    assert distribution(report_period="2024-01")["fields"][0]["totals"] == {"On Track": 1, "Delayed": 1}
+
+
+def test_unknown_template_is_not_found(mongo):
+    with pytest.raises(HTTPException) as error:
+        distribution()
+    assert error.value.status_code == 404
+
+
+def completion(report_period=None, status=None):
+    return asyncio.run(get_field_completion("t1", current_user=ADMIN, report_period=report_period, report_status=status))
+
+
+def fill_rates(period_row):
+    return {field["name"]: (field["filled"], field["fill_rate"]) for field in period_row["fields"]}
+
+
+@pytest.fixture
+def aggregations(mongo, monkeypatch):
+    calls = []
+    aggregate = type(mongo.report_submissions).aggregate
+
+    def counting_aggregate(collection, pipeline, *args, **kwargs):
+        calls.append(pipeline[0]["$match"])
+        return aggregate(collection, pipeline, *args, **kwargs)
+
+    monkeypatch.setattr(type(mongo.report_submissions), "aggregate", counting_aggregate)
+    return calls
+
+
+def test_completion_rate_per_field_and_period(submissions):
+    submissions(
+        {"report_period": "2024-01", "data": {"status": "On Track", "tags": ["a"], "summary": "Done"}},
+        {"report_period": "2024-01", "data": {"status": "Delayed", "tags": [], "summary": ""}},
+        {"report_period": "2024-01", "data": {"status": None, "extra": "ignored"}},
+        {"report_period": "2023-12", "data": {"summary": "Done"}},
+    )
+
+    periods = completion()["periods"]
+
+    assert [(row["report_period"], row["submissions"], row["closed"]) for row in periods] == [
+        ("2024-01", 3, True), ("2023-12", 1, True)
+    ]
+    assert fill_rates(periods[0]) == {"status": (2, 66.7), "tags": (1, 33.3), "summary": (1, 33.3)}
+    assert fill_rates(periods[1]) == {"status": (0, 0.0), "tags": (0, 0.0), "summary": (1, 100.0)}
+
+
+def test_closed_periods_are_memoized_until_they_change(submissions, aggregations):
+    open_period = current_report_period()
+    submissions(
+        {"report_period": "2024-01", "data": {"summary": "Done"}},
+        {"report_period": open_period, "data": {"summary": "Done"}},
+    )
+
+    completion()
+    completion()
+    # The second request only aggregates the open period
+    assert aggregations[1]["report_period"] == {"$nin": ["2024-01"]}
+
+    submissions({"report_period": "2024-01", "data": {}})
+    invalidate_submission_caches("t1", "2024-01")
+    rows = {row["report_period"]: row for row in completion()["periods"]}
+
+    assert "report_period" not in aggregations[2]
+    assert fill_rates(rows["2024-01"])["summary"] == (1, 50.0)
+    assert rows[open_period]["closed"] is False
+
+
+def test_memoized_period_is_served_without_aggregating(submissions, aggregations):
+    submissions({"report_period": "2024-01", "data": {"summary": "Done"}})
+
+    first = completion("2024-01")
+    second = completion("2024-01")
+
+    assert len(aggregations) == 1
+    assert second["periods"] == first["periods"]
@@ -0,0 +1,119 @@
+import asyncio
+
+from server import AuditLogWriter
+
+
+def writer(batch_size=3, flush_interval=60, max_buffered=10):
+    return AuditLogWriter(batch_size=batch_size, flush_interval=flush_interval, max_buffered=max_buffered)
+
+
+def record(audit_log, count, start=0):
+    for index in range(start, start + count):
+        audit_log.record("report.approve", "a1", "report", f"r{index}")
+
+
+def logged_ids(mongo):
+    return sorted(asyncio.run(mongo.audit_logs.distinct("target_id")), key=lambda target_id: int(target_id[1:]))
+
+
+def test_full_batch_is_written_without_waiting_for_the_interval(mongo):
+    audit_log = writer()
+
+    async def main():
+        audit_log.start()
+        record(audit_log, 4)
+        await asyncio.sleep(0.05)
+        written, buffered = audit_log.written, audit_log.buffered
+        await audit_log.stop()
+        return written, buffered
+
+    assert asyncio.run(main()) == (4, 0)
+    assert logged_ids(mongo) == ["r0", "r1", "r2", "r3"]
+
+
+def test_partial_batch_is_written_when_the_interval_passes(mongo):
+    audit_log = writer(flush_interval=0.01)
+
+    async def main():
+        audit_log.start()
+        record(audit_log, 2)
+        await asyncio.sleep(0.05)
+        written = audit_log.written
+        await audit_log.stop()
+        return written
+
+    assert asyncio.run(main()) == 2
+
+
+def test_stop_flushes_buffered_events(mongo):
+    audit_log = writer()
+
+    async def main():
+        audit_log.start()
+        record(audit_log, 2)
+        await audit_log.stop()
+
+    asyncio.run(main())
+
+    assert audit_log.buffered == 0
+    assert logged_ids(mongo) == ["r0", "r1"]
+
+
+def test_cancelled_write_is_kept_for_the_final_flush(mongo, monkeypatch):
+    audit_log = writer()
+    collection = type(mongo.audit_logs)
+    insert_many = collection.insert_many
+    started = []
+
+    async def hang_once(self, documents, ordered=True):
+        if not started:
+            started.append(1)
+            await asyncio.sleep(60)
+        return await insert_many(self, documents, ordered=ordered)
+
+    monkeypatch.setattr(collection, "insert_many", hang_once)
+
+    async def main():
+        flush = asyncio.ensure_future(audit_log.flush())
+        await asyncio.sleep(0.01)
+        record(audit_log, 2, start=2)
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+        buffered = audit_log.buffered
+        await audit_log.stop()
+        return buffered
+
+    record(audit_log, 2)
+    assert asyncio.run(main()) == 4
+    assert logged_ids(mongo) == ["r0", "r1", "r2", "r3"]
+
+
+def test_failed_write_is_retried_on_the_next_flush(mongo, monkeypatch):
+    audit_log = writer()
+    collection = type(mongo.audit_logs)
+    insert_many = collection.insert_many
+    attempts = []
+
+    async def fail_once(self, documents, ordered=True):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("primary stepped down")
+        return await insert_many(self, documents, ordered=ordered)
+
+    monkeypatch.setattr(collection, "insert_many", fail_once)
+    record(audit_log, 2)
+
+    asyncio.run(audit_log.flush())
+    assert (audit_log.buffered, audit_log.written) == (2, 0)
+    asyncio.run(audit_log.flush())
+    assert (audit_log.buffered, audit_log.written) == (0, 2)
+
+
+def test_events_beyond_the_buffer_are_dropped(mongo):
+    audit_log = writer(max_buffered=5)
+
+    record(audit_log, 8)
+
+    assert (audit_log.buffered, audit_log.dropped) == (5, 3)
+    asyncio.run(audit_log.stop())
+    assert logged_ids(mongo) == ["r0", "r1", "r2", "r3", "r4"]
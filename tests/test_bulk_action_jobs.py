@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import AuditLogWriter, BulkFilterActionRequest, User, create_bulk_action_job, run_bulk_action_job
+
+ADMIN = User(id="a1", username="admin", email="admin@example.com", role="ADMIN")
+
+
+@pytest.fixture
+def reports(mongo, monkeypatch):
+    monkeypatch.setattr(server, "BULK_ACTION_CHUNK_SIZE", 2)
+    monkeypatch.setattr(server, "audit_log", AuditLogWriter(batch_size=100, flush_interval=60, max_buffered=100))
+    asyncio.run(mongo.report_submissions.insert_many([
+        {"id": f"r{index}", "template_id": "t1", "location_id": "north" if index < 6 else "south", "status": "submitted"}
+        for index in range(1, 8)
+    ]))
+    return mongo
+
+
+def create(**request):
+    return asyncio.run(create_bulk_action_job(BulkFilterActionRequest(**request), current_user=ADMIN))
+
+
+def stored_job(mongo, job_id):
+    return asyncio.run(mongo.bulk_action_jobs.find_one({"id": job_id}, {"_id": 0}))
+
+
+def approved_ids(mongo):
+    return sorted(asyncio.run(mongo.report_submissions.distinct("id", {"status": "approved"})))
+
+
+def test_job_is_queued_for_the_worker(reports):
+    job = create(action="approve", location_id="north")
+
+    assert stored_job(reports, job.id)["filters"]["location_id"] == "north"
+    queued = asyncio.run(reports.jobs.find_one({}, {"_id": 0}))
+    assert (queued["type"], queued["payload"]) == ("bulk_action", {"bulk_action_job_id": job.id})
+
+
+@pytest.mark.parametrize("request_fields", [
+    {"action": "approve"},
+    {"action": "approve", "date_from": "last month"},
+    {"action": "archive", "location_id": "north"},
+])
+def test_bad_requests_are_rejected(reports, request_fields):
+    with pytest.raises(HTTPException) as error:
+        create(**request_fields)
+
+    assert error.value.status_code == 400
+    assert asyncio.run(reports.bulk_action_jobs.count_documents({})) == 0
+
+
+def test_confirm_all_allows_an_unfiltered_job(reports):
+    job = create(action="approve", confirm_all=True)
+
+    asyncio.run(run_bulk_action_job(job.id))
+
+    assert len(approved_ids(reports)) == 7
+
+
+def test_job_processes_matching_reports_in_checkpointed_chunks(reports):
+    job = create(action="approve", location_id="north")
+
+    asyncio.run(run_bulk_action_job(job.id))
+
+    stored = stored_job(reports, job.id)
+    assert stored["status"] == "completed"
+    assert (stored["total_estimate"], stored["processed"], stored["matched"]) == (5, 5, 5)
+    assert stored["checkpoint"] == "r5"
+    assert approved_ids(reports) == ["r1", "r2", "r3", "r4", "r5"]
+
+
+def test_interrupted_job_resumes_after_its_checkpoint(reports, monkeypatch):
+    job = create(action="approve", location_id="north")
+    apply_chunk = server.apply_report_action_chunk
+    chunks = []
+
+    async def fail_the_second_chunk(action, report_ids, actor_id, bulk_action_job_id=None):
+        chunks.append(report_ids)
+        if len(chunks) == 2:
+            raise RuntimeError("connection reset")
+        return await apply_chunk(action, report_ids, actor_id, bulk_action_job_id)
+
+    monkeypatch.setattr(server, "apply_report_action_chunk", fail_the_second_chunk)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_bulk_action_job(job.id, final_attempt=False))
+    interrupted = stored_job(reports, job.id)
+    assert (interrupted["status"], interrupted["checkpoint"], interrupted["processed"]) == ("running", "r2", 2)
+    assert interrupted["error"] == "connection reset"
+
+    asyncio.run(run_bulk_action_job(job.id))
+
+    assert chunks == [["r1", "r2"], ["r3", "r4"], ["r3", "r4"], ["r5"]]
+    resumed = stored_job(reports, job.id)
+    assert (resumed["status"], resumed["processed"], resumed["total_estimate"]) == ("completed", 5, 5)
+    assert approved_ids(reports) == ["r1", "r2", "r3", "r4", "r5"]
+
+
+def test_failed_final_attempt_marks_the_job_failed(reports, monkeypatch):
+    job = create(action="approve", location_id="north")
+
+    async def fail(*args):
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(server, "apply_report_action_chunk", fail)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_bulk_action_job(job.id))
+    assert stored_job(reports, job.id)["status"] == "failed"
+    # A finished job is not picked up again
+    asyncio.run(run_bulk_action_job(job.id))
+    assert approved_ids(reports) == []
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import AuditLogWriter, BulkActionRequest, User, apply_bulk_report_actions
+
+ADMIN = User(id="a1", username="admin", email="admin@example.com", role="ADMIN")
+
+
+@pytest.fixture
+def reports(mongo, monkeypatch):
+    monkeypatch.setattr(server, "BULK_ACTION_CHUNK_SIZE", 2)
+    monkeypatch.setattr(server, "audit_log", AuditLogWriter(batch_size=100, flush_interval=60, max_buffered=100))
+    asyncio.run(mongo.report_submissions.insert_many([
+        {"id": f"r{index}", "user_id": "u1", "template_id": "t1", "report_period": f"2024-0{index}", "status": "submitted"}
+        for index in range(1, 6)
+    ]))
+    asyncio.run(mongo.report_revisions.insert_many([{"report_id": "r1", "revision": 1}, {"report_id": "r9", "revision": 1}]))
+    return mongo
+
+
+def act(action, report_ids):
+    return asyncio.run(apply_bulk_report_actions(BulkActionRequest(action=action, report_ids=report_ids), ADMIN))
+
+
+def audited_ids():
+    return [event["target_id"] for event in server.audit_log._buffer]
+
+
+def test_action_runs_in_chunks_and_reports_missing_ids(reports):
+    result = act("approve", ["r1", "r2", "missing", "r3", "r1", "r4", "gone"])
+
+    assert [chunk["requested"] for chunk in result["chunks"]] == [2, 2, 2]
+    assert [chunk["missing_ids"] for chunk in result["chunks"]] == [[], ["missing"], ["gone"]]
+    assert (result["requested"], result["matched"], result["modified"]) == (6, 4, 4)
+    assert result["missing_ids"] == ["missing", "gone"]
+    assert audited_ids() == ["r1", "r2", "r3", "r4"]
+
+    statuses = {
+        report["id"]: (report["status"], report.get("reviewed_by"))
+        for report in asyncio.run(reports.report_submissions.find({}).to_list(None))
+    }
+    assert statuses["r4"] == ("approved", ADMIN.id)
+    assert statuses["r5"] == ("submitted", None)
+
+
+def test_delete_leaves_tombstones_and_drops_revisions(reports):
+    result = act("delete", ["r1", "r2", "missing"])
+
+    assert (result["matched"], result["missing_ids"]) == (2, ["missing"])
+    assert asyncio.run(reports.report_submissions.count_documents({})) == 3
+    tombstones = asyncio.run(reports.report_tombstones.find({}, {"_id": 0}).to_list(None))
+    assert sorted(tombstone["id"] for tombstone in tombstones) == ["r1", "r2"]
+    assert tombstones[0]["deleted_by"] == ADMIN.id
+    assert asyncio.run(reports.report_revisions.distinct("report_id")) == ["r9"]
+
+
+@pytest.mark.parametrize("action, report_ids", [("archive", ["r1"]), ("approve", [])])
+def test_bad_requests_are_rejected(reports, action, report_ids):
+    with pytest.raises(HTTPException) as error:
+        act(action, report_ids)
+
+    assert error.value.status_code == 400
@@ -0,0 +1,26 @@
+import pytest
+
+from server import parse_byte_range
+
+
+@pytest.mark.parametrize("header", [None, "", "items=0-10", "bytes=0-1,5-6"])
+def test_whole_file_when_no_single_byte_range(header):
+    assert parse_byte_range(header, 100) is None
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=90-500", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    ("bytes=99-99", (99, 99)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert parse_byte_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=50-10", "bytes=-0", "bytes=a-b", "bytes=-"])
+def test_unsatisfiable_or_malformed_ranges(header):
+    with pytest.raises(ValueError):
+        parse_byte_range(header, 100)
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from server import DynamicFieldResolver, ReportTemplateUpdate, User, on_dynamic_field_changed, update_report_template
+
+ADMIN = User(id="a1", username="admin", email="admin@example.com", role="ADMIN")
+
+
+def dynamic_field(field_id, label, **extra):
+    return {"id": field_id, "label": label, "field_type": "text", "section": "Basics", **extra}
+
+
+def template(template_id="t1", **extra):
+    return {
+        "id": template_id,
+        "name": f"Template {template_id}",
+        "description": "Monthly progress",
+        "created_by": "a1",
+        "active": True,
+        "version": 1,
+        "fields": [{"id": "f1", "name": "summary", "label": "Summary", "field_type": "text", "order": 1}],
+        "dynamic_field_ids": ["d1", "d2"],
+        "updated_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        **extra,
+    }
+
+
+@pytest.fixture
+def fields(mongo):
+    asyncio.run(mongo.dynamic_fields.insert_many([
+        dynamic_field("d1", "Team Name", validation={"max_length": 20}),
+        dynamic_field("d2", "Hours Worked", field_type="number"),
+        dynamic_field("d3", "Summary"),
+        dynamic_field("gone", "Old Field", deleted=True),
+    ]))
+    return mongo.dynamic_fields
+
+
+def resolve(resolver, stored):
+    return asyncio.run(resolver.resolve(stored))
+
+
+def test_resolver_appends_referenced_fields_after_template_fields(fields):
+    resolved = resolve(DynamicFieldResolver(60), template())
+
+    assert [(field["name"], field["order"]) for field in resolved["fields"]] == [
+        ("summary", 1), ("team_name", 2), ("hours_worked", 3)
+    ]
+    assert resolved["fields"][1]["validation"] == {"max_length": 20}
+    assert resolved["fields"][2]["field_type"] == "number"
+
+
+def test_resolver_applies_names_and_overrides_and_skips_unusable_fields(fields):
+    stored = template(
+        dynamic_field_ids=["d1", "d3", "gone", "missing", "d2"],
+        dynamic_field_names={"d1": "team"},
+        dynamic_field_overrides={"d2": {"required": True, "order": 9}},
+    )
+
+    resolved = resolve(DynamicFieldResolver(60), stored)
+
+    # d3 collides with the template's own "summary" field; deleted and missing fields drop out
+    assert [field["name"] for field in resolved["fields"]] == ["summary", "team", "hours_worked"]
+    assert resolved["fields"][2]["required"] is True
+    assert resolved["fields"][2]["order"] == 9
+
+
+def test_invalidating_a_field_returns_its_dependents_and_refetches_it(fields):
+    resolver = DynamicFieldResolver(60)
+    first = resolve(resolver, template("t1"))
+    resolve(resolver, template("t2", dynamic_field_ids=["d2"]))
+    resolve(resolver, template("t3", dynamic_field_ids=["d3"]))
+
+    asyncio.run(fields.update_one({"id": "d1"}, {"$set": {"label": "Squad Name"}}))
+    assert resolve(resolver, template("t1")) == first  # Still cached
+
+    assert resolver.invalidate_field("d1") == {"t1"}
+    assert resolver.invalidate_field("d2") == {"t1", "t2"}
+    assert resolver.invalidate_field("d2") == set()
+
+    second = resolve(resolver, template("t1"))
+    assert [field["label"] for field in second["fields"]][1] == "Squad Name"
+    assert second["fields_stamp"] != first["fields_stamp"]
+
+
+def test_changed_field_bumps_only_active_templates(fields, mongo):
+    asyncio.run(mongo.report_templates.insert_many([
+        template("active"),
+        template("inactive", active=False),
+        template("unrelated", dynamic_field_ids=["d3"]),
+    ]))
+
+    asyncio.run(on_dynamic_field_changed("d1", ADMIN.id))
+
+    versions = {
+        stored["id"]: stored["version"]
+        for stored in asyncio.run(mongo.report_templates.find({}, {"_id": 0}).to_list(None))
+    }
+    assert versions == {"active": 2, "inactive": 1, "unrelated": 1}
+    snapshots = asyncio.run(mongo.report_template_versions.find({}, {"_id": 0}).to_list(None))
+    assert [(snapshot["template_id"], snapshot["version"]) for snapshot in snapshots] == [("active", 2)]
+
+
+def test_reactivated_template_gets_a_version_with_current_fields(fields, mongo):
+    asyncio.run(mongo.report_templates.insert_one(template("inactive", active=False)))
+    asyncio.run(fields.update_one({"id": "d1"}, {"$set": {"label": "Squad Name"}}))
+    asyncio.run(on_dynamic_field_changed("d1", ADMIN.id))
+
+    reactivated = asyncio.run(update_report_template("inactive", ReportTemplateUpdate(active=True), current_user=ADMIN))
+
+    assert reactivated.version == 2
+    snapshot = asyncio.run(mongo.report_template_versions.find_one({"template_id": "inactive", "version": 2}))
+    assert [field["label"] for field in snapshot["fields"]] == ["Summary", "Squad Name", "Hours Worked"]
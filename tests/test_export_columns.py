@@ -0,0 +1,100 @@
+import asyncio
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+import pyarrow as pa
+import pytest
+
+from server import handle_report_data_keys_backfill, record_report_data_keys, stream_reports_columnar, stream_reports_csv
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def reports(mongo):
+    asyncio.run(mongo.report_data_keys.create_index([("template_id", 1), ("key", 1)], unique=True))
+    asyncio.run(mongo.report_templates.insert_one({
+        "id": "t1", "name": "Monthly", "description": "Monthly progress", "created_by": "admin", "active": True,
+        "fields": [
+            {"name": "summary", "label": "Summary", "field_type": "text", "order": 1},
+            {"name": "hours", "label": "Hours", "field_type": "number", "order": 2},
+        ]
+    }))
+
+    def insert(*data):
+        documents = [
+            {"id": f"r{index}", "user_id": "u1", "template_id": "t1", "report_period": f"2024-{index + 1:02d}",
+             "status": "submitted", "data": values, "created_at": START + timedelta(days=index),
+             "updated_at": START + timedelta(days=index)}
+            for index, values in enumerate(data)
+        ]
+        asyncio.run(mongo.report_submissions.insert_many(documents))
+        return documents
+    return insert
+
+
+def export_csv(query):
+    async def collect():
+        return "".join([chunk async for chunk in stream_reports_csv(query)])
+    return list(csv.reader(io.StringIO(asyncio.run(collect()))))
+
+
+def recorded_keys(mongo):
+    return sorted(
+        (pair["template_id"], pair["key"])
+        for pair in asyncio.run(mongo.report_data_keys.find({}, {"_id": 0}).to_list(None))
+    )
+
+
+def test_recording_keys_writes_only_unseen_pairs(mongo, monkeypatch):
+    writes = []
+    bulk_write = type(mongo.report_data_keys).bulk_write
+
+    async def counting_bulk_write(collection, operations, **kwargs):
+        writes.append(len(operations))
+        return await bulk_write(collection, operations, **kwargs)
+
+    monkeypatch.setattr(type(mongo.report_data_keys), "bulk_write", counting_bulk_write)
+
+    async def main():
+        await record_report_data_keys([{"template_id": "t1", "data": {"a": 1, "b": 2}}])
+        await record_report_data_keys([{"template_id": "t1", "data": {"a": 3}}, {"template_id": "t2", "data": {}}])
+        await record_report_data_keys([{"template_id": "t1", "data": {"a": 4, "c": 5}}])
+
+    asyncio.run(main())
+    assert writes == [2, 1]
+    assert recorded_keys(mongo) == [("t1", "a"), ("t1", "b"), ("t1", "c")]
+
+
+def test_backfill_records_keys_of_existing_reports(mongo, reports):
+    reports({"summary": "x"}, {"legacy": "y", "hours": 3})
+
+    asyncio.run(handle_report_data_keys_backfill({}, {}))
+
+    assert recorded_keys(mongo) == [("t1", "hours"), ("t1", "legacy"), ("t1", "summary")]
+
+
+def test_csv_export_appends_keys_outside_the_template(mongo, reports):
+    documents = reports({"summary": "x", "hours": 1}, {"legacy": "kept"})
+    asyncio.run(record_report_data_keys(documents))
+
+    rows = export_csv({"template_id": "t1"})
+
+    header = rows[0]
+    assert header[-3:] == ["data_summary", "data_hours", "data_legacy"]
+    assert rows[2][-1] == "kept"
+
+
+def test_columnar_export_types_keys_outside_the_template_as_text(mongo, reports):
+    documents = reports({"summary": "x", "hours": "2"}, {"legacy": 7})
+    asyncio.run(record_report_data_keys(documents))
+
+    async def collect():
+        return b"".join([chunk async for chunk in stream_reports_columnar({"template_id": "t1"}, "arrow")])
+
+    table = pa.ipc.open_stream(asyncio.run(collect())).read_all()
+    assert table.schema.field("data_hours").type == pa.float64()
+    assert table.schema.field("data_legacy").type == pa.string()
+    assert table.column("data_legacy").to_pylist() == [None, "7"]
+    assert table.column("data_hours").to_pylist() == [2.0, None]
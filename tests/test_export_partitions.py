@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from server import iter_partitioned_export_batches, plan_export_partitions
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def plan(mongo):
+    def run(created_at, partitions, query=None):
+        if created_at:
+            asyncio.run(mongo.report_submissions.insert_many([
+                {"id": f"r{index}", "template_id": "t", "status": "submitted", "created_at": value}
+                for index, value in enumerate(created_at)
+            ]))
+        return asyncio.run(plan_export_partitions(query or {"status": "submitted"}, partitions))
+    return run
+
+
+def partition_sizes(mongo, partitions):
+    return [asyncio.run(mongo.report_submissions.count_documents(partition)) for partition in partitions]
+
+
+def test_single_query_when_nothing_to_split(plan, mongo):
+    assert plan([], 4) == [{"status": "submitted"}]
+    assert plan([START, START], 4) == [{"status": "submitted"}]
+
+
+def test_partitions_cover_every_report_exactly_once(plan, mongo):
+    created_at = [START + timedelta(hours=hours) for hours in range(0, 100, 7)] + [START + timedelta(hours=100)]
+    partitions = plan(created_at, 4)
+
+    assert len(partitions) == 4
+    assert sum(partition_sizes(mongo, partitions)) == len(created_at)
+
+
+def test_skewed_dates_split_into_equal_counts(plan, mongo):
+    # A quiet year followed by a month-end spike of submissions
+    quiet = [START + timedelta(days=30 * month) for month in range(12)]
+    spike = [START + timedelta(days=365, minutes=minute) for minute in range(88)]
+    partitions = plan(quiet + spike, 4)
+
+    assert partition_sizes(mongo, partitions) == [25, 25, 25, 25]
+
+
+def test_equal_dates_stay_in_one_partition(plan, mongo):
+    created_at = [START] * 6 + [START + timedelta(days=1)] * 2
+    partitions = plan(created_at, 4)
+
+    assert sum(partition_sizes(mongo, partitions)) == 8
+    assert max(partition_sizes(mongo, partitions)) == 6
+
+
+def test_partitions_keep_the_original_filter(plan):
+    partitions = plan([START, START + timedelta(days=1)], 2, {"template_id": "t"})
+
+    assert all(partition["$and"][0] == {"template_id": "t"} for partition in partitions)
+
+
+def fake_partitions(monkeypatch, batches_per_partition, delays):
+    """Stand-in partition readers: partition i yields its batches every delays[i] seconds"""
+    queries = [{"partition": index} for index in range(len(delays))]
+    running = {"now": 0, "max": 0}
+
+    async def plan_partitions(query, partitions):
+        return queries
+
+    async def read_partition(query, batch_size):
+        index = query["partition"]
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        try:
+            for batch in range(batches_per_partition):
+                await asyncio.sleep(delays[index])
+                yield [f"p{index}b{batch}"], {}
+        finally:
+            running["now"] -= 1
+
+    monkeypatch.setattr(server, "plan_export_partitions", plan_partitions)
+    monkeypatch.setattr(server, "iter_export_batches", read_partition)
+    return running
+
+
+def collect(partitions):
+    async def main():
+        return [reports[0] async for reports, _ in iter_partitioned_export_batches({}, partitions)]
+    return asyncio.run(main())
+
+
+def test_partitions_are_read_concurrently(monkeypatch):
+    running = fake_partitions(monkeypatch, 3, [0.01] * 4)
+
+    batches = collect(4)
+
+    assert running["max"] == 4
+    assert sorted(batches) == sorted(f"p{index}b{batch}" for index in range(4) for batch in range(3))
+
+
+def test_fast_partitions_are_not_held_behind_a_slow_one(monkeypatch):
+    fake_partitions(monkeypatch, 3, [0.05, 0.001])
+
+    batches = collect(2)
+
+    assert batches[:3] == ["p1b0", "p1b1", "p1b2"]
+    assert batches[3:] == ["p0b0", "p0b1", "p0b2"]
+
+
+def test_partition_errors_reach_the_reader(monkeypatch):
+    async def plan_partitions(query, partitions):
+        return [{"partition": 0}, {"partition": 1}]
+
+    async def read_partition(query, batch_size):
+        if query["partition"] == 1:
+            raise RuntimeError("cursor lost")
+        yield ["p0"], {}
+
+    monkeypatch.setattr(server, "plan_export_partitions", plan_partitions)
+    monkeypatch.setattr(server, "iter_export_batches", read_partition)
+
+    with pytest.raises(RuntimeError):
+        collect(2)
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import User, run_idempotent
+
+USER = User(id="u1", username="user", email="user@example.com")
+
+
+@pytest.fixture
+def keys(mongo):
+    asyncio.run(mongo.idempotency_keys.create_index([("key", 1)], unique=True))
+    return mongo.idempotency_keys
+
+
+def counting(result=None, delay=0.0, error=None):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result if result is not None else {"id": f"r{len(calls)}"}
+
+    fn.calls = calls
+    return fn
+
+
+def test_retry_replays_the_stored_response(keys):
+    fn = counting()
+
+    async def main():
+        first = await run_idempotent("k1", USER, "POST /reports", {"a": 1}, fn)
+        # Forget the in-process copy so the replay comes from the stored record
+        server._idempotency_responses.clear()
+        second = await run_idempotent("k1", USER, "POST /reports", {"a": 1}, fn)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert len(fn.calls) == 1
+    assert first.body == second.body
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.headers["Idempotent-Replayed"] == "true"
+    stored = asyncio.run(keys.find_one({"key": "u1:POST /reports:k1"}))
+    assert stored["status"] == "completed"
+
+
+def test_concurrent_duplicates_run_once(keys):
+    fn = counting(delay=0.02)
+
+    async def main():
+        return await asyncio.gather(*(run_idempotent("k1", USER, "POST /reports", {"a": 1}, fn) for _ in range(5)))
+
+    responses = asyncio.run(main())
+    assert len(fn.calls) == 1
+    assert len({response.body for response in responses}) == 1
+    assert sum("Idempotent-Replayed" not in response.headers for response in responses) == 1
+
+
+def test_duplicate_from_another_process_waits_for_the_holder(keys, monkeypatch):
+    monkeypatch.setattr(server, "IDEMPOTENCY_WAIT_SECONDS", 5)
+    fn = counting()
+    scope = "u1:POST /reports:k1"
+    fingerprint = server.request_fingerprint({"a": 1})
+
+    async def main():
+        await keys.insert_one({
+            "key": scope,
+            "status": "in_progress",
+            "fingerprint": fingerprint,
+            "locked_until": datetime.now(timezone.utc) + timedelta(seconds=60)
+        })
+
+        async def finish_elsewhere():
+            await asyncio.sleep(0.05)
+            await keys.update_one({"key": scope}, {"$set": {"status": "completed", "status_code": 200, "body": {"id": "elsewhere"}}})
+
+        response, _ = await asyncio.gather(run_idempotent("k1", USER, "POST /reports", {"a": 1}, fn), finish_elsewhere())
+        return response
+
+    response = asyncio.run(main())
+    assert fn.calls == []
+    assert response.body == b'{"id":"elsewhere"}'
+    assert response.headers["Idempotent-Replayed"] == "true"
+
+
+def test_same_key_with_a_different_body_is_rejected(keys):
+    fn = counting()
+
+    async def main():
+        await run_idempotent("k1", USER, "POST /reports", {"a": 1}, fn)
+        await run_idempotent("k1", USER, "POST /reports", {"a": 2}, fn)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main())
+    assert error.value.status_code == 422
+    assert len(fn.calls) == 1
+
+
+def test_client_errors_are_stored_and_server_errors_release_the_key(keys):
+    rejected = counting(error=HTTPException(status_code=400, detail="bad"))
+    failed = counting(error=HTTPException(status_code=503, detail="down"))
+
+    async def main():
+        response = await run_idempotent("k1", USER, "POST /reports", {}, rejected)
+        with pytest.raises(HTTPException):
+            await run_idempotent("k2", USER, "POST /reports", {}, failed)
+        return response
+
+    response = asyncio.run(main())
+    assert response.status_code == 400
+    assert asyncio.run(keys.find_one({"key": "u1:POST /reports:k2"})) is None
+
+
+def test_without_a_key_the_call_simply_runs(keys):
+    fn = counting()
+
+    async def main():
+        return [await run_idempotent(None, USER, "POST /reports", {}, fn) for _ in range(2)]
+
+    assert asyncio.run(main()) == [{"id": "r1"}, {"id": "r2"}]
@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from server import enqueue_periodic_job
+
+
+@pytest.fixture
+def jobs(mongo):
+    asyncio.run(mongo.jobs.create_index([("id", 1)], unique=True))
+    return mongo.jobs
+
+
+def test_periodic_job_is_enqueued_once_per_interval(jobs, monkeypatch):
+    now = [10_000.0]
+    monkeypatch.setattr("server.time.time", lambda: now[0])
+
+    async def schedule():
+        # Every worker calls this at startup and then once per interval
+        return [await enqueue_periodic_job("revision_compaction", {}, 3600) for _ in range(3)]
+
+    assert asyncio.run(schedule()) == [True, False, False]
+    now[0] += 3600
+    assert asyncio.run(schedule()) == [True, False, False]
+
+    queued = asyncio.run(jobs.find({}, {"_id": 0}).to_list(None))
+    assert [job["type"] for job in queued] == ["revision_compaction"] * 2
+    assert all(job["status"] == "queued" for job in queued)
+
+
+@pytest.fixture
+def pool(jobs, monkeypatch):
+    calls = []
+    outcomes = {}
+
+    async def handler(payload, job):
+        calls.append((payload["name"], job["attempts"]))
+        outcome = outcomes.get(payload["name"])
+        if isinstance(outcome, Exception):
+            raise outcome
+
+    monkeypatch.setitem(server.JOB_HANDLERS, "test_job", {"handler": handler, "concurrency": 1, "on_retry": None})
+    monkeypatch.setattr(server, "JOB_RETRY_BASE_SECONDS", 0)
+    monkeypatch.setattr(server, "JOB_POLL_INTERVAL_SECONDS", 0.01)
+    worker_pool = server.JobWorkerPool(2)
+    monkeypatch.setattr(server, "job_pool", worker_pool)
+    worker_pool.calls = calls
+    worker_pool.outcomes = outcomes
+    return worker_pool
+
+
+def queued(name, **fields):
+    return {**server.QueuedJob(type="test_job", payload={"name": name}).dict(), "id": name, **fields}
+
+
+def claim_all(pool):
+    async def main():
+        claimed = []
+        while (job := await pool._claim(["test_job"])) is not None:
+            claimed.append(job)
+        return claimed
+    return asyncio.run(main())
+
+
+def test_higher_priority_is_claimed_first(pool, jobs):
+    now = datetime.now(timezone.utc)
+    asyncio.run(jobs.insert_many([
+        queued("low", priority=0, run_at=now - timedelta(minutes=3)),
+        queued("high", priority=5),
+        queued("middle-old", priority=1, run_at=now - timedelta(minutes=2)),
+        queued("middle-new", priority=1, run_at=now - timedelta(minutes=1)),
+        queued("not-due", priority=9, run_at=now + timedelta(minutes=1)),
+    ]))
+
+    assert [job["id"] for job in claim_all(pool)] == ["high", "middle-old", "middle-new", "low"]
+
+
+def test_expired_lease_is_reclaimed(pool, jobs):
+    now = datetime.now(timezone.utc)
+    asyncio.run(jobs.insert_many([
+        queued("crashed", status="running", attempts=1, worker_id="dead-worker", lease_expires_at=now - timedelta(seconds=1)),
+        queued("alive", status="running", attempts=1, worker_id="other-worker", lease_expires_at=now + timedelta(minutes=1)),
+    ]))
+
+    claimed = claim_all(pool)
+
+    assert [(job["id"], job["attempts"], job["worker_id"]) for job in claimed] == [("crashed", 2, pool.worker_id)]
+
+
+def test_reclaim_after_the_final_attempt_fails_the_job(pool, jobs):
+    asyncio.run(jobs.insert_one(queued(
+        "crashed", status="running", attempts=3, max_attempts=3, worker_id="dead-worker",
+        lease_expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)
+    )))
+
+    async def main():
+        pool._running["test_job"] = 1
+        await pool._run(await pool._claim(["test_job"]))
+
+    asyncio.run(main())
+    job = asyncio.run(jobs.find_one({"id": "crashed"}))
+    assert job["status"] == "failed"
+    assert job["last_error"] == "Lease expired on the final attempt"
+    assert pool.calls == []
+
+
+def run_until_finished(pool, jobs, job_id):
+    async def main():
+        pool.start()
+        try:
+            for _ in range(500):
+                job = await jobs.find_one({"id": job_id})
+                if job["status"] in ("succeeded", "failed"):
+                    return job
+                await asyncio.sleep(0.01)
+        finally:
+            await pool.stop()
+    return asyncio.run(main())
+
+
+def test_failing_job_is_retried_up_to_max_attempts(pool, jobs):
+    pool.outcomes["flaky"] = RuntimeError("boom")
+    asyncio.run(jobs.insert_one(queued("flaky", max_attempts=3)))
+
+    job = run_until_finished(pool, jobs, "flaky")
+
+    assert job["status"] == "failed"
+    assert job["attempts"] == 3
+    assert job["last_error"] == "boom"
+    assert pool.calls == [("flaky", 1), ("flaky", 2), ("flaky", 3)]
+
+
+def test_successful_job_runs_once(pool, jobs):
+    asyncio.run(jobs.insert_one(queued("ok")))
+
+    job = run_until_finished(pool, jobs, "ok")
+
+    assert job["status"] == "succeeded"
+    assert pool.calls == [("ok", 1)]
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from server import ReportBatchRequest, ReportSubmissionCreate, User, create_or_update_reports_batch
+
+USER = User(id="u1", username="user", email="user@example.com")
+
+TEMPLATE = {
+    "id": "t1",
+    "name": "Monthly",
+    "description": "Monthly progress",
+    "created_by": "admin",
+    "active": True,
+    "version": 1,
+    "fields": [{"name": "hours", "label": "Hours", "field_type": "number", "validation": {"min": 0, "max": 80}}],
+}
+
+
+@pytest.fixture
+def submissions(mongo):
+    asyncio.run(mongo.report_templates.insert_one(dict(TEMPLATE)))
+    asyncio.run(mongo.report_submissions.create_index(
+        [("user_id", 1), ("template_id", 1), ("report_period", 1)], unique=True
+    ))
+    return mongo.report_submissions
+
+
+def item(period, hours, template_id="t1"):
+    return ReportSubmissionCreate(template_id=template_id, report_period=period, data={"hours": hours})
+
+
+def upload(*items):
+    return asyncio.run(create_or_update_reports_batch(ReportBatchRequest(reports=list(items)), current_user=USER))
+
+
+def outcomes(response):
+    return [(result.report_period, result.result) for result in response.results]
+
+
+def test_batch_creates_and_updates_in_one_write(submissions):
+    upload(item("2024-01", 5))
+
+    response = upload(item("2024-02", 7), item("2024-01", 6))
+
+    assert outcomes(response) == [("2024-02", "created"), ("2024-01", "updated")]
+    assert (response.created, response.updated, response.failed) == (1, 1, 0)
+    stored = {
+        report["report_period"]: report
+        for report in asyncio.run(submissions.find({}, {"_id": 0}).to_list(None))
+    }
+    assert [result.id for result in response.results] == [stored["2024-02"]["id"], stored["2024-01"]["id"]]
+    assert stored["2024-01"]["data"] == {"hours": 6}
+    assert stored["2024-01"]["revision"] == 2
+
+
+def test_invalid_items_fail_alone(submissions):
+    response = upload(item("2024-01", 5), item("2024-02", 500), item("2024-03", 1, template_id="missing"))
+
+    assert outcomes(response) == [("2024-01", "created"), ("2024-02", "error"), ("2024-03", "error")]
+    assert response.results[2].detail == "Report template not found or inactive"
+    assert asyncio.run(submissions.count_documents({})) == 1
+
+
+def test_last_item_for_a_period_wins(submissions):
+    response = upload(item("2024-01", 5), item("2024-01", 6))
+
+    assert outcomes(response) == [("2024-01", "superseded"), ("2024-01", "created")]
+    assert asyncio.run(submissions.find_one({}))["data"] == {"hours": 6}
+
+
+def test_write_errors_map_back_to_their_items(submissions, monkeypatch):
+    upload(item("2024-02", 1))
+    collection = type(submissions)
+    bulk_write = collection.bulk_write
+
+    async def fail_the_second_operation(self, operations, ordered=True):
+        # The server applies the other operations of an unordered bulk write and reports
+        # the failures, and the upserts that did happen, by operation index
+        await bulk_write(self, [operations[0], operations[2]], ordered=ordered)
+        raise BulkWriteError({
+            "writeErrors": [{"index": 1, "code": 11000, "errmsg": "E11000 duplicate key error"}],
+            "upserted": [{"index": 0, "_id": "x"}],
+            "nInserted": 0,
+            "nUpserted": 1,
+            "nMatched": 1,
+            "nModified": 1,
+        })
+
+    monkeypatch.setattr(collection, "bulk_write", fail_the_second_operation)
+
+    response = upload(item("2024-01", 5), item("2024-03", 5, template_id="missing"), item("2024-04", 6), item("2024-02", 2))
+
+    assert outcomes(response) == [
+        ("2024-01", "created"), ("2024-03", "error"), ("2024-04", "error"), ("2024-02", "updated")
+    ]
+    assert response.results[2].detail == "E11000 duplicate key error"
+    assert response.results[2].id is None
+    assert all(response.results[index].id for index in (0, 3))
+    assert (response.created, response.updated, response.failed) == (1, 1, 2)
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import ReportDataPatch, User, patch_report_data
+
+USER = User(id="u1", username="user", email="user@example.com")
+ADMIN = User(id="a1", username="admin", email="admin@example.com", role="ADMIN")
+
+TEMPLATE = {
+    "id": "t1",
+    "name": "Monthly",
+    "description": "Monthly progress",
+    "created_by": "admin",
+    "active": True,
+    "version": 2,
+    "fields": [
+        {"name": "summary", "label": "Summary", "field_type": "text", "required": True},
+        {"name": "hours", "label": "Hours", "field_type": "number", "validation": {"min": 0, "max": 80}},
+    ],
+}
+
+
+@pytest.fixture
+def report(mongo, monkeypatch):
+    monkeypatch.setattr(server.draft_patch_coalescer, "window", 0)
+
+    def install(status="draft", data=None):
+        asyncio.run(mongo.report_templates.insert_one(dict(TEMPLATE)))
+        asyncio.run(mongo.report_submissions.insert_one({
+            "id": "r1",
+            "user_id": USER.id,
+            "template_id": "t1",
+            "template_version": 1,
+            "report_period": "2024-01",
+            "status": status,
+            "data": data or {},
+            "revision": 1,
+        }))
+        return mongo.report_submissions
+    return install
+
+
+def patch(data=None, remove=(), user=USER):
+    return asyncio.run(patch_report_data("r1", ReportDataPatch(data=data or {}, remove=list(remove)), current_user=user))
+
+
+def test_patch_updates_only_the_given_keys(report):
+    submissions = report(data={"summary": "Draft", "hours": 10})
+
+    result = patch({"hours": 12})
+
+    stored = asyncio.run(submissions.find_one({"id": "r1"}))
+    assert result["updated_fields"] == ["hours"]
+    assert stored["data"] == {"summary": "Draft", "hours": 12}
+    assert stored["revision"] == 2
+    assert stored["template_version"] == 2
+
+
+def test_patch_with_invalid_value_is_rejected(report):
+    submissions = report(data={"hours": 10})
+
+    with pytest.raises(HTTPException) as error:
+        patch({"hours": 100})
+
+    assert error.value.status_code == 422
+    assert error.value.detail == "Report data failed validation: Hours must be at most 80"
+    assert asyncio.run(submissions.find_one({"id": "r1"}))["data"] == {"hours": 10}
+
+
+def test_patch_validates_the_merged_report(report):
+    report(status="submitted", data={"summary": "Done"})
+
+    with pytest.raises(HTTPException) as error:
+        patch(remove=["summary"], user=ADMIN)
+
+    assert error.value.status_code == 422
+    assert "Summary is required" in error.value.detail
+
+
+def test_patch_of_another_users_report_is_not_found(report):
+    report()
+
+    with pytest.raises(HTTPException) as error:
+        patch({"hours": 1}, user=User(id="u2", username="other", email="other@example.com"))
+
+    assert error.value.status_code == 404
+
+
+def test_users_may_only_patch_drafts(report):
+    submissions = report(status="submitted", data={"summary": "Done"})
+
+    with pytest.raises(HTTPException) as error:
+        patch({"hours": 1})
+
+    assert error.value.status_code == 409
+    assert asyncio.run(submissions.find_one({"id": "r1"}))["data"] == {"summary": "Done"}
+
+
+def test_submit_before_the_flush_wins(report, monkeypatch):
+    submissions = report()
+    monkeypatch.setattr(server.draft_patch_coalescer, "window", 0.02)
+
+    async def main():
+        async def submit():
+            await asyncio.sleep(0.01)
+            await submissions.update_one({"id": "r1"}, {"$set": {"status": "submitted"}})
+        return await asyncio.gather(
+            patch_report_data("r1", ReportDataPatch(data={"hours": 1}), current_user=USER), submit(), return_exceptions=True
+        )
+
+    result, _ = asyncio.run(main())
+    assert isinstance(result, HTTPException) and result.status_code == 409
+    assert asyncio.run(submissions.find_one({"id": "r1"}))["data"] == {}
+
+
+def test_admins_may_patch_submitted_reports(report):
+    submissions = report(status="submitted", data={"summary": "Done"})
+
+    patch({"hours": 1}, user=ADMIN)
+
+    assert asyncio.run(submissions.find_one({"id": "r1"}))["data"] == {"summary": "Done", "hours": 1}
@@ -0,0 +1,163 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import server
+from server import RevisionHistoryGap, apply_revision_delta, diff_report_data, reconstruct_report_data
+
+
+def matches(document, query):
+    for key, condition in query.items():
+        value = document.get(key)
+        if isinstance(condition, dict):
+            if "$lte" in condition and not value <= condition["$lte"]:
+                return False
+            if "$gt" in condition and not value > condition["$gt"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        self.documents = sorted(self.documents, key=lambda document: document[key], reverse=direction < 0)
+        return self
+
+    def __aiter__(self):
+        self._iter = iter(self.documents)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeRevisions:
+    """Just enough of a Motor collection for reconstruct_report_data"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def find_one(self, query, sort=None):
+        found = FakeCursor([document for document in self.documents if matches(document, query)])
+        if sort:
+            found.sort(*sort[0])
+        return next(iter(found.documents), None)
+
+    def find(self, query):
+        return FakeCursor([document for document in self.documents if matches(document, query)])
+
+
+def delta(revision, old, new):
+    changed, removed = diff_report_data(old, new)
+    return {"report_id": "r1", "revision": revision, "kind": "delta", "set": changed, "unset": removed}
+
+
+def snapshot(revision, data):
+    return {"report_id": "r1", "revision": revision, "kind": "snapshot", "data": data}
+
+
+@pytest.fixture
+def revisions(monkeypatch):
+    def install(documents):
+        monkeypatch.setattr(server, "db", SimpleNamespace(report_revisions=FakeRevisions(documents)))
+    server._revision_heads.clear()
+    yield install
+    server._revision_heads.clear()
+
+
+HISTORY = [
+    {"a": 1},
+    {"a": 2, "b": "x"},
+    {"b": "x"},
+    {"b": "y", "c": [1, 2]},
+]
+
+
+def test_diff_report_data():
+    assert diff_report_data({"a": 1, "b": 2}, {"a": 1, "b": 3, "c": 4}) == ({"b": 3, "c": 4}, [])
+    assert diff_report_data({"a": 1, "b": 2}, {"a": 1}) == ({}, ["b"])
+
+
+def test_apply_delta_round_trips_diff():
+    for old, new in zip(HISTORY, HISTORY[1:]):
+        assert apply_revision_delta(old, delta(0, old, new)) == new
+
+
+def test_apply_snapshot_replaces_data():
+    assert apply_revision_delta({"a": 1}, snapshot(5, {"z": 0})) == {"z": 0}
+
+
+def test_reconstruct_every_revision_from_deltas(revisions):
+    documents = [snapshot(1, HISTORY[0])]
+    documents += [delta(index + 1, old, new) for index, (old, new) in enumerate(zip(HISTORY, HISTORY[1:]), start=1)]
+    revisions(documents)
+
+    for revision, expected in enumerate(HISTORY, start=1):
+        assert asyncio.run(reconstruct_report_data("r1", revision)) == expected
+
+
+def test_reconstruct_starts_from_latest_snapshot(revisions):
+    revisions([
+        snapshot(1, {"a": 1}),
+        delta(2, {"a": 1}, {"a": 2}),
+        snapshot(3, {"a": 3}),
+        delta(4, {"a": 3}, {"a": 4}),
+    ])
+
+    assert asyncio.run(reconstruct_report_data("r1", 4)) == {"a": 4}
+    assert asyncio.run(reconstruct_report_data("r1", 2)) == {"a": 2}
+
+
+def test_reconstruct_detects_missing_revision(revisions):
+    revisions([snapshot(1, {"a": 1}), delta(3, {"a": 2}, {"a": 3})])
+
+    with pytest.raises(RevisionHistoryGap):
+        asyncio.run(reconstruct_report_data("r1", 3))
+    with pytest.raises(RevisionHistoryGap):
+        asyncio.run(reconstruct_report_data("r1", 4))
+
+
+def test_reconstruct_without_snapshot(revisions):
+    revisions([delta(2, {}, {"a": 1})])
+
+    with pytest.raises(RevisionHistoryGap):
+        asyncio.run(reconstruct_report_data("r1", 2))
+
+
+def test_reconstruct_uses_cached_head(revisions):
+    revisions([])
+    server._revision_heads.set("r1", (7, {"a": 7}))
+
+    assert asyncio.run(reconstruct_report_data("r1", 7)) == {"a": 7}
+
+
+def test_revisions_of_a_report_acknowledged_under_another_id(mongo, monkeypatch, tmp_path):
+    buffer = server.SurgeBuffer(server.SurgeJournal(tmp_path / "journal.jsonl"), "off", 100, 60, 1000)
+    # A surge save acknowledged under "acked" landed on the existing report "r1"
+    buffer._aliases.set("acked", "r1")
+    monkeypatch.setattr(server, "surge_buffer", buffer)
+    admin = server.User(id="a1", username="admin", email="admin@example.com", role="ADMIN")
+
+    async def main():
+        await mongo.report_submissions.insert_one({"id": "r1", "user_id": "u1"})
+        await mongo.report_revisions.insert_many([
+            {**snapshot(1, {"a": 1}), "status": "draft", "actor_id": "u1", "created_at": datetime.now(timezone.utc)},
+            {**delta(2, {"a": 1}, {"a": 2}), "status": "draft", "actor_id": "u1", "created_at": datetime.now(timezone.utc)},
+        ])
+        revisions = await server.get_report_revisions("acked", current_user=admin)
+        revision = await server.get_report_revision("acked", 2, current_user=admin)
+        return revisions, revision
+
+    revisions, revision = asyncio.run(main())
+    assert [summary.revision for summary in revisions] == [2, 1]
+    assert revision.report_id == "r1"
+    assert revision.data == {"a": 2}
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import server
+from server import ReportSubmissionCreate, User, save_report
+
+USER = User(id="u1", username="user", email="user@example.com", location_id="north")
+
+TEMPLATE = {
+    "id": "t1",
+    "name": "Monthly",
+    "description": "Monthly progress",
+    "created_by": "admin",
+    "active": True,
+    "version": 3,
+    "fields": [{"name": "summary", "label": "Summary", "field_type": "text", "required": True}],
+}
+
+
+@pytest.fixture
+def submissions(mongo):
+    asyncio.run(mongo.report_templates.insert_one(dict(TEMPLATE)))
+    asyncio.run(mongo.report_submissions.create_index(
+        [("user_id", 1), ("template_id", 1), ("report_period", 1)], unique=True
+    ))
+    return mongo.report_submissions
+
+
+def save(data, status="draft", period="2024-01"):
+    return asyncio.run(save_report(
+        ReportSubmissionCreate(template_id="t1", report_period=period, data=data, status=status), USER
+    ))
+
+
+def test_first_save_creates_the_report(submissions):
+    report = save({"summary": "Started"})
+
+    stored = asyncio.run(submissions.find_one({"id": report.id}, {"_id": 0}))
+    assert stored["user_id"] == USER.id
+    assert stored["location_id"] == "north"
+    assert stored["template_version"] == 3
+    assert stored["revision"] == 1
+    assert stored["submitted_at"] is None
+    assert report.data == {"summary": "Started"}
+
+
+def test_later_saves_update_the_same_report(submissions):
+    first = save({"summary": "Started"})
+    second = save({"summary": "Finished"}, status="submitted")
+    third = save({"summary": "Finished, with notes"}, status="submitted")
+
+    assert first.id == second.id == third.id
+    assert asyncio.run(submissions.count_documents({})) == 1
+    assert (second.revision, third.revision) == (2, 3)
+    assert second.created_at == first.created_at
+    # submitted_at records the first submission, not each save after it
+    assert second.submitted_at is not None
+    assert third.submitted_at == second.submitted_at
+
+
+def test_each_period_gets_its_own_report(submissions):
+    january = save({"summary": "January"})
+    february = save({"summary": "February"}, period="2024-02")
+
+    assert january.id != february.id
+    assert asyncio.run(submissions.count_documents({})) == 2
+
+
+def test_inactive_template_is_rejected(submissions, mongo):
+    asyncio.run(mongo.report_templates.update_one({"id": "t1"}, {"$set": {"active": False}}))
+
+    with pytest.raises(server.HTTPException) as error:
+        save({"summary": "Started"})
+    assert error.value.status_code == 404
+
+
+def test_invalid_data_is_rejected_without_a_write(submissions):
+    with pytest.raises(server.HTTPException) as error:
+        save({}, status="submitted")
+
+    assert error.value.status_code == 422
+    assert asyncio.run(submissions.count_documents({})) == 0
+
+
+def test_concurrent_insert_is_retried_as_an_update(submissions, monkeypatch):
+    existing = save({"summary": "Saved by another request"})
+    collection = type(submissions)
+    find_one_and_update = collection.find_one_and_update
+    calls = []
+
+    async def lose_the_insert_race(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise DuplicateKeyError("E11000 duplicate key error")
+        return await find_one_and_update(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection, "find_one_and_update", lose_the_insert_race)
+
+    report = save({"summary": "Mine"})
+
+    assert len(calls) == 2
+    assert report.id == existing.id
+    assert report.revision == 2
+    assert report.data == {"summary": "Mine"}
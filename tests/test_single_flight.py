@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from server import LRUCache, SingleFlight, StreamCoalescer, single_flight_key
+
+
+def test_concurrent_callers_share_one_computation():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"total": 3}
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == [{"total": 3}] * 5
+
+
+def test_sequential_calls_recompute_without_retention():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight()
+        return [await flight.do("key", compute), await flight.do("key", compute)]
+
+    assert asyncio.run(main()) == [1, 2]
+
+
+def test_retained_result_is_reused():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight()
+        return [await flight.do("key", compute, retain=60), await flight.do("key", compute, retain=60)]
+
+    assert asyncio.run(main()) == [1, 1]
+
+
+def test_errors_reach_every_caller_and_are_not_retained():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        flight = SingleFlight()
+        first = await asyncio.gather(*(flight.do("key", compute, retain=60) for _ in range(3)), return_exceptions=True)
+        second = await asyncio.gather(flight.do("key", compute, retain=60), return_exceptions=True)
+        return first + second
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_computation():
+    async def main():
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", compute))
+        second = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_single_flight_key_normalizes_parameters():
+    assert single_flight_key("export", format=" CSV ", status=None, template_id="t") == \
+        single_flight_key("export", template_id="t", format="csv", user_id="")
+    assert single_flight_key("export", template_id="a") != single_flight_key("export", template_id="b")
+
+
+def test_stream_coalescer_shares_one_source():
+    runs = []
+
+    async def source():
+        runs.append(1)
+        for index in range(4):
+            await asyncio.sleep(0.005)
+            yield index
+
+    async def consume(delay=0.0):
+        await asyncio.sleep(delay)
+        return [chunk async for chunk in coalescer.stream("key", source)]
+
+    async def main():
+        return await asyncio.gather(consume(), consume(0.007))
+
+    coalescer = StreamCoalescer(window=2)
+    assert asyncio.run(main()) == [[0, 1, 2, 3], [0, 1, 2, 3]]
+    assert len(runs) == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_cache_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("server.time.monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+
+    now[0] += 10
+    assert cache.get("a", "missing") == "missing"
+    assert cache.get("b") == 2
+
+
+@pytest.mark.parametrize("value", [None, 0, False, ""])
+def test_lru_cache_stores_falsy_values(value):
+    cache = LRUCache()
+    cache.set("key", value)
+
+    assert "key" in cache
+    assert cache.get("key", "missing") == value
+    assert cache.pop("key", "missing") == value
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import pytest
+
+from server import StaleWhileRevalidateCache
+
+KEY = ("analytics", "all")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Skip time forward without freezing it: the event loop shares this clock"""
+    offset = [0.0]
+    monotonic = time.monotonic
+    monkeypatch.setattr("server.time.monotonic", lambda: monotonic() + offset[0])
+    return offset
+
+
+def source(*outcomes, delay=0.0):
+    """A computation returning (or raising) each outcome in turn"""
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    compute.calls = calls
+    return compute
+
+
+def test_cold_cache_waits_and_fresh_hits_do_not_recompute(clock):
+    cache = StaleWhileRevalidateCache(fresh_for=30, stale_for=600, refresh_timeout=5)
+    compute = source("v1")
+
+    async def main():
+        first = await cache.get(KEY, compute)
+        clock[0] += 10
+        return first, await cache.get(KEY, compute)
+
+    (value, meta), (cached, cached_meta) = asyncio.run(main())
+    assert value == cached == "v1"
+    assert meta["status"] == cached_meta["status"] == "fresh"
+    assert cached_meta["age_seconds"] >= 10
+    assert len(compute.calls) == 1
+
+
+def test_stale_entry_is_served_while_refreshing_in_the_background(clock):
+    cache = StaleWhileRevalidateCache(fresh_for=30, stale_for=600, refresh_timeout=5)
+    compute = source("v1", "v2", delay=0.01)
+
+    async def main():
+        await cache.get(KEY, compute)
+        clock[0] += 60
+        stale = await cache.get(KEY, compute)
+        await asyncio.sleep(0.05)
+        return stale, await cache.get(KEY, compute)
+
+    (value, meta), (refreshed, refreshed_meta) = asyncio.run(main())
+    assert (value, meta["status"], meta["stale"]) == ("v1", "stale", True)
+    assert (refreshed, refreshed_meta["status"]) == ("v2", "fresh")
+
+
+def test_failed_refresh_degrades_to_the_last_good_value(clock):
+    cache = StaleWhileRevalidateCache(fresh_for=30, stale_for=60, refresh_timeout=5)
+    compute = source("v1", RuntimeError("database unavailable"))
+
+    async def main():
+        await cache.get(KEY, compute)
+        clock[0] += 120
+        return await cache.get(KEY, compute)
+
+    value, meta = asyncio.run(main())
+    assert value == "v1"
+    assert meta["status"] == "degraded"
+    assert meta["last_error"] == "database unavailable"
+
+
+def test_slow_refresh_degrades_then_repopulates_the_cache(clock):
+    cache = StaleWhileRevalidateCache(fresh_for=30, stale_for=60, refresh_timeout=0.01)
+    compute = source("v1", "v2", delay=0.05)
+
+    async def main():
+        await cache.get(KEY, compute)
+        clock[0] += 120
+        degraded = await cache.get(KEY, compute)
+        await asyncio.sleep(0.1)
+        return degraded, await cache.get(KEY, compute)
+
+    (value, meta), (refreshed, refreshed_meta) = asyncio.run(main())
+    assert (value, meta["status"]) == ("v1", "degraded")
+    assert "time budget" in meta["last_error"]
+    assert (refreshed, refreshed_meta["status"]) == ("v2", "fresh")
+
+
+def test_cold_cache_failure_reaches_the_caller(clock):
+    cache = StaleWhileRevalidateCache(fresh_for=30, stale_for=60, refresh_timeout=5)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get(KEY, source(RuntimeError("database unavailable"))))
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+import server
+from server import ReportSubmissionCreate, SurgeBuffer, SurgeJournal, User, save_report
+
+USER = User(id="u1", username="user", email="user@example.com", location_id="l1")
+KEY = ("u1", "t1", "2024-01")
+
+
+def submission(data, status="draft"):
+    return ReportSubmissionCreate(template_id="t1", report_period="2024-01", data=data, status=status)
+
+
+@pytest.fixture
+def make_buffer(mongo, tmp_path):
+    asyncio.run(mongo.report_submissions.create_index(
+        [("user_id", 1), ("template_id", 1), ("report_period", 1)], unique=True
+    ))
+
+    def make(mode="on"):
+        return SurgeBuffer(SurgeJournal(tmp_path / "journal.jsonl"), mode, 100, 60, 1000)
+    return make
+
+
+def stored_reports(mongo):
+    return asyncio.run(mongo.report_submissions.find({}, {"_id": 0}).to_list(None))
+
+
+def test_flush_writes_the_latest_submission_per_report(make_buffer, mongo):
+    buffer = make_buffer()
+
+    async def main():
+        first = await buffer.submit(submission({"a": 1}), USER, 1)
+        second = await buffer.submit(submission({"a": 2}), USER, 1)
+        assert buffer.buffered == 1
+        await buffer.flush()
+        return first, second
+
+    first, second = asyncio.run(main())
+    reports = stored_reports(mongo)
+    assert first["id"] == second["id"] == reports[0]["id"]
+    assert [report["data"] for report in reports] == [{"a": 2}]
+    assert reports[0]["revision"] == 1
+    assert buffer.buffered == 0
+    assert not buffer.journal.path.exists()
+
+
+def test_replay_after_a_crash_writes_unflushed_submissions(make_buffer, mongo):
+    crashed = make_buffer()
+
+    async def before_crash():
+        await crashed.submit(submission({"a": 1}), USER, 1)
+        await crashed.flush()
+        await crashed.submit(submission({"a": 2}), USER, 1)
+        await crashed.submit(submission({"a": 3}), User(id="u2", username="other", email="other@example.com"), 1)
+        await crashed.submit(submission({"a": 4}), USER, 1)
+        # The process dies here, before the background flush runs
+
+    asyncio.run(before_crash())
+    assert crashed.journal.path.exists()
+
+    restarted = make_buffer()
+    asyncio.run(restarted.replay())
+
+    reports = {report["user_id"]: report for report in stored_reports(mongo)}
+    assert reports["u1"]["data"] == {"a": 4}
+    assert reports["u1"]["revision"] == 2
+    assert reports["u2"]["data"] == {"a": 3}
+    assert restarted.buffered == 0
+    assert not restarted.journal.path.exists()
+
+
+def test_replay_skips_entries_already_flushed(make_buffer, mongo):
+    buffer = make_buffer()
+
+    async def main():
+        await buffer.submit(submission({"a": 1}), USER, 1)
+        # Keep the journal around as if the truncation after the flush never ran
+        buffer.journal.truncate = lambda is_drained: asyncio.sleep(0)
+        await buffer.flush()
+        await mongo.report_submissions.update_one({"user_id": "u1"}, {"$set": {"data": {"a": "edited"}}})
+
+    asyncio.run(main())
+    asyncio.run(make_buffer().replay())
+
+    assert stored_reports(mongo)[0]["data"] == {"a": "edited"}
+
+
+def test_flush_keys_waits_for_an_older_write_of_the_same_report(make_buffer, mongo):
+    buffer = make_buffer()
+    write_batch = buffer._write_batch
+    written = []
+
+    async def slow_write(batch):
+        written.append(batch[KEY]["report"]["data"])
+        if len(written) == 1:
+            await asyncio.sleep(0.05)
+        await write_batch(batch)
+
+    buffer._write_batch = slow_write
+
+    async def main():
+        await buffer.submit(submission({"a": 1}), USER, 1)
+        background = asyncio.ensure_future(buffer.flush())
+        await asyncio.sleep(0.01)
+        await buffer.submit(submission({"a": 2}), USER, 1)
+        await buffer.flush_keys([KEY])
+        await background
+
+    asyncio.run(main())
+    assert written == [{"a": 1}, {"a": 2}]
+    assert stored_reports(mongo)[0]["data"] == {"a": 2}
+    assert buffer.buffered == 0
+
+
+def test_surge_save_answers_with_the_stored_report(make_buffer, mongo, monkeypatch):
+    buffer = make_buffer(mode="off")
+    monkeypatch.setattr(server, "surge_buffer", buffer)
+    asyncio.run(mongo.report_templates.insert_one({
+        "id": "t1", "name": "Monthly", "description": "Monthly progress", "created_by": "admin",
+        "active": True, "version": 3, "fields": []
+    }))
+
+    async def main():
+        existing = await save_report(submission({"a": 1}), USER)
+        buffer.mode = "on"
+        buffered = await save_report(submission({"a": 2}, status="submitted"), USER)
+        await buffer.flush()
+        return existing, buffered
+
+    existing, buffered = asyncio.run(main())
+    stored = stored_reports(mongo)[0]
+    assert buffered.id == existing.id == stored["id"]
+    assert buffered.created_at == existing.created_at
+    assert buffered.revision == existing.revision + 1 == stored["revision"]
+    assert buffered.template_version == 3
+    assert buffered.data == stored["data"] == {"a": 2}
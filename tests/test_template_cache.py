@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import server
+from server import TemplateCache
+
+
+def template(template_id, name, **extra):
+    return {
+        "id": template_id,
+        "name": name,
+        "description": "Monthly progress",
+        "created_by": "a1",
+        "active": True,
+        "fields": [{"name": "summary", "label": "Summary", "field_type": "text", "order": 1}],
+        **extra,
+    }
+
+
+@pytest.fixture
+def templates(mongo, monkeypatch):
+    asyncio.run(mongo.report_templates.insert_many([
+        template("t1", "Monthly"), template("t2", "Weekly"), template("t3", "Retired", active=False)
+    ]))
+    collection = type(mongo.report_templates)
+    find = collection.find
+    queries = []
+
+    def spy(self, query=None, *args, **kwargs):
+        queries.append(query)
+        return find(self, query, *args, **kwargs)
+
+    monkeypatch.setattr(collection, "find", spy)
+    return queries
+
+
+def rename(mongo, template_id, name):
+    asyncio.run(mongo.report_templates.update_one({"id": template_id}, {"$set": {"name": name}}))
+
+
+def names(cache):
+    content, _ = asyncio.run(cache.list_json())
+    return [entry["name"] for entry in json.loads(content)]
+
+
+def test_reads_are_served_from_one_load(templates):
+    cache = TemplateCache(60)
+
+    assert asyncio.run(cache.get("t1"))["name"] == "Monthly"
+    assert asyncio.run(cache.get("t3")) is None
+    assert names(cache) == ["Monthly", "Weekly"]
+    assert templates == [{"active": True}]
+
+
+def test_invalidating_one_template_reloads_only_that_template(templates, mongo):
+    cache = TemplateCache(60)
+    _, etag = asyncio.run(cache.list_json())
+    rename(mongo, "t1", "Monthly v2")
+    rename(mongo, "t2", "Weekly v2")
+
+    cache.invalidate("t1")
+
+    content, new_etag = asyncio.run(cache.list_json())
+    assert [entry["name"] for entry in json.loads(content)] == ["Monthly v2", "Weekly"]
+    assert new_etag != etag
+    assert templates[1:] == [{"id": {"$in": ["t1"]}, "active": True}]
+    assert json.loads(asyncio.run(cache.get_json("t1")))["name"] == "Monthly v2"
+
+
+def test_deactivated_template_drops_out(templates, mongo):
+    cache = TemplateCache(60)
+    names(cache)
+    asyncio.run(mongo.report_templates.update_one({"id": "t1"}, {"$set": {"active": False}}))
+
+    cache.invalidate("t1")
+
+    assert names(cache) == ["Weekly"]
+    assert asyncio.run(cache.get("t1")) is None
+
+
+def test_activated_template_is_added(templates, mongo):
+    cache = TemplateCache(60)
+    names(cache)
+    asyncio.run(mongo.report_templates.update_one({"id": "t3"}, {"$set": {"active": True}}))
+
+    cache.invalidate("t3")
+
+    assert names(cache) == ["Monthly", "Weekly", "Retired"]
+
+
+def test_invalidating_everything_reloads_the_active_set(templates, mongo):
+    cache = TemplateCache(60)
+    names(cache)
+    rename(mongo, "t2", "Weekly v2")
+
+    cache.invalidate()
+
+    assert names(cache) == ["Monthly", "Weekly v2"]
+    assert templates == [{"active": True}, {"active": True}]
+
+
+def test_cache_reloads_after_its_max_age(templates, mongo, monkeypatch):
+    offset = [0.0]
+    monotonic = time.monotonic
+    monkeypatch.setattr("server.time.monotonic", lambda: monotonic() + offset[0])
+    cache = TemplateCache(60)
+    names(cache)
+    rename(mongo, "t2", "Weekly v2")
+
+    offset[0] += 30
+    assert names(cache) == ["Monthly", "Weekly"]
+    offset[0] += 60
+    assert names(cache) == ["Monthly", "Weekly v2"]
+
+
+def test_write_during_a_load_is_not_lost(templates, mongo, monkeypatch):
+    cache = TemplateCache(60)
+    names(cache)
+    resolve_templates = server.resolve_templates
+    writes = []
+
+    async def write_while_resolving(stored):
+        if not writes:
+            # Another request renames the template after this load read it
+            writes.append(1)
+            await mongo.report_templates.update_one({"id": "t1"}, {"$set": {"name": "Monthly v3"}})
+            cache.invalidate("t1")
+        return await resolve_templates(stored)
+
+    monkeypatch.setattr(server, "resolve_templates", write_while_resolving)
+    rename(mongo, "t1", "Monthly v2")
+    cache.invalidate("t1")
+
+    assert names(cache) == ["Monthly v3", "Weekly"]
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import User, generate_field_html_preview, preview_template
+
+ADMIN = User(id="a1", username="admin", email="admin@example.com", role="ADMIN")
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    server._field_preview_fragments.clear()
+    server._template_previews.clear()
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    rendered = []
+    render = server.render_field_html_preview
+
+    def spy(field):
+        rendered.append(field.get("label"))
+        return render(field)
+
+    monkeypatch.setattr(server, "render_field_html_preview", spy)
+    return rendered
+
+
+def preview(template_data):
+    return asyncio.run(preview_template(template_data, current_user=ADMIN))
+
+
+def test_labels_options_and_placeholders_are_escaped():
+    fragment = generate_field_html_preview({
+        "label": "<script>alert(1)</script>",
+        "field_type": "dropdown",
+        "options": ["Fish & Chips", '"Quoted"'],
+    })
+
+    assert "<script>" not in fragment
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in fragment
+    assert "<option>Fish &amp; Chips</option><option>&quot;Quoted&quot;</option>" in fragment
+    assert 'placeholder="&quot; onfocus=&quot;x"' in generate_field_html_preview(
+        {"label": "Notes", "field_type": "text", "placeholder": '" onfocus="x'}
+    )
+
+
+def test_template_name_and_description_are_escaped():
+    result = preview({"name": "Q1 <b>Review</b>", "description": "R&D", "fields": []})
+
+    assert "<h3>Q1 &lt;b&gt;Review&lt;/b&gt;</h3>" in result["preview_html"]
+    assert "<p>R&amp;D</p>" in result["preview_html"]
+
+
+def test_multiselect_lists_every_option():
+    fragment = generate_field_html_preview({"label": "Days", "field_type": "multiselect", "options": ["Mon", "Tue"]})
+
+    assert '<select class="form-control" multiple disabled><option>Mon</option><option>Tue</option></select>' in fragment
+    assert "Select an option..." not in fragment
+
+
+def test_required_fields_are_marked():
+    assert '<span class="text-danger">*</span>' in generate_field_html_preview({"label": "Hours", "required": True})
+    assert "text-danger" not in generate_field_html_preview({"label": "Hours"})
+
+
+def test_preview_joins_fields_in_order():
+    result = preview({
+        "name": "Monthly",
+        "fields": [{"label": "First", "field_type": "text"}, {"label": "Second", "field_type": "date"}],
+    })
+
+    html = result["preview_html"]
+    assert html.startswith('<div class="template-preview"><h3>Monthly</h3>')
+    assert html.endswith("</form></div>")
+    assert html.index("First") < html.index("Second")
+    assert (result["field_count"], result["estimated_completion_time"]) == (2, 4)
+
+
+def test_unchanged_fields_are_rendered_once(renders):
+    first = {"label": "First", "field_type": "text"}
+    second = {"label": "Second", "field_type": "number"}
+
+    preview({"name": "Monthly", "fields": [first, second]})
+    preview({"name": "Monthly", "fields": [first, dict(second, label="Second, renamed")]})
+
+    assert renders == ["First", "Second", "Second, renamed"]
+
+
+def test_identical_templates_share_a_preview(renders):
+    template_data = {"name": "Monthly", "fields": [{"label": "First", "field_type": "text"}]}
+
+    first = preview(template_data)
+    second = preview({"fields": [{"field_type": "text", "label": "First"}], "name": "Monthly"})
+
+    assert second is first
+    assert renders == ["First"]
+
+
+def test_template_without_fields_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        preview({"name": "Monthly"})
+
+    assert error.value.status_code == 400
@@ -0,0 +1,122 @@
+import pytest
+from fastapi import HTTPException
+
+from server import TemplateValidator, ensure_valid_rules, find_invalid_rules
+
+
+def make_validator(*fields):
+    return TemplateValidator(list(fields))
+
+
+def test_required_fields_only_enforced_on_submit():
+    validator = make_validator({"name": "summary", "label": "Summary", "field_type": "text", "required": True})
+
+    assert validator.validate({}, submitted=False) == {}
+    assert validator.validate({"summary": ""}, submitted=True) == {"summary": "is required"}
+    assert validator.validate({"summary": "Done"}, submitted=True) == {}
+
+
+def test_number_bounds_and_type():
+    validator = make_validator({"name": "hours", "field_type": "number", "validation": {"min": 0, "max": 80}})
+
+    assert validator.validate({"hours": "40"}, False) == {}
+    assert validator.validate({"hours": "lots"}, False) == {"hours": "must be a number"}
+    assert validator.validate({"hours": -1}, False) == {"hours": "must be at least 0"}
+    assert validator.validate({"hours": 81}, False) == {"hours": "must be at most 80"}
+    assert validator.validate({"hours": True}, False) == {"hours": "must be a number"}
+
+
+def test_date_bounds():
+    validator = make_validator({"name": "due", "field_type": "date", "validation": {"min": "2024-01-01"}})
+
+    assert validator.validate({"due": "2024-02-01"}, False) == {}
+    assert validator.validate({"due": "2023-12-31"}, False) == {"due": "must be on or after 2024-01-01"}
+    assert validator.validate({"due": "not a date"}, False) == {"due": "must be a date (YYYY-MM-DD)"}
+
+
+def test_dropdown_and_multiselect_options():
+    validator = make_validator(
+        {"name": "status", "field_type": "dropdown", "options": ["On Track", "Delayed"]},
+        {"name": "tags", "field_type": "multiselect", "choices": ["a", "b", "c"], "validation": {"max": 2}}
+    )
+
+    assert validator.validate({"status": "On Track", "tags": ["a"]}, False) == {}
+    assert validator.validate({"status": "Lost"}, False) == {"status": "is not one of the available options"}
+    assert validator.validate({"tags": ["z"]}, False) == {"tags": "contains options that are not available"}
+    assert validator.validate({"tags": ["a", "b", "c"]}, False) == {"tags": "allows at most 2 selections"}
+    assert validator.validate({"tags": "a"}, False) == {"tags": "must be a list of options"}
+
+
+def test_text_length_and_pattern():
+    validator = make_validator({
+        "name": "code", "field_type": "text",
+        "validation": {"min_length": 2, "max_length": 4, "pattern": "[A-Z]+"}
+    })
+
+    assert validator.validate({"code": "ABC"}, False) == {}
+    assert validator.validate({"code": "A"}, False) == {"code": "must be at least 2 characters"}
+    assert validator.validate({"code": "ABCDE"}, False) == {"code": "must be at most 4 characters"}
+    assert validator.validate({"code": "ab"}, False) == {"code": "has an invalid format"}
+    assert validator.validate({"code": 12}, False) == {"code": "must be text"}
+
+
+def test_empty_values_skip_type_checks():
+    validator = make_validator({"name": "hours", "field_type": "number"})
+
+    assert validator.validate({"hours": ""}, False) == {}
+    assert validator.validate({"hours": None}, True) == {}
+
+
+def test_validate_many_matches_validate():
+    validator = make_validator(
+        {"name": "hours", "field_type": "number", "required": True},
+        {"name": "done", "field_type": "checkbox"}
+    )
+    rows = [{"hours": 1, "done": True}, {"done": "yes"}, {"hours": "x"}]
+    submitted = [True, True, False]
+
+    assert validator.validate_many(rows, submitted) == [
+        validator.validate(row, flag) for row, flag in zip(rows, submitted)
+    ]
+
+
+def test_describe_uses_labels():
+    validator = make_validator({"name": "hours", "label": "Hours Worked", "field_type": "number"})
+
+    assert validator.describe({"hours": "must be a number"}) == "Report data failed validation: Hours Worked must be a number"
+
+
+def test_malformed_rules_are_skipped_when_compiling():
+    validator = make_validator(
+        {"name": "a", "field_type": "text", "validation": {"pattern": "("}},
+        {"name": "b", "field_type": "text", "validation": {"min_length": "3", "max_length": 2}}
+    )
+
+    assert validator.validate({"a": "anything"}, False) == {}
+    assert validator.validate({"b": "abc"}, False) == {"b": "must be at most 2 characters"}
+
+
+@pytest.mark.parametrize("field, rule", [
+    ({"field_type": "text", "validation": {"pattern": "("}}, "pattern"),
+    ({"field_type": "textarea", "validation": {"min_length": "3"}}, "min_length"),
+    ({"field_type": "text", "validation": {"max_length": -1}}, "max_length"),
+    ({"field_type": "number", "validation": {"min": "low"}}, "min"),
+    ({"field_type": "multiselect", "validation": {"max": []}}, "max"),
+    ({"field_type": "date", "validation": {"max": "soon"}}, "max"),
+])
+def test_find_invalid_rules(field, rule):
+    assert list(find_invalid_rules(field)) == [rule]
+
+
+def test_valid_rules_pass():
+    assert find_invalid_rules({"field_type": "text", "validation": {"pattern": "\\d+", "min_length": 1}}) == {}
+    assert find_invalid_rules({"field_type": "number", "validation": {"min": "0", "max": 10}}) == {}
+    assert find_invalid_rules({"field_type": "checkbox"}) == {}
+
+
+def test_ensure_valid_rules_rejects_with_400():
+    with pytest.raises(HTTPException) as excinfo:
+        ensure_valid_rules([{"name": "code", "field_type": "text", "validation": {"pattern": "["}}])
+
+    assert excinfo.value.status_code == 400
+    assert "code: pattern" in excinfo.value.detail
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+
+from server import (
+    ReportFieldCreate,
+    ReportSubmissionCreate,
+    ReportTemplateCreate,
+    ReportTemplateUpdate,
+    User,
+    get_report,
+    get_template_version_json,
+    insert_report_template,
+    save_report,
+    update_report_template,
+)
+
+ADMIN = User(id="a1", username="admin", email="admin@example.com", role="ADMIN")
+USER = User(id="u1", username="user", email="user@example.com")
+
+SUMMARY = ReportFieldCreate(name="summary", label="Summary", field_type="text", order=1)
+HOURS = ReportFieldCreate(name="hours", label="Hours", field_type="number", order=2)
+
+
+@pytest.fixture
+def template_id(mongo):
+    asyncio.run(mongo.report_submissions.create_index(
+        [("user_id", 1), ("template_id", 1), ("report_period", 1)], unique=True
+    ))
+    template = asyncio.run(insert_report_template(
+        ReportTemplateCreate(name="Monthly", description="Monthly progress", fields=[SUMMARY]), ADMIN
+    ))
+    return template.id
+
+
+def save(template_id, period, data):
+    return asyncio.run(save_report(
+        ReportSubmissionCreate(template_id=template_id, report_period=period, data=data, status="submitted"), USER
+    ))
+
+
+def version_fields(template_id, version):
+    return [field["name"] for field in json.loads(asyncio.run(get_template_version_json(template_id, version)))["fields"]]
+
+
+def test_submission_stays_pinned_to_its_version_after_an_edit(template_id):
+    submitted = save(template_id, "2024-01", {"summary": "Done"})
+    assert submitted.template_version == 1
+
+    edited = asyncio.run(update_report_template(
+        template_id, ReportTemplateUpdate(fields=[SUMMARY, HOURS]), current_user=ADMIN
+    ))
+    assert edited.version == 2
+
+    stored = asyncio.run(get_report(submitted.id, current_user=USER))
+    assert stored.template_version == 1
+    assert version_fields(template_id, 1) == ["summary"]
+    assert version_fields(template_id, 2) == ["summary", "hours"]
+
+    assert save(template_id, "2024-02", {"summary": "Done", "hours": 3}).template_version == 2
+
+
+def test_field_ids_survive_an_edit(template_id, mongo):
+    before = asyncio.run(mongo.report_templates.find_one({"id": template_id}))
+
+    asyncio.run(update_report_template(
+        template_id, ReportTemplateUpdate(fields=[SUMMARY, HOURS]), current_user=ADMIN
+    ))
+
+    after = asyncio.run(mongo.report_templates.find_one({"id": template_id}))
+    assert after["fields"][0]["id"] == before["fields"][0]["id"]
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+import server
+from server import ApprovedUserDirectory, bitset_from_indexes, bitset_indexes, get_approved_user_directory, invalidate_user_directory
+
+USERS = [
+    {"id": f"u{index}", "username": f"user{index}", "location_id": "north" if index % 3 else "south"}
+    for index in range(20)
+]
+
+
+def test_bitset_round_trip():
+    indexes = [0, 1, 7, 8, 9, 15, 16, 63, 64, 130]
+
+    assert bitset_indexes(bitset_from_indexes(indexes, 131)) == indexes
+    assert bitset_indexes(0) == []
+
+
+def test_location_masks_partition_users():
+    directory = ApprovedUserDirectory(USERS)
+
+    south = directory.members(directory.location_masks["south"])
+    north = directory.members(directory.location_masks["north"])
+    assert [user["id"] for user in south] == [f"u{index}" for index in range(0, 20, 3)]
+    assert len(south) + len(north) == len(USERS)
+    assert directory.location_masks["south"] & directory.location_masks["north"] == 0
+
+
+def test_missing_submitters_per_location():
+    directory = ApprovedUserDirectory(USERS)
+    submitted = directory.mask_for(["u0", "u3", "u4", "unknown"])
+
+    missing = directory.members(directory.location_masks["south"] & ~submitted)
+    assert [user["id"] for user in missing] == ["u6", "u9", "u12", "u15", "u18"]
+
+
+def test_users_without_location_are_grouped():
+    directory = ApprovedUserDirectory([{"id": "a"}, {"id": "b", "location_id": "x"}])
+
+    assert directory.members(directory.location_masks[None]) == [{"id": "a"}]
+
+
+@pytest.fixture
+def clock(mongo, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("server.time.monotonic", lambda: now[0])
+    monkeypatch.setattr(server, "_user_directory", {"generation": 0, "directory": None, "built_for": None, "built_at": 0.0})
+    asyncio.run(mongo.users.insert_many([
+        {"id": "a", "username": "a", "role": "USER", "approved": True},
+        {"id": "b", "username": "b", "role": "USER", "approved": False},
+        {"id": "admin", "username": "admin", "role": "ADMIN", "approved": True},
+    ]))
+    return now
+
+
+def directory_ids():
+    return [user["id"] for user in asyncio.run(get_approved_user_directory()).users]
+
+
+def test_directory_lists_approved_reporting_users(clock):
+    assert directory_ids() == ["a"]
+
+
+def test_changes_from_another_worker_show_up_after_the_age_limit(clock, mongo):
+    assert directory_ids() == ["a"]
+    # Written by another worker, so this process never invalidated its directory
+    asyncio.run(mongo.users.update_one({"id": "b"}, {"$set": {"approved": True}}))
+    asyncio.run(mongo.users.delete_one({"id": "a"}))
+
+    clock[0] += server.USER_DIRECTORY_CACHE_SECONDS / 2
+    assert directory_ids() == ["a"]
+    clock[0] += server.USER_DIRECTORY_CACHE_SECONDS
+    assert directory_ids() == ["b"]
+
+
+def test_local_changes_invalidate_immediately(clock, mongo):
+    assert directory_ids() == ["a"]
+    asyncio.run(mongo.users.update_one({"id": "b"}, {"$set": {"approved": True}}))
+    invalidate_user_directory()
+
+    assert directory_ids() == ["a", "b"]